@@ -0,0 +1,119 @@
+# Schema loading benchmark: builds the expression model of very wide and very deep schemas with the iterative
+# visitor and with the recursive walk it replaced, then loads the deep schema with CslValidator, which also plans,
+# freezes and pickles it. Run from the repository root:
+#
+#     python -m py_csl_validator.benchmarks.schema_loading [columns] [depth]
+#
+# Parsing a 10,000 column schema with the Earley parser takes minutes, so the wide tree is made by parsing a few
+# template columns once and copying their subtrees under new names; only the visit is timed for it.
+
+# stdlib
+import sys
+import copy
+import time
+import pickle
+import pathlib
+import tempfile
+import tracemalloc
+
+# third party
+from lark import Tree, Token
+
+# local
+import py_csl_validator.utils.validator_utils as vu
+from py_csl_validator.validator.validator import CslValidator
+
+
+TEMPLATE_COLUMNS = [
+    'is("a") or starts($next)',
+    'if($next/is("x"), any("x","y","z"), notEmpty and length(1,10)) @ignoreCase',
+    'unique($this,$next) positiveInteger',
+    '(regex("[a-z]+") or empty) and not("none") @optional',
+    'if($next/starts("http"), uri, if($next/is("id"), uuid4, lowerCase))',
+]
+
+
+class RecursiveVisitor:
+    # the previous CslVisitor.visit: two lists per node and a getattr per rule, recursing into every child
+
+    def __init__(self, visitor):
+        self.visitor = visitor
+
+    def visit(self, node):
+        if isinstance(node, Token):
+            return node.value
+        elif isinstance(node, Tree):
+            stack = [self.visit(child) for child in node.children]
+            stack = [element for element in stack if element is not None]
+            return getattr(self.visitor, node.data, self.visitor.__default__)(stack)
+
+
+def wide_tree(parser, columns):
+    lines = ['version 1.1', f'@totalColumns {len(TEMPLATE_COLUMNS)}']
+    lines.extend(f'c{i}: {rule}' for i, rule in enumerate(TEMPLATE_COLUMNS))
+    tree = parser.parse('\n'.join(lines) + '\n')
+
+    body = next(tree.find_data('body'))
+    templates = body.children
+    body.children = []
+    for i in range(columns):
+        part = copy.deepcopy(templates[i % len(templates)])
+        names = {'this': f'c{i}', 'next': f'c{(i + 1) % columns}'}
+        for identifier in part.find_data('column_identifier'):
+            token = identifier.children[0]
+            name = names.get(token.value, f'c{i}')
+            identifier.children[0] = Token(token.type, name)
+        body.children.append(part)
+
+    for directive in tree.find_data('total_columns_directive'):
+        directive.children[-1] = Token(directive.children[-1].type, str(columns))
+
+    return tree
+
+
+def deep_schema(depth):
+    expression = 'is("a")'
+    for i in range(depth):
+        expression = f'if($c1/is("{i}"), {expression}, notEmpty)'
+
+    return f'version 1.1\n@totalColumns 2\nc0: {expression}\nc1: notEmpty\n'
+
+
+def load(schema_file):
+    # the whole load: parse, visit, plan and freeze, and a pickle round trip as for a worker process
+    pickle.loads(pickle.dumps(CslValidator(schema_file)))
+
+
+def measure(visit, tree):
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        visit(tree)
+        outcome = f'{time.perf_counter() - start:8.3f} s'
+    except RecursionError:
+        outcome = 'RecursionError'
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return f'{outcome:>14}  peak {peak / 2 ** 20:7.1f} MiB'
+
+
+def main(columns=10000, depth=150):
+    parser = vu.find_parser('1.1')
+    visitor_class = vu.find_visitor('1.1')
+
+    for label, tree in ((f'{columns} columns', wide_tree(parser, columns)),
+                        (f'if nested {depth} deep', parser.parse(deep_schema(depth)))):
+        print(label)
+        print(f'  iterative  {measure(lambda t: visitor_class().visit(t), tree)}')
+        print(f'  recursive  {measure(lambda t: RecursiveVisitor(visitor_class()).visit(t), tree)}')
+
+    with tempfile.TemporaryDirectory() as directory:
+        schema_file = pathlib.Path(directory).joinpath('deep.csvs')
+        schema_file.write_text(deep_schema(depth), encoding='utf-8')
+        print(f'if nested {depth} deep, CslValidator load')
+        print(f'  full load  {measure(load, schema_file)}')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
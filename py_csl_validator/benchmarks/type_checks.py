@@ -0,0 +1,91 @@
+# Micro-benchmark of the uuid4, uri and positiveInteger checks against the exception-based implementations they
+# replaced (validators.uuid, urlparse with a port probe, float()). Run from the repository root:
+#
+#     python -m py_csl_validator.benchmarks.type_checks [cells]
+#
+# Each check runs over the same mix of passing and failing cells through the expression's validate, so the result
+# object and call overhead are included on both sides; times are per cell.
+
+# stdlib
+import sys
+import timeit
+import urllib.parse as up
+
+# local
+from py_csl_validator.expressions.expression_classes_1_1 import Expressions1_1 as ec
+
+try:
+    import validators
+except ImportError:  # only needed to time the previous uuid4 check
+    validators = None
+
+
+CELLS = {
+    'uuid4': ['2bc1c94f-0deb-43e9-92a1-4775189ec9f8', '6f1d2c3b-8e4a-4b5c-9d6e-7f8091a2b3c4', 'not-a-uuid',
+              '2bc1c94f0deb43e992a14775189ec9f8', ''],
+    'uri': ['http://example.com/a/b?x=1#top', 'urn:isbn:0451450523', 'relative/path.txt', 'http://host:port/',
+            'http://[::1/'],
+    'positiveInteger': ['0', '42', '123456789', '-1', 'abc'],
+}
+
+
+class PreviousUuid4Expr(ec.Uuid4Expr):
+
+    def validate(self, key, row, context, ignore_case=False):
+        try:
+            valid = validators.uuid(row[key].lower() if ignore_case else row[key])
+        except validators.ValidationError:
+            valid = False
+
+        return self.result(valid)
+
+
+class PreviousUriExpr(ec.UriExpr):
+
+    def validate(self, key, row, context, ignore_case=False):
+        valid = True
+        try:
+            uri = up.urlparse(row[key])
+            uri.port
+        except ValueError:
+            valid = False
+
+        return self.result(valid)
+
+
+class PreviousPositiveIntegerExpr(ec.PositiveIntegerExpr):
+
+    def validate(self, key, row, context, ignore_case=False):
+        try:
+            val = float(row[key])
+            valid = val.is_integer() and val >= 0
+        except ValueError:
+            valid = False
+
+        return self.result(valid)
+
+
+def time_per_cell(expression, cells, count):
+    rows = [{'cell': val} for val in (cells * (count // len(cells) + 1))[:count]]
+    validate = expression.validate
+    seconds = min(timeit.repeat(lambda: [validate('cell', row, None) for row in rows], number=1, repeat=5))
+
+    return seconds / count * 1e9
+
+
+def main(count=100000):
+    comparisons = [
+        ('uuid4', ec.Uuid4Expr(), PreviousUuid4Expr() if validators is not None else None),
+        ('uri', ec.UriExpr(), PreviousUriExpr()),
+        ('positiveInteger', ec.PositiveIntegerExpr(), PreviousPositiveIntegerExpr()),
+    ]
+
+    print(f'{"check":<16} {"current":>12} {"previous":>12}')
+    for name, expression, previous in comparisons:
+        now = time_per_cell(expression, CELLS[name], count)
+        before = f'{time_per_cell(previous, CELLS[name], count):9.0f} ns' if previous is not None else 'unavailable'
+        print(f'{name:<16} {now:9.0f} ns {before:>12}')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,209 @@
+# stdlib
+import os
+import marshal
+import hashlib
+import pathlib
+import tempfile
+import importlib.util
+
+# local
+import py_csl_validator.utils.io_utils as iu
+from py_csl_validator.expressions.expression_classes_1_1 import Expressions1_1 as ec
+
+
+CODEGEN_VERSION = '1'
+CACHE_SUFFIX = '.cslc'
+CACHE_ENV = 'PY_CSL_VALIDATOR_CACHE'
+
+
+class SchemaCompiler:
+    # Turns planned column rules into the source of a single validate_row(row, context) function. Simple literal
+    # checks are inlined as plain comparisons on local variables; everything else calls the expression object,
+    # which also remains the semantic oracle for the inlined code.
+
+    def __init__(self, column_rules):
+        self.column_rules = column_rules
+        self.bindings = []
+
+    def source(self):
+        self.bindings = []
+
+        body = []
+        for col_index, (key, rule) in enumerate(self.column_rules.items()):
+            body.extend(self._column(col_index, key, rule))
+
+        params = ''.join(f', {name}={name}' for name in self._binding_names())
+        lines = [f'# generated by py_csl_validator.codegen version {CODEGEN_VERSION}, do not edit']
+        for name, getter in self.bindings:
+            lines.append(f'{name} = {getter}')
+        lines.append('')
+        lines.append(f'def validate_row(row, context, _R=_R{params}):')
+        lines.append('    valid = True')
+        lines.append('    fail_fast = context.fail_fast')
+        lines.append('    failure_counts = context.failure_counts')
+        lines.extend(body)
+        lines.append('    return valid')
+        lines.append('')
+
+        return '\n'.join(lines)
+
+    def _binding_names(self):
+        return [name for name, _ in self.bindings]
+
+    def _bind(self, getter):
+        name = f'_b{len(self.bindings)}'
+        self.bindings.append((name, getter))
+        return name
+
+    def _column(self, col_index, key, rule):
+        directives = rule.col_directives
+        no_case = directives['ignore_case']
+        report_level = 'w' if directives['warning'] else 'e'
+        failed = f'failed_{col_index}'
+
+        lines = [f'    # column {key!r}',
+                 f'    val = row[{key!r}]']
+        if len(rule.col_vals) > 1:
+            lines.append(f'    {failed} = False')
+
+        body = []
+        for expr_index, expression in enumerate(rule.col_vals):
+            expr_name = self._bind(f'exprs[{col_index}][{expr_index}]')
+            inline = self._inline(expression, expr_name, no_case)
+
+            # with fail_fast, a column stops at its first failure
+            indent = '    ' if expr_index == 0 else '        '
+            if expr_index > 0:
+                body.append(f'    if not (fail_fast and {failed}):')
+
+            if inline is not None:
+                condition, leaf_name, operands = inline
+                result = f'_R({leaf_name}, {{valid}}, {operands})'
+                passed_result = result.format(valid='True')
+                failed_result = result.format(valid='False')
+            else:
+                body.append(f'{indent}result = {expr_name}.validate({key!r}, row, context, ignore_case={no_case})')
+                condition = 'result'
+                passed_result = failed_result = 'result'
+
+            if directives['match_is_false']:
+                body.append(f'{indent}if {condition}:')
+                reported = passed_result
+            elif directives['optional']:
+                body.append(f"{indent}if not ({condition}) and val != '':")
+                reported = failed_result
+            else:
+                body.append(f'{indent}if not ({condition}):')
+                reported = failed_result
+
+            body.append(f'{indent}    {reported}.report({report_level!r}, {key!r}, row, context, ignore_case={no_case})')
+            body.append(f'{indent}    failure_counts[{key!r}][{expression.label()!r}] += 1')
+            body.append(f'{indent}    valid = False')
+            if len(rule.col_vals) > 1:
+                body.append(f'{indent}    {failed} = True')
+
+        if no_case and any('lval' in line for line in body):
+            lines.append('    lval = val.lower()')
+        lines.extend(body)
+
+        return lines
+
+    def _inline(self, expression, expr_name, no_case):
+        # returns (condition, name of the bound leaf expression, operands source) or None if not inlinable
+        leaf = expression
+        leaf_getter = expr_name
+        while True:
+            if isinstance(leaf, ec.ColumnValidationExpr):
+                leaf, leaf_getter = leaf.expression, f'{leaf_getter}.expression'
+            elif isinstance(leaf, ec.SingleExpr) and leaf.col_ref is None:
+                leaf, leaf_getter = leaf.expression, f'{leaf_getter}.expression'
+            else:
+                break
+
+        cell = 'lval' if no_case else 'val'
+
+        if isinstance(leaf, (ec.IsExpr, ec.NotExpr, ec.InExpr, ec.StartsWithExpr, ec.EndsWithExpr)):
+            if not leaf.comparison.is_literal():
+                return None
+            literal = leaf.comparison.val
+            comparison = literal.lower() if no_case else literal
+            templates = {
+                ec.IsExpr: '{cell} == {lit!r}',
+                ec.NotExpr: '{cell} != {lit!r}',
+                ec.InExpr: '{lit!r} in {cell}',
+                ec.StartsWithExpr: '{cell}.startswith({lit!r})',
+                ec.EndsWithExpr: '{cell}.endswith({lit!r})',
+            }
+            condition = templates[type(leaf)].format(cell=cell, lit=comparison)
+            return condition, self._bind(leaf_getter), f'({literal!r},)'
+
+        if isinstance(leaf, ec.AnyExpr):
+            if leaf.dynamic:
+                return None
+            literal_set = self._bind(f'{leaf_getter}.literal_set_no_case' if no_case else f'{leaf_getter}.literal_set')
+            return f'{cell} in {literal_set}', self._bind(leaf_getter), '((),)'
+
+        if isinstance(leaf, ec.EmptyExpr):
+            return "val == ''", self._bind(leaf_getter), '()'
+
+        if isinstance(leaf, ec.NotEmptyExpr):
+            return "val != ''", self._bind(leaf_getter), '()'
+
+        if isinstance(leaf, ec.LengthExpr):
+            start = self._bind(f'{leaf_getter}.start')
+            if not leaf.end:
+                condition = f'len(val) == {start}'
+            else:
+                end = self._bind(f'{leaf_getter}.end')
+                condition = f'{start} <= len(val) <= {end}'
+            return condition, self._bind(leaf_getter), '()'
+
+        return None
+
+
+def default_cache_dir():
+    # a directory of the user's own: code loaded from the cache runs as soon as a schema is compiled, so it must
+    # not be somewhere others can write, such as next to a shared schema. CACHE_ENV names another directory.
+    if os.environ.get(CACHE_ENV):
+        return pathlib.Path(os.environ[CACHE_ENV])
+
+    return iu.user_cache_dir('codegen')
+
+
+def compile_rules(column_rules, cache=True):
+    # returns validate_row for the given (planned, row-keyed) column rules. The compiled code object is cached in
+    # default_cache_dir() under the hash of the generated source, so an unchanged schema and plan is never compiled
+    # twice. Marshalled code is interpreter specific, so the bytecode magic number is part of the key. A cache
+    # directory which others can write to is not used.
+    source = SchemaCompiler(column_rules).source()
+    digest = hashlib.sha256(importlib.util.MAGIC_NUMBER + source.encode('utf-8')).hexdigest()
+
+    code = None
+    cache_path = None
+    if cache:
+        cache_dir = default_cache_dir()
+        if iu.private_dir(cache_dir):
+            cache_path = cache_dir.joinpath(f'{digest[:32]}{CACHE_SUFFIX}')
+            try:
+                with open(cache_path, mode='rb') as cache_file:
+                    code = marshal.load(cache_file)
+            except (OSError, EOFError, ValueError, TypeError):
+                code = None
+
+    if code is None:
+        code = compile(source, f'<csl schema {digest[:12]}>', 'exec')
+        if cache_path is not None:
+            try:
+                with tempfile.NamedTemporaryFile(mode='wb', dir=cache_path.parent, delete=False) as cache_file:
+                    marshal.dump(code, cache_file)
+                os.replace(cache_file.name, cache_path)
+            except OSError:
+                pass  # the cache is an optimization only
+
+    namespace = {
+        '_R': ec.Result,
+        'exprs': [rule.col_vals for rule in column_rules.values()],
+    }
+    exec(code, namespace)
+
+    return namespace['validate_row']
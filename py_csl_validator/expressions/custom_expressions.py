@@ -0,0 +1,78 @@
+# Registry of site-specific checks, referenced from a schema as custom("name") or custom("name", arg, ...).
+#
+# A check supplies a per-cell function, cell(value, *args) -> bool, a batch function,
+# batch(values, *args) -> mask, or both. A batch function receives a list of cell values and, for every argument,
+# a list of the same length; it returns one truthy or falsy entry per value (a list, a numpy array, ...). The row
+# engines hand batch functions whole chunks of rows where they can and single cells otherwise, so a check with only
+# a batch function works everywhere. Checks must be pure: their verdict may only depend on their inputs.
+#
+#     import py_csl_validator.expressions.custom_expressions as ce
+#
+#     @ce.custom_check('mod97')
+#     def mod97(value):
+#         return value.isdigit() and int(value) % 97 == 1
+#
+#     ce.register('known_ids', batch=lambda values: numpy.isin(values, known_ids))
+#
+# A utils.cache_utils.ResultCache digests a check's code with the data its closure and module globals refer to, so
+# results cached before known_ids changed are not returned after. A check referring to data which cannot be pickled
+# turns the cache off for the schemas using it.
+
+
+class CustomCheck:
+
+    __slots__ = ('name', 'cell', 'batch', 'cost', 'description')
+
+    def __init__(self, name, cell=None, batch=None, cost=5, description=None):
+        self.name = name
+        self.cell = cell
+        self.batch = batch
+        self.cost = cost  # relative cost for the planner, see utils.planner_utils
+        self.description = description
+
+    def check_cell(self, value, args):
+        if self.cell is not None:
+            return bool(self.cell(value, *args))
+
+        return bool(self.batch([value], *[[arg] for arg in args])[0])
+
+    def check_batch(self, values, args):
+        if self.batch is not None:
+            return self.batch(values, *[[arg] * len(values) for arg in args])
+
+        return [bool(self.cell(value, *args)) for value in values]
+
+
+registry = {}
+
+
+def register(name, cell=None, batch=None, cost=5, description=None):
+    if cell is None and batch is None:
+        raise ValueError(f'Custom check {name} needs a cell or a batch function')
+
+    registry[name] = CustomCheck(name, cell, batch, cost, description)
+
+    return registry[name]
+
+
+def unregister(name):
+    registry.pop(name, None)
+
+
+def custom_check(name, batch=False, cost=5, description=None):
+    # decorator form of register; batch=True registers the function as a batch function
+    def decorator(function):
+        if batch:
+            register(name, batch=function, cost=cost, description=description)
+        else:
+            register(name, cell=function, cost=cost, description=description)
+        return function
+
+    return decorator
+
+
+def lookup(name):
+    try:
+        return registry[name]
+    except KeyError:
+        raise ValueError(f'Schema uses custom("{name}") but no custom check of that name is registered') from None
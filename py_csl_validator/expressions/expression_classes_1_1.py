@@ -5,20 +5,238 @@ import pathlib
 import hashlib
 import time
 import datetime
-import urllib.parse as up
-
-# third party
-import validators as v
+import itertools
+import threading
 
 # local
 from py_csl_validator.utils import expression_utils as eu
+from py_csl_validator.utils import memory_utils as mu
 
 
 # Schema
 class Expressions1_1:
 
+    # Object model #
+
+    class Node:
+        # Base of the compiled schema: column rules, validating and data-providing expressions. Nodes are slotted.
+        # Once the validator has planned a schema it freezes it, after which no field can be rebound (and list
+        # fields become tuples). State which changes while rows are validated lives in the run, see
+        # validator.ValidationRun, so a frozen schema can be shared by concurrent validations. A node pickles
+        # together with the nodes below it, as a flat list of classes and field values in post order (see
+        # __reduce__); derived fields are left out and rebuilt by derive() on load, so lookup tables and resolved
+        # custom checks never travel to worker processes.
+
+        __slots__ = ('_frozen', '_signature', '_pure')
+        derived = ()  # fields computed from the others by derive()
+        field_names = {}  # class -> (public slots, public slots which are pickled)
+        signatures = {}  # local signature -> number, see signature()
+        signature_lock = threading.Lock()
+        unique_numbers = itertools.count(-1, -1)  # numbers of nodes which only ever match themselves
+
+        @classmethod
+        def fields(cls, pickled=False):
+            try:
+                return Expressions1_1.Node.field_names[cls][pickled]
+            except KeyError:
+                names = tuple(name for klass in reversed(cls.__mro__) for name in vars(klass).get('__slots__', ())
+                              if not name.startswith('_'))
+                Expressions1_1.Node.field_names[cls] = names, tuple(name for name in names if name not in cls.derived)
+                return Expressions1_1.Node.field_names[cls][pickled]
+
+        def field_values(self):
+            return ((name, getattr(self, name, None)) for name in self.fields())
+
+        def derive(self):
+            pass
+
+        def signature(self):
+            # A small int standing for the node's structure, the same for every schema loaded in the process:
+            # structurally identical nodes share it. The local signature of a node holds the numbers of the nodes
+            # below it, so it stays flat however deeply the node is nested.
+            if getattr(self, '_frozen', False):
+                return self._signature
+
+            signatures = {}
+            for node in self.walk(post_order=True):
+                signatures[node] = node.numbered(signatures)
+
+            return signatures[self]
+
+        def numbered(self, signatures):
+            # the node's number given those of the nodes below it. A node which only ever matches itself (its local
+            # signature is None), or holds one, takes a negative number of its own rather than an entry in the
+            # table: the table only grows with the distinct structures loaded, not with every load of a schema.
+            if any(signatures[child] < 0 for child in self.child_nodes()):
+                return next(Expressions1_1.Node.unique_numbers)
+
+            local_signature = self.local_signature(signatures)
+            if local_signature is None:
+                return next(Expressions1_1.Node.unique_numbers)
+
+            return self.number(local_signature)
+
+        def local_signature(self, signatures):
+            # signatures holds the numbers of the nodes below this one; None if the node only matches itself
+            try:
+                return (type(self).__name__,) + tuple((name, self._signature_of(value, signatures))
+                                                      for name, value in sorted(self.field_values()))
+            except Expressions1_1.Incomparable:
+                return None
+
+        @staticmethod
+        def number(signature):
+            with Expressions1_1.Node.signature_lock:  # schemas may be loaded from several threads
+                return Expressions1_1.Node.signatures.setdefault(signature, len(Expressions1_1.Node.signatures))
+
+        @staticmethod
+        def _signature_of(value, signatures):
+            if isinstance(value, Expressions1_1.Node):
+                return signatures[value]
+            if isinstance(value, (list, tuple)):
+                return tuple(Expressions1_1.Node._signature_of(item, signatures) for item in value)
+            if isinstance(value, (set, frozenset)):
+                return frozenset(value)
+            if isinstance(value, dict):
+                return tuple((key, Expressions1_1.Node._signature_of(item, signatures))
+                             for key, item in sorted(value.items(), key=lambda item: repr(item[0])))
+
+            try:
+                hash(value)
+            except TypeError:
+                raise Expressions1_1.Incomparable from None  # unknown unhashable state: never considered identical
+
+            return value
+
+        def is_pure(self):
+            # for an expression, the verdict depends on the checked cell alone and for data, its value on the
+            # schema alone: no column references, no state, no filesystem access
+            if getattr(self, '_frozen', False):
+                return self._pure
+
+            return all(node.locally_pure() for node in self.walk())
+
+        def locally_pure(self):
+            return True
+
+        def child_nodes(self):
+            # the nodes held directly in this node's fields
+            for name, value in self.field_values():
+                for item in value if isinstance(value, (list, tuple)) else (value,):
+                    if isinstance(item, Expressions1_1.Node):
+                        yield item
+
+        def walk(self, children=None, post_order=False):
+            # this node and every node below it, each once; children(node) gives the nodes below a node and
+            # defaults to child_nodes. The walk keeps a stack of its own rather than recursing, so deeply nested
+            # schemas are not bound by the interpreter's recursion limit. post_order yields children ahead of
+            # their parents, otherwise nodes come in schema order.
+            children = children if children is not None else (lambda node: node.child_nodes())
+            visited = set()
+            pending = [(self, False)]
+            while pending:
+                node, expanded = pending.pop()
+                if expanded:
+                    yield node
+                    continue
+                if node in visited:
+                    continue
+
+                visited.add(node)
+                if post_order:
+                    pending.append((node, True))
+                else:
+                    yield node
+                pending.extend((child, False) for child in reversed(list(children(node))) if child not in visited)
+
+        def freeze(self):
+            # Bottom-up, so the signature and purity of a node are computed from those of the nodes below it as it
+            # is frozen: validation only reads them, nothing is written to a frozen node later. Subtrees which are
+            # frozen already are not walked again, unpickling freezes every node on its own.
+            if getattr(self, '_frozen', False):
+                return
+
+            def unfrozen(node):
+                return [child for child in node.child_nodes() if not getattr(child, '_frozen', False)]
+
+            for node in self.walk(unfrozen, post_order=True):
+                for name, value in node.field_values():
+                    if isinstance(value, list):
+                        object.__setattr__(node, name, tuple(value))
+
+                children = list(node.child_nodes())
+                node._signature = node.numbered({child: child._signature for child in children})
+                node._pure = node.locally_pure() and all(child._pure for child in children)
+                node._frozen = True
+
+        def __setattr__(self, name, value):
+            if name[0] != '_' and getattr(self, '_frozen', False):
+                raise AttributeError(f'{type(self).__name__}.{name} cannot be changed once the schema is frozen')
+
+            object.__setattr__(self, name, value)
+
+        def __reduce__(self):
+            # node fields refer to earlier entries of the flat list by position, so pickling a deeply nested schema
+            # does not recurse once per level. Nodes shared within the subtree stay shared.
+            nodes = list(self.walk(post_order=True))
+            positions = {node: Expressions1_1.NodeRef(i) for i, node in enumerate(nodes)}
+
+            def packed(value):
+                if isinstance(value, Expressions1_1.Node):
+                    return positions[value]
+                if isinstance(value, (list, tuple)):
+                    return type(value)(positions[item] if isinstance(item, Expressions1_1.Node) else item
+                                       for item in value)
+                return value
+
+            return Expressions1_1.Node.unpack, ([(type(node), tuple(packed(getattr(node, name, None))
+                                                                    for name in node.fields(pickled=True)),
+                                                  getattr(node, '_frozen', False)) for node in nodes],)
+
+        @staticmethod
+        def unpack(flat):
+            nodes = []
+
+            def unpacked(value):
+                if isinstance(value, Expressions1_1.NodeRef):
+                    return nodes[value.position]
+                if isinstance(value, (list, tuple)):
+                    return type(value)(nodes[item.position] if isinstance(item, Expressions1_1.NodeRef) else item
+                                       for item in value)
+                return value
+
+            for cls, values, frozen in flat:
+                node = cls.__new__(cls)
+                for name, value in zip(cls.fields(pickled=True), values):
+                    object.__setattr__(node, name, unpacked(value))
+
+                node.derive()
+                if frozen:
+                    node.freeze()  # the nodes below are frozen already
+                nodes.append(node)
+
+            return nodes[-1]
+
+
+    class Incomparable(Exception):  # a node holds state which cannot be compared, see Node.local_signature
+        pass
+
+
+    class NodeRef:  # a node's position in a pickled subtree, see Node.__reduce__
+
+        __slots__ = ('position',)
+
+        def __init__(self, position):
+            self.position = position
+
+        def __reduce__(self):
+            return Expressions1_1.NodeRef, (self.position,)
+
+
     class Schema:  # TODO: Should this be a ValidatingExpr?
 
+        __slots__ = ('prolog', 'body')
+
         def __init__(self, prolog, body):
             self.prolog = prolog
             self.body = body
@@ -27,6 +245,8 @@ class Expressions1_1:
     # Prolog #
     class Prolog:
 
+        __slots__ = ('version', 'global_directives')
+
         def __init__(self, version, global_directives):
             self.version = version
             self.global_directives = global_directives
@@ -34,6 +254,8 @@ class Expressions1_1:
 
     class GlobalDirectives:
 
+        __slots__ = ('directives',)
+
         def __init__(self, stack):
 
             self.directives = {
@@ -60,235 +282,437 @@ class Expressions1_1:
 
     class Body:
 
+        __slots__ = ('column_defs',)
+
         def __init__(self, column_defs):
             self.column_defs = column_defs
 
 
     class ColumnDefinition:
 
+        __slots__ = ('name', 'rule')
+
         def __init__(self, col_name, col_rule):
             self.name = col_name
             self.rule = col_rule
 
 
-    class ColumnRule:
+    class ColumnRule(Node):
+
+        __slots__ = ('col_vals', 'col_directives')
 
         def __init__(self, col_vals, col_directives):
             self.col_vals = col_vals
             self.col_directives = col_directives
+            for expression in col_vals:
+                for sub_expression in expression.all_expressions():
+                    sub_expression.prepare(col_directives['ignore_case'])
 
-        def validate_column(self, key, row, context):
+        def validate_column(self, key, row, context, skip_stateful=False):
             no_case = self.col_directives['ignore_case']
 
             valid = True
             report_level = 'w' if self.col_directives['warning'] else 'e'  # replace characters with enum
 
-            for expression in self.col_vals:  # TODO: handle parenthesized expressions
-                if expression.validate(key, row, context, ignore_case=no_case):
-                    if self.col_directives['match_is_false']:
-                        expression.report_error(report_level, key, row, context, ignore_case=no_case)
-                        valid = False
+            memos = context.memos.get(self)
+            if memos is None:
+                # per expression of col_vals, a mu.ValueMemo if it is pure
+                memos = context.memos[self] = [mu.ValueMemo() if expression.is_pure() else None
+                                               for expression in self.col_vals]
+
+            for expression, memo in zip(self.col_vals, memos):  # TODO: handle parenthesized expressions
+                if skip_stateful and expression.is_stateful():
+                    continue
+
+                if context.shared_results is None:
+                    result = self._evaluate(expression, memo, key, row, context, no_case)
                 else:
-                    if (row[key] == '' and self.col_directives['optional']) or self.col_directives['match_is_false']:
+                    result = self._shared_result(expression, memo, key, row, context, no_case)
+                if result:
+                    if not self.col_directives['match_is_false']:
                         continue
-                    else:
-                        expression.report_error(report_level, key, row, context, ignore_case=no_case)
-                        valid = False
+                elif (row[key] == '' and self.col_directives['optional']) or self.col_directives['match_is_false']:
+                    continue
+
+                result.report(report_level, key, row, context, ignore_case=no_case)
+                context.failure_counts[key][expression.label()] += 1
+                valid = False
+
+                if context.fail_fast:  # the planner puts the cheapest, most selective checks first
+                    break
 
             return valid
 
+        @staticmethod
+        def _evaluate(expression, memo, key, row, context, no_case):
+            if memo is not None and memo.active:
+                # a pure rule's verdict depends on the cell alone, so repeated values are validated once
+                result = memo.results.get(row[key])
+                if result is None:
+                    result = memo.add(row[key], expression.validate(key, row, context, ignore_case=no_case),
+                                      context.row_count)
+                return result
+
+            return expression.validate(key, row, context, ignore_case=no_case)
+
+        @staticmethod
+        def _shared_result(expression, memo, key, row, context, no_case):
+            # when one row is validated against several schemas, identical rules on the same column run only once
+            cache_key = (expression.signature(), key, no_case)
+            try:
+                return context.shared_results[cache_key]
+            except KeyError:
+                result = context.shared_results[cache_key] = \
+                    Expressions1_1.ColumnRule._evaluate(expression, memo, key, row, context, no_case)
+                return result
+
+
+    # Validation results #
+
+    class Result:  # built once by validate and consumed by report_error, so reporting never re-evaluates
+
+        __slots__ = ('expression', 'valid', 'operands', 'children')
+
+        def __init__(self, expression, valid, operands=(), children=()):
+            self.expression = expression
+            self.valid = bool(valid)
+            self.operands = operands
+            self.children = children
+
+        def __bool__(self):
+            return self.valid
+
+        def report(self, report_level, key, row, context, ignore_case=False):
+            self.expression.report_error(report_level, key, row, context, self, ignore_case=ignore_case)
+
 
     # Validating Expressions #
     # Expressions which are directly used to validate the document #
 
-    class ValidatingExpr:
+    class ValidatingExpr(Node):
+
+        __slots__ = ()
+        cost = 2  # static relative cost, see utils.planner_utils
+        stateful = False  # stateful expressions must see every row, so they are never reordered or skipped
+        external = False  # reads the filesystem, so its verdict can change while the CSV does not
 
         def validate(self, key, row, context, ignore_case=False):
             raise NotImplementedError
 
-        def report_error(self, report_level, key, row, context, ignore_case=False):
+        def report_error(self, report_level, key, row, context, result, ignore_case=False):
+            # records the failure; the message itself is only built by format_error when the errors are read
+            context.errors.add(context.row_count, key, report_level, self, row[key], result.operands, ignore_case)
+
+        def format_error(self, value, operands, ignore_case=False):
             raise NotImplementedError
 
+        def failure_kind(self, operands):
+            # distinguishes failures of one expression which call for different fixes, see eu.ErrorSummary
+            return None
+
+        def result(self, valid, *operands):
+            return Expressions1_1.Result(self, valid, operands)
+
+        def sub_expressions(self):
+            return []
+
+        def all_expressions(self, post_order=False):
+            # this expression and its sub-expressions at any depth, see Node.walk
+            return self.walk(lambda expression: expression.sub_expressions(), post_order=post_order)
+
+        def prepare(self, ignore_case):
+            # called once the column's directives are known, while the schema loads: expressions reading data from
+            # outside the schema get it ready there, so validating rows never has to
+            pass
+
+        def estimate_cost(self):
+            costs = {}
+            for expression in self.all_expressions(post_order=True):
+                costs[expression] = expression.local_cost(costs)
+
+            return costs[self]
+
+        def local_cost(self, costs):
+            # the cost of this expression given costs, those of its sub-expressions
+            return self.cost + sum(costs[expr] for expr in self.sub_expressions())
+
+        def is_stateful(self):
+            return any(expression.stateful for expression in self.all_expressions())
+
+        def locally_pure(self):
+            return not self.stateful and not self.external
+
+        def label(self):
+            return type(self).__name__
+
+        def local_signature(self, signatures):
+            # a stateful expression's verdict depends on the rows it has seen, so it only ever matches itself, and
+            # so does anything containing it
+            if self.stateful:
+                return None
+
+            return super().local_signature(signatures)
+
 
     class ColumnValidationExpr(ValidatingExpr):  # essentially a wrapper which makes checks for comb/noncomb expr easier
 
+        __slots__ = ('expression',)
+        cost = 0
+
         def __init__(self, expression):
             self.expression = expression
 
         def validate(self, key, row, context, ignore_case=False):
             return self.expression.validate(key, row, context, ignore_case=ignore_case)
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            self.expression.report_error(report_level, key, row, context, ignore_case=ignore_case)
+        def report_error(self, report_level, key, row, context, result, ignore_case=False):
+            result.report(report_level, key, row, context, ignore_case=ignore_case)
+
+        def sub_expressions(self):
+            return [self.expression]
+
+        def label(self):
+            return self.expression.label()
 
 
     class ParenthesizedExpr(ValidatingExpr):
 
+        __slots__ = ('expressions',)
+        cost = 0
+
         def __init__(self, expressions):
             self.expressions = expressions
 
-        def validate(self, key, row, context, ignore_case =False):
-            return all(expr.validate(key, row, context, ignore_case=ignore_case) for expr in self.expressions)
-        
-        def report_error(self, report_level, key, row, context, ignore_case=False):
+        def sub_expressions(self):
+            return self.expressions
+
+        def validate(self, key, row, context, ignore_case=False):
+            children = []
             for expression in self.expressions:
-                if not expression.validate(key, row, context, ignore_case):
-                    expression.report_error(report_level, key, row, context, ignore_case)
+                result = expression.validate(key, row, context, ignore_case=ignore_case)
+                children.append(result)
+                if not result:
+                    return Expressions1_1.Result(self, False, children=children)
+
+            return Expressions1_1.Result(self, True, children=children)
+        
+        def report_error(self, report_level, key, row, context, result, ignore_case=False):
+            for child in result.children:
+                if not child:
+                    child.report(report_level, key, row, context, ignore_case=ignore_case)
 
 
     class SingleExpr(ValidatingExpr):
 
+        __slots__ = ('expression', 'col_ref')
+        cost = 0
+
         def __init__(self, expression, col_ref):
             self.expression = expression
             self.col_ref = col_ref
 
+        def sub_expressions(self):
+            return [self.expression]
+
+        def label(self):
+            return self.expression.label()
+
         def validate(self, key, row, context, ignore_case=False):
             if self.col_ref:
-                return self.expression.validate(self.col_ref.evaluate(row, context),
-                                                row,
-                                                context,
-                                                ignore_case=ignore_case)
-            else:
-                return self.expression.validate(key, row, context, ignore_case=ignore_case)
+                key = self.col_ref.evaluate(row, context)
+
+            result = self.expression.validate(key, row, context, ignore_case=ignore_case)
+
+            return Expressions1_1.Result(self, result.valid, (key,), (result,))
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            if self.col_ref:
-                self.expression.report_error(report_level, self.col_ref.evaluate(row, context), row, context, ignore_case=ignore_case)
-            else:
-                self.expression.report_error(report_level, key, row, context, ignore_case=False)
+        def report_error(self, report_level, key, row, context, result, ignore_case=False):
+            checked_key, = result.operands
+            result.children[0].report(report_level, checked_key, row, context, ignore_case=ignore_case)
 
 
     class IsExpr(ValidatingExpr):
 
+        __slots__ = ('comparison',)
+
         def __init__(self, comparison):
             self.comparison = comparison
 
         def validate(self, key, row, context, ignore_case=False):
+            comparison = self.comparison.evaluate(row, context)
             if ignore_case:
-                valid = row[key].lower() == self.comparison.evaluate(row, context).lower()
+                valid = row[key].lower() == comparison.lower()
             else:
-                valid = row[key] == self.comparison.evaluate(row, context)
+                valid = row[key] == comparison
 
-            return valid
+            return self.result(valid, comparison)
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'IsExpr: {row[key]} not equivalent to {self.comparison.evaluate(row, context)}'
+        def format_error(self, value, operands, ignore_case=False):
+            comparison, = operands
+            msg = f'IsExpr: {value} not equivalent to {comparison}'
             if ignore_case:
                 msg += ' (case ignored)'
             
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
             
 
     class AnyExpr(ValidatingExpr):
 
+        __slots__ = ('comparisons', 'literals', 'dynamic', 'literal_set', 'literal_set_no_case')
+        derived = ('literals', 'dynamic', 'literal_set', 'literal_set_no_case')
+        cost = 2
+
         def __init__(self, comparisons):
             self.comparisons = comparisons
+            self.derive()
+
+        def derive(self):
+            # literal comparisons are hashed once at load time, only column-dependent ones are evaluated per cell
+            self.literals = tuple(comparison.val for comparison in self.comparisons if comparison.is_literal())
+            self.dynamic = [comparison for comparison in self.comparisons if not comparison.is_literal()]
+            self.literal_set = frozenset(self.literals)
+            self.literal_set_no_case = frozenset(literal.lower() for literal in self.literals)
+
+        def local_cost(self, costs):
+            return self.cost + len(self.dynamic)
 
         def validate(self, key, row, context, ignore_case=False):
+            val = row[key]
             if ignore_case:
-                valid = any([row[key].lower() == comparison.evaluate(row, context).lower() for comparison in self.comparisons])
+                val = val.lower()
+                valid = val in self.literal_set_no_case
             else:
-                valid = any([row[key] == comparison.evaluate(row, context) for comparison in self.comparisons])
+                valid = val in self.literal_set
 
-            return valid
+            if valid or not self.dynamic:
+                return self.result(valid, ())
 
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'AnyExpr: {row[key]} not equivalent to any of the following:'
-            for comparison in self.comparisons:
-                msg += f' {comparison.evaluate(row, context)}'
+            comparisons = [comparison.evaluate(row, context) for comparison in self.dynamic]
+            if ignore_case:
+                valid = any(val == comparison.lower() for comparison in comparisons)
+            else:
+                valid = val in comparisons
+
+            return self.result(valid, comparisons)
+
+        def format_error(self, value, operands, ignore_case=False):
+            dynamic_comparisons, = operands
+            msg = f'AnyExpr: {value} not equivalent to any of the following:'
+            for comparison in self.literals + tuple(dynamic_comparisons):
+                msg += f' {comparison}'
             
             if ignore_case:
                 msg += ' (case_ignored)'
             
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
 
 
     class NotExpr(ValidatingExpr):
 
+        __slots__ = ('comparison',)
+
         def __init__(self, comparison):
             self.comparison = comparison
 
         def validate(self, key, row, context, ignore_case=False):
+            comparison = self.comparison.evaluate(row, context)
             if ignore_case:
-                valid = row[key].lower() != self.comparison.evaluate(row, context).lower()
+                valid = row[key].lower() != comparison.lower()
             else:
-                valid = row[key] != self.comparison.evaluate(row, context)
+                valid = row[key] != comparison
 
-            return valid
+            return self.result(valid, comparison)
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'NotExpr: {row[key]} is equivalent to {self.comparison.evaluate(row, context)}'
+        def format_error(self, value, operands, ignore_case=False):
+            comparison, = operands
+            msg = f'NotExpr: {value} is equivalent to {comparison}'
             if ignore_case:
                 msg += ' (case ignored)'
             
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
 
 
     class InExpr(ValidatingExpr):
 
+        __slots__ = ('comparison',)
+
         def __init__(self, comparison):
             self.comparison = comparison
 
         def validate(self, key, row, context, ignore_case=False):
+            comparison = self.comparison.evaluate(row, context)
             if ignore_case:
-                valid = self.comparison.evaluate(row, context).lower() in row[key].lower()
+                valid = comparison.lower() in row[key].lower()
             else:
-                valid = self.comparison.evaluate(row, context) in row[key]
+                valid = comparison in row[key]
 
-            return valid
+            return self.result(valid, comparison)
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'InExpr: {row[key]} is a substring of {self.comparison.evaluate(row, context)}'
+        def format_error(self, value, operands, ignore_case=False):
+            comparison, = operands
+            msg = f'InExpr: {value} is a substring of {comparison}'
             if ignore_case:
                 msg += ' (case ignored)'
             
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
 
 
     class StartsWithExpr(ValidatingExpr):
 
+        __slots__ = ('comparison',)
+        cost = 2
+
         def __init__(self, comparison):
             self.comparison = comparison
 
         def validate(self, key, row, context, ignore_case=False):
+            comparison = self.comparison.evaluate(row, context)
             if ignore_case:
-                valid = re.match(f'^{self.comparison.evaluate(row, context).lower()}', row[key].lower())
+                valid = row[key].lower().startswith(comparison.lower())
             else:
-                valid = re.match(f'^{self.comparison.evaluate(row, context)}', row[key])
-
-            return valid
+                valid = row[key].startswith(comparison)
 
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'StartsWithExpr: {row[key]} begins with {self.comparison.evaluate(row, context)}'
+            return self.result(valid, comparison)
+        
+        def format_error(self, value, operands, ignore_case=False):
+            comparison, = operands
+            msg = f'StartsWithExpr: {value} begins with {comparison}'
             if ignore_case:
                 msg += ' (case ignored)'
             
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
 
 
     class EndsWithExpr(ValidatingExpr):
 
+        __slots__ = ('comparison',)
+        cost = 2
+
         def __init__(self, comparison):
             self.comparison = comparison
 
         def validate(self, key, row, context, ignore_case=False):
+            comparison = self.comparison.evaluate(row, context)
             if ignore_case:
-                valid = re.match(f'{self.comparison.evaluate(row, context).lower()}$', row[key].lower())
+                valid = row[key].lower().endswith(comparison.lower())
             else:
-                valid = re.match(f'{self.comparison.evaluate(row, context)}$', row[key])
+                valid = row[key].endswith(comparison)
 
-            return valid
+            return self.result(valid, comparison)
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'EndsWithExpr: {row[key]} ends with {self.comparison.evaluate(row, context)}'
+        def format_error(self, value, operands, ignore_case=False):
+            comparison, = operands
+            msg = f'EndsWithExpr: {value} ends with {comparison}'
             if ignore_case:
                 msg += ' (case ignored)'
             
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
 
 
     class RegExpExpr(ValidatingExpr):  # TODO: FIGURE OUT HOW TO EMULATE JAVA'S PATTERN CLASS
 
+        __slots__ = ('pattern',)
+        cost = 5
+
         def __init__(self, pattern):
             self.pattern = pattern
 
@@ -298,6 +722,9 @@ class Expressions1_1:
 
     class RangeExpr(ValidatingExpr):
 
+        __slots__ = ('start', 'end')
+        cost = 3
+
         def __init__(self, start, end):
             self.start = start if start != '*' else -float('inf')
             self.end = end if end != '*' else float('inf')
@@ -308,16 +735,19 @@ class Expressions1_1:
             except ValueError:
                 valid = False
 
-            return valid
+            return self.result(valid)
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'RangeExpr: {row[key]} is not a number between {self.start} and {self.end}'
+        def format_error(self, value, operands, ignore_case=False):
+            msg = f'RangeExpr: {value} is not a number between {self.start} and {self.end}'
 
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
 
 
     class LengthExpr(ValidatingExpr):
 
+        __slots__ = ('start', 'end')
+        cost = 1
+
         def __init__(self, start, end):
             self.start = start if start != '*' else -float('inf')
             self.end = end if end != '*' else float('inf')
@@ -328,106 +758,112 @@ class Expressions1_1:
             else:
                 valid = self.start <= len(row[key]) <= self.end
 
-            return valid
+            return self.result(valid)
 
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'LengthExpr: Length of {row[key]} is not between {self.start} and {self.end}'
+        def format_error(self, value, operands, ignore_case=False):
+            msg = f'LengthExpr: Length of {value} is not between {self.start} and {self.end}'
 
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
 
 
     class EmptyExpr(ValidatingExpr):  # TODO: Pass for behavior
 
+        __slots__ = ()
+        cost = 1
+
         def validate(self, key, row, context, ignore_case=False):
             valid = row[key] == ''
 
-            return valid
+            return self.result(valid)
 
-        def report_error(self, report_level, key, row, context, ignore_case=False):
+        def format_error(self, value, operands, ignore_case=False):
             msg = f'EmptyExpr: Column is not empty'
 
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
 
 
     class NotEmptyExpr(ValidatingExpr):  # TODO: Pass for behavior
 
+        __slots__ = ()
+        cost = 1
+
         def validate(self, key, row, context, ignore_case=False):
             valid = row[key] != ''
 
-            return valid
+            return self.result(valid)
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
+        def format_error(self, value, operands, ignore_case=False):
             msg = f'NotEmptyExpr: Column is empty'
 
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
             
 
     class UniqueExpr(ValidatingExpr):
 
+        __slots__ = ('columns',)
+        cost = 4
+        stateful = True
+
         def __init__(self, columns):
             self.columns = columns
-            self.seen = set()
 
         def validate(self, key, row, context, ignore_case=False):
             if self.columns:
-                combination = [row[col] for col in self.columns]
+                combination = tuple(row[col.evaluate(row, context)] for col in self.columns)
                 if ignore_case:
-                    combination = [val.lower() for val in combination]
-
-                if combination not in self.seen:
-                    valid = True
-                    self.seen.add(combination)
-                else:
-                    valid = False
+                    combination = tuple(val.lower() for val in combination)
             else:
-                val = row[key]
+                combination = row[key]
                 if ignore_case:
-                    val = val.lower()
+                    combination = combination.lower()
 
-                if val not in self.seen:
-                    valid = True
-                    self.seen.add(val)
-                else:
-                    valid = False
+            seen = context.expression_state.get(self)
+            if seen is None:
+                seen = context.expression_state[self] = mu.SeenValues()  # spills to disk past the memory budget
 
-            return valid
+            valid = seen.add(combination, context.memory, f'UniqueExpr({key})')
+            if valid and context.shard_state is not None:
+                context.shard_state.first_seen(self, combination, context.row_count, row[key])
+
+            return self.result(valid, combination)
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
+        def format_error(self, value, operands, ignore_case=False):
+            combination, = operands
             msg = 'UniqueExpr:'
             if self.columns:
-                msg = ' Combination ['
-                for col in self.columns:
-                    msg += f'{row[col]}, '
-                msg += '] is not unique'
+                msg += f' Combination [{", ".join(combination)}] is not unique'
             else:
-                msg += f' Value {row[key]} is not unique'
+                msg += f' Value {value} is not unique'
             
             if ignore_case:
                 msg += ' (case ignored)'
             
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
 
 
     class UriExpr(ValidatingExpr):
 
+        __slots__ = ()
+        cost = 6
+
         def validate(self, key, row, context, ignore_case=False):
-            valid = True
-            try:
-                uri = up.urlparse(row[key])
-                uri.port  # checks for an invalid port because for some reason this is what it takes
-            except ValueError:
-                valid = False
+            val = row[key]
+            valid = eu.URI_REFERENCE.fullmatch(val) is not None and \
+                ('%' not in val or eu.INVALID_PERCENT_ENCODING.search(val) is None)
 
-            return valid
+            return self.result(valid)
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'UriExpr: {row[key]} could not be parsed as a uri.'
+        def format_error(self, value, operands, ignore_case=False):
+            msg = f'UriExpr: {value} could not be parsed as a uri.'
 
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
 
 
     class XsdDateTimeExpr(ValidatingExpr):
 
+        __slots__ = ('start', 'end', 'start_comp', 'end_comp')
+        cost = 8
+
         def __init__(self, start, end):
             self.start = start
             self.end = end
@@ -454,22 +890,25 @@ class Expressions1_1:
                 if self.start and self.end:
                     val = val.replace('Z', '+00:00')
                     val = datetime.datetime.fromisoformat(val)
-                    return self.start_comp <= val <= self.end_comp
+                    return self.result(self.start_comp <= val <= self.end_comp)
             
-            return is_datetime
+            return self.result(is_datetime)
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'XsdDateTimeExpr: {row[key]} could not be parsed as an XSD datetime'
+        def format_error(self, value, operands, ignore_case=False):
+            msg = f'XsdDateTimeExpr: {value} could not be parsed as an XSD datetime'
             if self.start and self.end:
                 msg += f' or did not fall between {self.start} and {self.end}'
             if ignore_case:
                 msg +=  ' (case ignored)'
 
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
                     
 
     class XsdDateTimeWithTimezoneExpr(ValidatingExpr):
 
+        __slots__ = ('start', 'end', 'start_comp', 'end_comp')
+        cost = 8
+
         def __init__(self, start, end):
             self.start = start
             self.end = end
@@ -497,22 +936,25 @@ class Expressions1_1:
                 if self.start and self.end:
                     val = val.replace('Z', '+00:00')
                     val = datetime.datetime.fromisoformat(val)
-                    return self.start_comp <= val <= self.end_comp
+                    return self.result(self.start_comp <= val <= self.end_comp)
             
-            return is_datetime
+            return self.result(is_datetime)
 
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'XsdDateTimeWithTimezoneExpr: {row[key]} could not be parsed as an XSD datetime with timezone'
+        def format_error(self, value, operands, ignore_case=False):
+            msg = f'XsdDateTimeWithTimezoneExpr: {value} could not be parsed as an XSD datetime with timezone'
             if self.start and self.end:
                 msg += f' or did not fall between {self.start} and {self.end}'
             if ignore_case:
                 msg +=  ' (case ignored)'
 
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
 
 
     class XsdDateExpr(ValidatingExpr):
 
+        __slots__ = ('start', 'end', 'start_comp', 'end_comp')
+        cost = 8
+
         def __init__(self, start, end):
             self.start = start
             self.end = end
@@ -533,22 +975,25 @@ class Expressions1_1:
             if is_date:
                 if self.start and self.end:
                     val = datetime.datetime.fromisoformat(val)
-                    return self.start_comp <= val <= self.end_comp
+                    return self.result(self.start_comp <= val <= self.end_comp)
             
-            return is_date
+            return self.result(is_date)
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'XsdDateExpr: {row[key]} could not be parsed as an XSD date'
+        def format_error(self, value, operands, ignore_case=False):
+            msg = f'XsdDateExpr: {value} could not be parsed as an XSD date'
             if self.start and self.end:
                 msg += f' or did not fall between {self.start} and {self.end}'
             if ignore_case:
                 msg +=  ' (case ignored)'
 
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
 
 
     class XsdTimeExpr(ValidatingExpr):
 
+        __slots__ = ('start', 'end', 'start_comp', 'end_comp')
+        cost = 8
+
         def __init__(self, start, end):
             self.start = start
             self.end = end
@@ -573,22 +1018,25 @@ class Expressions1_1:
                 if self.start and self.end:
                     val = val.replace('Z', '+00:00')
                     val = time.strptime(self.start, '%H:%M:%S%z')
-                    return self.start_comp <= val <= self.end_comp
+                    return self.result(self.start_comp <= val <= self.end_comp)
             
-            return is_time
+            return self.result(is_time)
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'XsdDateTimeExpr: {row[key]} could not be parsed as an XSD time with timezone'
+        def format_error(self, value, operands, ignore_case=False):
+            msg = f'XsdDateTimeExpr: {value} could not be parsed as an XSD time with timezone'
             if self.start and self.end:
                 msg += f' or did not fall between {self.start} and {self.end}'
             if ignore_case:
                 msg +=  ' (case ignored)'
 
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
 
 
     class UkDateExpr(ValidatingExpr):
 
+        __slots__ = ('start', 'end')
+        cost = 8
+
         def __init__(self, start, end):
             self.start = start
             self.end = end
@@ -599,6 +1047,9 @@ class Expressions1_1:
 
     class DateExpr(ValidatingExpr):
 
+        __slots__ = ('year', 'month', 'day', 'start', 'end')
+        cost = 8
+
         def __init__(self, year, month, day, start, end):
             self.year = year
             self.month = month
@@ -612,12 +1063,18 @@ class Expressions1_1:
 
     class PartialUkDateExpr(ValidatingExpr):
 
+        __slots__ = ()
+        cost = 8
+
         def validate(self, val):
             pass
 
 
     class PartialDateExpr(ValidatingExpr):
 
+        __slots__ = ('year', 'month', 'day')
+        cost = 8
+
         def __init__(self, year, month, day):
             self.year = year
             self.month = month
@@ -629,91 +1086,103 @@ class Expressions1_1:
 
     class Uuid4Expr(ValidatingExpr):
 
+        __slots__ = ()
+        cost = 6
+
         def validate(self, key, row, context, ignore_case=False):
-            try:
-                if ignore_case:
-                    valid = v.uuid(row[key].lower())
-                else:
-                    valid = v.uuid(row[key])
-            except v.ValidationFailure:
-                valid = False
+            # lower case hex, as the schema language requires unless @ignoreCase is given
+            val = row[key].lower() if ignore_case else row[key]
 
-            return valid
+            return self.result(eu.UUID4.fullmatch(val) is not None)
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'Uuid4Expr: {row[key]} is not a valid UUID4'
+        def format_error(self, value, operands, ignore_case=False):
+            msg = f'Uuid4Expr: {value} is not a valid UUID4'
 
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
 
 
     class PositiveIntegerExpr(ValidatingExpr):
 
+        __slots__ = ()
+        cost = 3
+
         def validate(self, key, row, context, ignore_case=False):
-            try:
-                val = float(row[key])
-                valid = val.is_integer() and val >= 0
-            except ValueError: 
-                valid = False
-            
-            return valid
+            val = row[key]
+
+            return self.result(val.isdigit() and val.isascii())  # plain digits, zero included
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'PositiveIntegerExpr: {row[key]} is not a positive integer'
+        def format_error(self, value, operands, ignore_case=False):
+            msg = f'PositiveIntegerExpr: {value} is not a positive integer'
 
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
                 
 
     class UppercaseExpr(ValidatingExpr):
 
+        __slots__ = ()
+        cost = 3
+
         def validate(self, key, row, context, ignore_case=False):  # TODO: what to do if ignore case?
             valid = all([c.isupper() for c in row[key]])
 
-            return valid
+            return self.result(valid)
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'UppercaseExpr: {row[key]} is not all uppercase'
+        def format_error(self, value, operands, ignore_case=False):
+            msg = f'UppercaseExpr: {value} is not all uppercase'
 
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
 
 
     class LowercaseExpr(ValidatingExpr):
 
+        __slots__ = ()
+        cost = 3
+
         def validate(self, key, row, context, ignore_case=False):  # TODO: what to do if ignore case?
             valid = all([c.islower() for c in row[key]])
 
-            return valid
+            return self.result(valid)
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'UppercaseExpr: {row[key]} is not all uppercase'
+        def format_error(self, value, operands, ignore_case=False):
+            msg = f'UppercaseExpr: {value} is not all uppercase'
 
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
         
 
     class IdenticalExpr(ValidatingExpr):
 
-        def __init__(self):
-            self.comparison = None
+        __slots__ = ()
+        cost = 2
+        stateful = True
 
         def validate(self, key, row, context, ignore_case=False):
             temp_val = row[key].lower() if ignore_case else row[key]
-            if self.comparison is None:
-                self.comparison = temp_val
+            comparison = context.expression_state.get(self)  # the run's first value
+            if comparison is None:
+                context.expression_state[self] = temp_val
                 valid = True
             else:
-                valid = temp_val == self.comparison
+                valid = temp_val == comparison
 
-            return valid
+            if valid and context.shard_state is not None:
+                context.shard_state.matched(self, context.row_count, row[key])
+
+            return self.result(valid)
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'IdenticalExpr: {row[key]} deviates from previous column values'
+        def format_error(self, value, operands, ignore_case=False):
+            msg = f'IdenticalExpr: {value} deviates from previous column values'
             if ignore_case:
                 msg += ' (case ignored)'
             
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
 
 
     class FileExistsExpr(ValidatingExpr):
 
+        __slots__ = ('prefix',)
+        cost = 50
+        external = True
+
         def __init__(self, prefix):
             self.prefix = prefix
 
@@ -723,28 +1192,31 @@ class Expressions1_1:
                 curr_prefix = self.prefix.evaluate(row, context)
                 path = pathlib.Path(curr_prefix).joinpath(path)
 
+            if context.external_paths is not None:
+                context.external_paths.add(path)
+
+            checked_path = path
             if ignore_case:
-                path = eu.find_path_from_caseless(path)
+                checked_path = eu.find_path_from_caseless(path)
             
-            valid = path.exists() if path is not None else False
+            valid = checked_path.exists() if checked_path is not None else False
 
-            return valid
+            return self.result(valid, path)
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            path = pathlib.Path(row[key])
-            if self.prefix is not None and not path.is_absolute():
-                curr_prefix = self.prefix.evaluate(row, context)
-                path = pathlib.Path(curr_prefix).joinpath(path)
-            
+        def format_error(self, value, operands, ignore_case=False):
+            path, = operands
             msg = f'FileExistsExpr: {path} is not an extant path'
             if ignore_case:
                 msg += ' (case ignored)'
             
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
 
 
     class IntegrityCheckExpr(ValidatingExpr):
 
+        __slots__ = ('prefix', 'subfolder', 'folder_specification')
+        cost = 500
+
         def __init__(self, prefix, subfolder, folder_specification):
             self.prefix = prefix if prefix else ''
             self.subfolder = subfolder if subfolder else 'content'
@@ -768,20 +1240,27 @@ class Expressions1_1:
 
     class ChecksumExpr(ValidatingExpr):
 
+        __slots__ = ('file_path', 'algorithm')
+        cost = 1000
+        external = True
+
         def __init__(self, file_path, algorithm):
             self.file_path = file_path
             self.algorithm = algorithm.lower()
 
         def validate(self, key, row, context, ignore_case=False):
             if self.algorithm not in hashlib.algorithms_available:
-                return False
+                return self.result(False, None, 'algorithm')
                 # TODO: Move to load-time errors
             
             path = pathlib.Path(self.file_path.evaluate(row, context))
+            if context.external_paths is not None:
+                context.external_paths.add(path)
             if ignore_case:
-                path = eu.find_path_from_caseless(path)
-                if not path:
-                    return False
+                found_path = eu.find_path_from_caseless(path)
+                if not found_path:
+                    return self.result(False, path, 'caseless')
+                path = found_path
             
             try:
                 with open(path, mode='rb') as infile:
@@ -795,165 +1274,220 @@ class Expressions1_1:
                         checksum = checksum.lower()
                     
                     valid = file_hash == checksum
-            except FileNotFoundError as e:
-                valid = False
+            except OSError:
+                return self.result(False, path, 'missing')
             
-            return valid
+            return self.result(valid, path, 'mismatch')
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            if self.algorithm not in hashlib.algorithms_available:
+        def failure_kind(self, operands):
+            return operands[1]
+
+        def format_error(self, value, operands, ignore_case=False):
+            path, reason = operands
+            if reason == 'algorithm':
                 msg = f'ChecksumExpr: {self.algorithm} not available with this interpeter'
                 # TODO: Move to load-time errors
-            else:
-                path = pathlib.Path(self.file_path.evaluate(row, context))
+            elif reason == 'caseless':
+                msg = f'ChecksumExpr: {path} does not correspond to a case-ignored path'
+            elif reason == 'missing':
+                msg = f'ChecksumExpr: {path} not found in filesystem'
                 if ignore_case:
-                    path = eu.find_path_from_caseless(path)
-                
-                if path is None:
-                    msg = f'ChecksumExpr: {self.file_path.evaluate(row, context)} does not correspond to a case-ignored path'
-                elif not path.exists():
-                    msg =f'ChecksumExpr: {"".join(path.parts)} not found in filesystem'
-                    if ignore_case:
-                        msg += ' (case ignored)'
-                else:
-                    msg = f'ChecksumExpr: {"".join(path.parts)} {self.algorithm} checksum does not match.'
+                    msg += ' (case ignored)'
+            else:
+                msg = f'ChecksumExpr: {path} {self.algorithm} checksum does not match.'
 
-                context.errors[context.row_count][key][report_level].append(msg)
+            return msg
                 
                     
     class FileCountExpr(ValidatingExpr):
 
+        __slots__ = ('file_path',)
+        cost = 200
+        external = True
+
         def __init__(self, file_path):
             self.file_path = file_path
 
         def validate(self, key, row, context, ignore_case=False):
             path = pathlib.Path(self.file_path.evaluate(row, context))
+            if context.external_paths is not None:
+                context.external_paths.add(path)
             if ignore_case:
-                path = eu.find_path_from_caseless(path)
-                if path is None:
-                    return False
+                found_path = eu.find_path_from_caseless(path)
+                if found_path is None:
+                    return self.result(False, path, 'caseless')
+                path = found_path
             
-            valid = len(os.listdir(path)) == float(row[key])
+            try:
+                valid = len(os.listdir(path)) == float(row[key])
+            except (OSError, ValueError):
+                valid = False
 
-            return valid
+            return self.result(valid, path, 'count')
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            path = pathlib.Path(self.file_path.evaluate(row, context))
-            if ignore_case:
-                path = eu.find_path_from_caseless(path)
-                if path is None:
-                    msg = f'FileCountExpr: {self.file_path.evaluate(row, context)} does not correspond to a case-ignored path'
+        def failure_kind(self, operands):
+            return operands[1]
 
-            msg = f'FileCountExpr: {self.file_path.evaluate(row, context)} did not contain {row[key]} files at check time'
-            if ignore_case:
-                msg += ' (case ignored)'
+        def format_error(self, value, operands, ignore_case=False):
+            path, reason = operands
+            if reason == 'caseless':
+                msg = f'FileCountExpr: {path} does not correspond to a case-ignored path'
+            else:
+                msg = f'FileCountExpr: {path} did not contain {value} files at check time'
+                if ignore_case:
+                    msg += ' (case ignored)'
             
-            context.errors[context.row_count][key][report_level].append(msg)
+            return msg
                 
 
     class OrExpr(ValidatingExpr):
 
+        __slots__ = ('expressions',)
+        cost = 0
+
         def __init__(self, expressions):
             self.expressions = expressions
-            self.flags = None
 
         def validate(self, key, row, context, ignore_case=False):
-            self.flags = []
+            # short-circuits on the first passing branch
+            children = []
             for expression in self.expressions:
-                self.flags.append(expression.validate(key, row, context, ignore_case=ignore_case))
+                result = expression.validate(key, row, context, ignore_case=ignore_case)
+                children.append(result)
+                if result:
+                    return Expressions1_1.Result(self, True, children=children)
 
-            return any(flags)
+            return Expressions1_1.Result(self, False, children=children)
+
+        def sub_expressions(self):
+            return self.expressions
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'OrExpr: {row[key]} failed to validate against all included expressions. See other errors for details.'
-            for expression in self.expressions:
-                expression.report_error(report_level, key, row, context, ignore_case=False)
-            
-            context.errors[context.row_count][key][report_level].append(msg)
+        def report_error(self, report_level, key, row, context, result, ignore_case=False):
+            for child in result.children:
+                if not child:
+                    child.report(report_level, key, row, context, ignore_case=ignore_case)
+
+            context.errors.add(context.row_count, key, report_level, self, row[key], (), ignore_case)
+
+        def format_error(self, value, operands, ignore_case=False):
+            msg = f'OrExpr: {value} failed to validate against all included expressions. See other errors for details.'
+
+            return msg
 
 
     class AndExpr(ValidatingExpr):
 
+        __slots__ = ('expressions', 'schema_positions')
+        cost = 0
+        msg_prefix = 'AndExpr'
+        msg_suffix = '. See other errors for details.'
+
         def __init__(self, expressions):
             self.expressions = expressions
-            self.flags = None
+            self.schema_positions = list(range(1, len(expressions) + 1))  # of expressions, kept by the planner
 
         def validate(self, key, row, context, ignore_case=False):
-            self.flags = []
+            # short-circuits on the first failing branch
+            children = []
             for expression in self.expressions:
-                self.flags.append(expression.validate(key, row, context, ignore_case=ignore_case))
+                result = expression.validate(key, row, context, ignore_case=ignore_case)
+                children.append(result)
+                if not result:
+                    return Expressions1_1.Result(self, False, children=children)
 
-            return all(flags)
+            return Expressions1_1.Result(self, True, children=children)
+
+        def sub_expressions(self):
+            return self.expressions
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'AndExpr: {row[key]} failed to validate against expressions:'
-            for i in range(len(self.flags)):
-                if not self.flags[i]:
-                    msg += f' {i + 1} (type: {type(self.expressions[i].__name__)})'
-            msg += '. See other errors for details.'
+        def report_error(self, report_level, key, row, context, result, ignore_case=False):
+            failed = []
+            for position, child in zip(self.schema_positions, result.children):
+                if not child:
+                    failed.append((position, child.expression.label()))
+                    child.report(report_level, key, row, context, ignore_case=ignore_case)
 
-            for expression in self.expressions:
-                expression.report_error(report_level, key, row, context, ignore_case=ignore_case)
-            
-            context.errors[context.row_count][key][report_level].append(msg)
+            context.errors.add(context.row_count, key, report_level, self, row[key], tuple(sorted(failed)),
+                               ignore_case)
+
+        def format_error(self, value, operands, ignore_case=False):
+            msg = f'{self.msg_prefix}: {value} failed to validate against expressions:'
+            for position, label in operands:
+                msg += f' {position} (type: {label})'
+            msg += self.msg_suffix
+
+            return msg
 
 
     class IfExpr(ValidatingExpr):
 
+        __slots__ = ('condition', 'if_clause', 'else_clause')
+        cost = 0
+
         def __init__(self, condition, if_clause, else_clause):
             self.condition = condition
             self.if_clause = if_clause
             self.else_clause = else_clause
-            self.if_flag = None
-            self.else_flag = None
 
         def validate(self, key, row, context, ignore_case=False):
-            self.if_flag = False
-            self.else_flag = True
-
-            self.condition.validate(key, row, context, ignore_case=ignore_case)
-            if self.condition:
-                self.if_flag = True
-                val = self.if_clause.validate(key, row, context, ignore_case=ignore_case)
+            # only the branch selected by the condition is evaluated
+            condition = self.condition.validate(key, row, context, ignore_case=ignore_case)
+            if condition:
+                branch = self.if_clause.validate(key, row, context, ignore_case=ignore_case)
+            elif self.else_clause:
+                branch = self.else_clause.validate(key, row, context, ignore_case=ignore_case)
             else:
-                self.else_flag = True
-                val = False
-                if self.else_clause:
-                    val = self.else_clause.validate(key, row, context, ignore_case=ignore_case)
+                return Expressions1_1.Result(self, True, children=(condition,))
             
-            return val
+            return Expressions1_1.Result(self, branch.valid, children=(condition, branch))
+
+        def sub_expressions(self):
+            return [expr for expr in (self.condition, self.if_clause, self.else_clause) if expr is not None]
+
+        def local_cost(self, costs):
+            branches = [costs[self.if_clause]]
+            if self.else_clause:
+                branches.append(costs[self.else_clause])
+
+            return costs[self.condition] + max(branches)
         
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            if self.if_flag:
-                msg = f'IfExpr: Condition met. {row[key]} failed to validate against if clause. See other errors for details.'
-                self.if_clause.report_error(report_level, key, row, context, ignore_case=ignore_case)
-            if self.else_flag:
-                if self.else_clause:
-                    msg = f'IfExpr: Condition not met. {row[key]} failed to validate against else clause. See other errors for details.'
-                    self.else_clause.report_error(report_level, key, row, context, ignore_case=ignore_case)
-                else:
-                    msg = f'IfExpr: Condition not met, but no else clause provided. {row[key]} failed to validate.'
-            
-            context.errors[context.row_count][key][report_level].append(msg)
+        def report_error(self, report_level, key, row, context, result, ignore_case=False):
+            if len(result.children) == 1:
+                # condition not met and no else clause: the expression passed, which only fails under @matchIsFalse,
+                # and the condition is the reason it did
+                condition, = result.children
+                condition.report(report_level, key, row, context, ignore_case=ignore_case)
+                context.errors.add(context.row_count, key, report_level, self, row[key], (None,), ignore_case)
+                return
+
+            condition, branch = result.children
+            branch.report(report_level, key, row, context, ignore_case=ignore_case)
+
+            context.errors.add(context.row_count, key, report_level, self, row[key], (condition.valid,), ignore_case)
+
+        def format_error(self, value, operands, ignore_case=False):
+            condition_met, = operands
+            if condition_met is None:
+                msg = f'IfExpr: Condition not met and there is no else clause, so {value} validated. See other errors for details.'
+            elif condition_met:
+                msg = f'IfExpr: Condition met. {value} failed to validate against if clause. See other errors for details.'
+            else:
+                msg = f'IfExpr: Condition not met. {value} failed to validate against else clause. See other errors for details.'
 
+            return msg
 
-    class IfClause(AndExpr):
 
-        def report_error(self, report_level, key, row, context, ignore_case=False):
-            msg = f'IfClause: {row[key]} failed to validate against expressions:'
-            for i in range(len(self.flags)):
-                if not self.flags[i]:
-                    msg += f' {i + 1} (type: {type(self.expressions[i].__name__)})'
-            msg += '. See other errors for details. This may be the if or else clause of the parent IfExpr.'
+    class IfClause(AndExpr):
 
-            for expression in self.expressions:
-                expression.report_error(report_level, key, row, context, ignore_case=ignore_case)
-            
-            context.errors[context.row_count][key][report_level].append(msg)
+        __slots__ = ()
+        msg_prefix = 'IfClause'
+        msg_suffix = '. See other errors for details. This may be the if or else clause of the parent IfExpr.'
 
 
     class SwitchExpr(ValidatingExpr):
 
+        __slots__ = ('cases', 'else_clause')
+
         def __init__(self, cases, else_clause):
             self.cases = cases
             self.else_clause = else_clause
@@ -964,6 +1498,8 @@ class Expressions1_1:
 
     class SwitchCaseExpr(ValidatingExpr):
 
+        __slots__ = ('condition', 'if_clause')
+
         def __init__(self, condition, if_clause):
             self.condition = condition
             self.if_clause = if_clause
@@ -976,6 +1512,8 @@ class Expressions1_1:
 
     class ColumnDirectives:
 
+        __slots__ = ('directives',)
+
         def __init__(self, stack):
             self.directives = {
                 'optional': False,
@@ -991,51 +1529,119 @@ class Expressions1_1:
     # Data-providing expressions #
 
 
-    class DataExpr:
+    class DataExpr(Node):
+
+        __slots__ = ('dependencies',)
+        derived = ('dependencies',)
+        memoize = False  # memoized expressions are computed at most once per row, see ValidationRun.row_cache
+
+        def derive(self):
+            # the memoized data expressions below this one, each after those it depends on. The order is fixed at
+            # load, so a row computes them in turn rather than rediscovering it by recursing through the subtree.
+            dependencies = {}
+            for child in self.child_nodes():
+                if isinstance(child, Expressions1_1.DataExpr):
+                    dependencies.update(dict.fromkeys(child.dependencies))
+                    if child.memoize:
+                        dependencies[child] = None
+            self.dependencies = tuple(dependencies)
 
         def evaluate(self, row, context):
+            if not self.memoize:
+                return self.compute(row, context)
+
+            row_cache = context.row_cache
+            try:
+                return row_cache[self]
+            except KeyError:
+                pass
+
+            # only computed when a rule asks for this value, but then its dependencies are found in the row cache
+            for dependency in self.dependencies:
+                if dependency not in row_cache:
+                    row_cache[dependency] = dependency.compute(row, context)
+            val = row_cache[self] = self.compute(row, context)
+            return val
+
+        def compute(self, row, context):
             raise NotImplementedError
 
+        def is_literal(self):
+            return False
+
 
     # special case - column-ref, is a wrapper used for type-checking
     class ColumnRef(DataExpr):
 
-        def __init__(self, column):
+        __slots__ = ('column', 'key')
+
+        def __init__(self, column, ignore_column_name_case=False):
             self.column = column
+            self.key = column.lower() if ignore_column_name_case else column  # resolved once at load
+            self.derive()
 
         def evaluate(self, row, context):
-            return self.column.lower() if context.global_directives['ignore_column_name_case'] else self.column
+            return self.key
+
+        def local_signature(self, signatures):
+            return 'ColumnRef', self.key
+
+        def locally_pure(self):
+            return False
 
 
     class StringProvider(DataExpr):
 
+        __slots__ = ('val',)
+
         def __init__(self, val):
             self.val = val
+            self.derive()
+
+        def local_signature(self, signatures):
+            return 'StringProvider', self.val if self.is_literal() else signatures[self.val]
 
         def evaluate(self, row, context):
-            if isinstance(self.val, ColumnRef):
+            if isinstance(self.val, Expressions1_1.ColumnRef):
                 return row[self.val.evaluate(row, context)]  # a column ref in a string provider should produce the text in said column
-            if isinstance(self.val, DataExpr):
+            if isinstance(self.val, Expressions1_1.DataExpr):
                 return self.val.evaluate(row, context)
             else:
                 return self.val
+
+        def is_literal(self):
+            return isinstance(self.val, str)
             
 
     class ConcatExpr(DataExpr):
 
+        __slots__ = ('string_providers',)
+        memoize = True
+
         def __init__(self, string_providers):
             self.string_providers = string_providers
+            self.derive()
 
-        def evaluate(self, row, context):
+        def local_signature(self, signatures):
+            return 'ConcatExpr', tuple(signatures[provider] for provider in self.string_providers)
+
+        def compute(self, row, context):
             return ''.join([provider.evaluate(row, context) for provider in self.string_providers])
 
 
     class NoExtExpr(DataExpr):
 
+        __slots__ = ('string_provider',)
+        memoize = True
+
         def __init__(self, string_provider):
             self.string_provider = string_provider
+            self.derive()
 
-        def evaluate(self, row, context):
+        def local_signature(self, signatures):
+            return 'NoExtExpr', signatures[self.string_provider]
+
+        def compute(self, row, context):
             val = self.string_provider.evaluate(row, context)
             period_index = val.rfind('.')
             if period_index >= 0:
@@ -1046,11 +1652,19 @@ class Expressions1_1:
 
     class FileExpr(DataExpr):
 
+        __slots__ = ('prefix', 'file_path')
+        memoize = True
+
         def __init__(self, prefix, file_path):
             self.prefix = prefix
             self.file_path = file_path
+            self.derive()
 
-        def evaluate(self, row, context):
+        def local_signature(self, signatures):
+            prefix = signatures[self.prefix] if self.prefix is not None else None
+            return 'FileExpr', prefix, signatures[self.file_path]
+
+        def compute(self, row, context):
             if self.prefix is not None:
                 curr_prefix = self.prefix.evaluate(row, context)
                 curr_path = self.file_path.evaluate(row, context)
@@ -1,18 +1,106 @@
+# stdlib
+import urllib.parse as up
+
 # local
 from .expression_classes_1_1 import Expressions1_1
+from . import custom_expressions as ce
+from py_csl_validator.utils import index_utils as iu
 
 
 # Schema
 class Expressions1_2(Expressions1_1):
 
-    class UriDecodeExpr(DataExpr):
+    class InListExpr(Expressions1_1.ValidatingExpr):
+
+        __slots__ = ('list_path', 'index', 'index_no_case')
+        cost = 4
+
+        def __init__(self, list_path):
+            self.list_path = list_path
+            self.index = iu.SortedValueIndex(list_path)
+            self.index_no_case = iu.SortedValueIndex(list_path, ignore_case=True)  # only built if a column uses it
+
+        def prepare(self, ignore_case):
+            # the index is built (or found) at load, so a list which cannot be read fails the schema, not a row
+            (self.index_no_case if ignore_case else self.index).open()
+
+        def validate(self, key, row, context, ignore_case=False):
+            index = self.index_no_case if ignore_case else self.index
+
+            return self.result(row[key] in index)
+
+        def local_signature(self, signatures):
+            return 'InListExpr', str(self.list_path)
+
+        def format_error(self, value, operands, ignore_case=False):
+            msg = f'InListExpr: {value} not found in value list {self.list_path}'
+            if ignore_case:
+                msg += ' (case ignored)'
+
+            return msg
+
+    class CustomExpr(Expressions1_1.ValidatingExpr):
+
+        __slots__ = ('name', 'args', 'check', 'cost')
+        derived = ('check', 'cost')  # checks are looked up by name, so a worker process uses its own registry
+
+        def __init__(self, name, args):
+            self.name = name
+            self.args = args  # string providers, evaluated per row unless they are all literals
+            self.derive()
+
+        def derive(self):
+            self.check = ce.lookup(self.name)
+            self.cost = self.check.cost
+
+        def validate(self, key, row, context, ignore_case=False):
+            # the row engines may have run a batch function over the current chunk of rows already
+            if context.batch_verdicts is not None:
+                verdicts = context.batch_verdicts.get((self, key))
+                if verdicts is not None:
+                    return self.result(verdicts[context.batch_index])
+
+            value = row[key].lower() if ignore_case else row[key]
+            args = [arg.evaluate(row, context) for arg in self.args]
+
+            return self.result(self.check.check_cell(value, args))
+
+        def label(self):
+            return f'CustomExpr({self.name})'
+
+        def literal_args(self):
+            # the arguments as plain values, or None if any of them depends on the row
+            if all(arg.is_literal() for arg in self.args):
+                return [arg.val for arg in self.args]
+
+            return None
+
+        def format_error(self, value, operands, ignore_case=False):
+            msg = f'CustomExpr: {value} failed custom check {self.name}'
+            if self.check.description:
+                msg += f' ({self.check.description})'
+            if ignore_case:
+                msg += ' (case ignored)'
+
+            return msg
+
+    class UriDecodeExpr(Expressions1_1.DataExpr):
+
+        __slots__ = ('string_provider', 'encoding')
+        memoize = True
 
         def __init__(self, string_provider, encoding):
             self.string_provider = string_provider
             self.encoding = encoding
+            self.derive()
+
+        def local_signature(self, signatures):
+            encoding = signatures[self.encoding] if self.encoding is not None else None
+            return 'UriDecodeExpr', signatures[self.string_provider], encoding
 
-        def evaluate(self, row, context):
-            pass
+        def compute(self, row, context):
+            encoding = self.encoding.evaluate(row, context) if self.encoding is not None else 'utf-8'
+            return up.unquote(self.string_provider.evaluate(row, context), encoding=encoding)
 
 
 
@@ -0,0 +1,68 @@
+# Command line for sharded validation, run from the repository root:
+#
+#     python -m py_csl_validator.sharding plan CSV SCHEMA SHARDS MANIFEST
+#     python -m py_csl_validator.sharding work MANIFEST INDEX PARTIAL
+#     python -m py_csl_validator.sharding merge MANIFEST PARTIAL [PARTIAL ...]
+#     python -m py_csl_validator.sharding local CSV SCHEMA SHARDS WORK_DIR
+#
+# merge and local print the merged errors and exit with status 1 if the file is invalid.
+
+# stdlib
+import sys
+import argparse
+
+# local
+import py_csl_validator.sharding.sharding as sh
+
+
+def report(valid, validator):
+    for defect in validator.structural_errors:
+        print(f'row {defect.row} (line {defect.line}): {defect.kind}: {defect.message}')
+    for record in validator.errors.records():
+        print(f'row {record.row} {record.column} [{record.report_level}]: {record.message}')
+    print('valid' if valid else 'invalid')
+
+    return 0 if valid else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m py_csl_validator.sharding')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    plan = commands.add_parser('plan', help='split a CSV file into shards')
+    plan.add_argument('csv_file')
+    plan.add_argument('schema_file')
+    plan.add_argument('shards', type=int)
+    plan.add_argument('manifest')
+
+    work = commands.add_parser('work', help='validate one shard')
+    work.add_argument('manifest')
+    work.add_argument('index', type=int)
+    work.add_argument('partial')
+
+    merge = commands.add_parser('merge', help='combine the partial results of every shard')
+    merge.add_argument('manifest')
+    merge.add_argument('partials', nargs='+')
+
+    local = commands.add_parser('local', help='plan, validate and merge with local worker processes')
+    local.add_argument('csv_file')
+    local.add_argument('schema_file')
+    local.add_argument('shards', type=int)
+    local.add_argument('work_dir')
+
+    args = parser.parse_args(argv)
+    if args.command == 'plan':
+        manifest = sh.plan_shards(args.csv_file, args.schema_file, args.shards, args.manifest)
+        print(f'{len(manifest["shards"])} shards written to {args.manifest}')
+    elif args.command == 'work':
+        sh.run_shard(args.manifest, args.index, args.partial)
+    elif args.command == 'merge':
+        return report(*sh.merge_partials(args.manifest, args.partials))
+    else:
+        return report(*sh.run_local(args.csv_file, args.schema_file, args.shards, args.work_dir))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
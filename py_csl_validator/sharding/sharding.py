@@ -0,0 +1,345 @@
+# Sharded validation of one large file across several processes or machines, in three steps:
+#
+#     plan_shards(csv_file, schema_file, shards, manifest)  splits the file into quote-safe byte ranges
+#     run_shard(manifest, index, partial)                   validates one range, once per shard, anywhere
+#     merge_partials(manifest, partials)                    combines the partial results into one report
+#
+# Workers number rows from the start of their own range. Each partial records how many rows its shard held, so
+# the merge can renumber rows and lines globally, together with the state of the schema's unique and identical
+# rules: the first row at which every value was seen, and the runs of rows which matched the identical value.
+# The merge replays that state in shard order, which finds duplicates across shards and resolves shards which
+# started from a different identical value, so the merged report matches a single-process validation.
+#
+# Every process must see the same schema and CSV file; the manifest records the file's size and modification
+# time and workers refuse a file which has changed since it was planned.
+
+# stdlib
+import io
+import os
+import sys
+import json
+import pickle
+import pathlib
+import subprocess
+from collections import defaultdict
+
+# local
+import py_csl_validator.utils.io_utils as iu
+import py_csl_validator.utils.planner_utils as pu
+import py_csl_validator.utils.structure_utils as st
+from py_csl_validator.validator.validator import CslValidator
+from py_csl_validator.expressions.expression_classes_1_1 import Expressions1_1 as ec
+
+
+MANIFEST_FORMAT = 1
+PARTIAL_FORMAT = 1
+
+
+class ShardState:
+    # What a worker's unique and identical rules saw, keyed by the expressions' positions in the schema
+
+    def __init__(self, positions):
+        self.positions = positions  # id(expression) -> position, see planner_utils.expression_positions
+        self.unique = defaultdict(dict)  # position -> {value: (first row, cell value)}
+        self.identical = defaultdict(list)  # position -> [[first row, last row, cell value], ...] which matched
+
+    def first_seen(self, expression, value, row, cell):
+        self.unique[self.positions[id(expression)]][value] = (row, cell)
+
+    def matched(self, expression, row, cell):
+        runs = self.identical[self.positions[id(expression)]]
+        if runs and runs[-1][1] == row - 1 and runs[-1][2] == cell:
+            runs[-1][1] = row
+        else:
+            runs.append([row, row, cell])
+
+
+def stateful_rules(column_rules):
+    # (expression, column, column rule, top level expression) for every unique and identical rule. Their state
+    # can only be merged when the rule's verdict is the expression's own, so a stateful expression nested in
+    # another expression, or under @matchIsFalse, cannot be validated in shards.
+    rules = []
+    for key, rule in column_rules.items():
+        for top in rule.col_vals:
+            expression = top
+            while isinstance(expression, ec.ColumnValidationExpr) or \
+                    (isinstance(expression, ec.SingleExpr) and not expression.col_ref):
+                expression = expression.expression
+
+            if isinstance(expression, (ec.UniqueExpr, ec.IdenticalExpr)) and \
+                    not rule.col_directives['match_is_false']:
+                rules.append((expression, key, rule, top))
+            elif top.is_stateful():
+                raise ValueError(f'Column {key} uses {top.label()} in a way whose state cannot be merged across '
+                                 'shards; validate this schema in a single process')
+
+    return rules
+
+
+def plan_shards(csv_file, schema_file, shard_count, manifest_file=None):
+    # splits the rows of csv_file into at most shard_count byte ranges which start at record boundaries and
+    # writes the manifest to manifest_file, if given. Returns the manifest.
+    validator = CslValidator(schema_file)
+    stateful_rules(validator._rules())
+
+    if iu.detect_compression(csv_file) is not None:
+        raise ValueError('Only uncompressed files can be split into shards')
+
+    stat = os.stat(csv_file)
+    no_header = validator.global_directives['no_header']
+
+    with open(csv_file, mode='rb') as cf:
+        if no_header:
+            data_start, data_line = 0, 1
+        else:
+            header = record_boundaries(cf, [0])
+            data_start, data_line = header[0] if header else (stat.st_size, 2)
+
+        data_size = stat.st_size - data_start
+        targets = [data_start + data_size * i // shard_count for i in range(1, shard_count)]
+        cf.seek(0)
+        boundaries = [(data_start, data_line)] + record_boundaries(cf, targets)
+
+    shards = []
+    for (start, line), (end, _) in zip(boundaries, boundaries[1:] + [(stat.st_size, None)]):
+        if start < end or not shards:
+            shards.append({'start': start, 'end': end, 'line': line})
+
+    manifest = {
+        'format': MANIFEST_FORMAT,
+        'csv_file': str(pathlib.Path(csv_file).resolve()),
+        'schema_file': str(pathlib.Path(schema_file).resolve()),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'data_start': data_start,
+        'data_line': data_line,
+        'shards': shards,
+    }
+
+    if manifest_file is not None:
+        with open(manifest_file, mode='w', encoding='utf-8') as mf:
+            json.dump(manifest, mf, indent=2)
+
+    return manifest
+
+
+def record_boundaries(cf, targets):
+    # (offset, line) of the first record boundary after each of the ascending byte offsets in targets, found by
+    # st.RecordLines from the start of the binary file cf. The stretches between targets are counted in bulk, so
+    # this runs at close to read speed; a file with quotes inside unquoted fields should not be sharded.
+    scanner = st.RecordLines.of_file(cf)
+    boundaries = []
+    for target in targets:
+        if boundaries and target <= boundaries[-1][0]:
+            continue
+
+        scanner.skip_to(target)
+        lines = scanner.record()
+        if scanner.quotes % 2 or not lines or not lines[-1].endswith(b'\n'):
+            break  # the file ends before another boundary
+
+        boundaries.append((scanner.offset, scanner.line_num + 1))
+
+    return boundaries
+
+
+def run_shard(manifest_file, index, partial_file):
+    # validates shard index of the manifest and writes its partial result; returns the shard's own verdict
+    with open(manifest_file, mode='r', encoding='utf-8') as mf:
+        manifest = json.load(mf)
+    if manifest['format'] != MANIFEST_FORMAT:
+        raise ValueError(f'Unsupported shard manifest format {manifest["format"]}')
+
+    stat = os.stat(manifest['csv_file'])
+    if (stat.st_size, stat.st_mtime_ns) != (manifest['size'], manifest['mtime_ns']):
+        raise ValueError(f'{manifest["csv_file"]} has changed since its shards were planned')
+
+    shard = manifest['shards'][index]
+    validator = CslValidator(manifest['schema_file'])
+    expressions = pu.expression_positions(validator._rules())
+    positions = {id(expression): position for position, expression in enumerate(expressions)}
+    run = validator.new_run()
+    run.shard_state = ShardState(positions)
+
+    # the header is read ahead of every shard, so each worker matches columns the same way
+    segments = [(0, manifest['data_start']), (shard['start'], shard['end'] - shard['start'])]
+    with open(manifest['csv_file'], mode='rb') as raw:
+        with io.TextIOWrapper(io.BufferedReader(_RangeReader(raw, segments)), newline='') as cf:
+            valid = run.validate_stream(cf)
+
+    first_row = 1 if validator.global_directives['no_header'] else 2
+    partial = {
+        'format': PARTIAL_FORMAT,
+        'index': index,
+        'size': manifest['size'],
+        'mtime_ns': manifest['mtime_ns'],
+        'valid': valid,
+        'rows': run.row_count - first_row + 1,
+        'errors': [(record.row, record.column, record.report_level, positions[id(record.expression)],
+                    record.value, record.operands, record.ignore_case) for record in run.errors.records()],
+        'structural_errors': [(defect.row, defect.line, defect.kind, defect.message)
+                              for defect in run.structural_errors],
+        'failure_counts': {key: dict(counts) for key, counts in run.failure_counts.items()},
+        'unique': dict(run.shard_state.unique),
+        'identical': {position: (run.expression_state.get(expressions[position]), matched)
+                      for position, matched in run.shard_state.identical.items()},
+    }
+
+    with open(partial_file, mode='wb') as pf:
+        pickle.dump(partial, pf, protocol=pickle.HIGHEST_PROTOCOL)
+
+    return valid
+
+
+def merge_partials(manifest_file, partial_files):
+    # combines the partial results of every shard into (verdict, validator), the validator holding the errors,
+    # structural errors and failure counts of the whole file with global row and line numbers
+    with open(manifest_file, mode='r', encoding='utf-8') as mf:
+        manifest = json.load(mf)
+
+    partials = {}
+    for partial_file in partial_files:
+        with open(partial_file, mode='rb') as pf:
+            partial = pickle.load(pf)
+        if partial['format'] != PARTIAL_FORMAT:
+            raise ValueError(f'Unsupported partial result format {partial["format"]} in {partial_file}')
+        if (partial['size'], partial['mtime_ns']) != (manifest['size'], manifest['mtime_ns']):
+            raise ValueError(f'{partial_file} was validated against a different version of {manifest["csv_file"]}')
+        partials[partial['index']] = partial
+
+    missing = [index for index in range(len(manifest['shards'])) if index not in partials]
+    if missing:
+        raise ValueError(f'No partial results for shards {missing}')
+
+    validator = CslValidator(manifest['schema_file'])
+    merged = validator.new_run()
+    temp_rules = validator._rules()
+    expressions = pu.expression_positions(temp_rules)
+    positions = {id(expression): position for position, expression in enumerate(expressions)}
+    rule_order = [order for _, order in pu.walk_expressions(temp_rules)]
+    stateful = {positions[id(expression)]: (key, rule, top) for expression, key, rule, top in stateful_rules(temp_rules)}
+
+    no_header = validator.global_directives['no_header']
+    first_row = 1 if no_header else 2
+    header_lines = manifest['data_line'] - 1
+
+    records = []
+    seen = defaultdict(set)  # unique position -> values seen in earlier shards
+    expected = {}  # identical position -> the value of the file's first row
+    rows_before = 0
+    for index, shard in enumerate(manifest['shards']):
+        partial = partials[index]
+        row_offset = rows_before
+        line_offset = shard['line'] - 1 - header_lines
+
+        for position, (comparison, _) in partial['identical'].items():
+            expected.setdefault(position, comparison)
+
+        for key, counts in partial['failure_counts'].items():
+            for label, count in counts.items():
+                merged.failure_counts[key][label] += count
+
+        for row, column, report_level, position, value, operands, ignore_case in partial['errors']:
+            if position in partial['identical']:
+                comparison = value.lower() if ignore_case else value
+                if comparison == expected[position]:
+                    # deviated from the shard's first value, but not from the file's
+                    merged.failure_counts[column][stateful[position][2].label()] -= 1
+                    continue
+            records.append((row + row_offset, column, report_level, expressions[position], value, operands,
+                            ignore_case))
+
+        for position, (comparison, runs) in partial['identical'].items():
+            if comparison == expected[position]:
+                continue
+            # every row which matched this shard's first value deviates from the file's
+            key, rule, top = stateful[position]
+            for start, end, cell in runs:
+                if cell == '' and rule.col_directives['optional']:
+                    continue
+                for row in range(start, end + 1):
+                    records.append(_stateful_record(row + row_offset, key, rule, expressions[position], cell, ()))
+                merged.failure_counts[key][top.label()] += end - start + 1
+
+        for position, first_rows in partial['unique'].items():
+            key, rule, top = stateful[position]
+            earlier = seen[position]
+            for value, (row, cell) in first_rows.items():
+                if value not in earlier:
+                    earlier.add(value)
+                elif not (cell == '' and rule.col_directives['optional']):
+                    records.append(_stateful_record(row + row_offset, key, rule, expressions[position], cell,
+                                                    (value,)))
+                    merged.failure_counts[key][top.label()] += 1
+
+        for row, line, kind, message in partial['structural_errors']:
+            if kind == 'header':
+                if index == 0:
+                    merged.structural_errors.append(st.StructuralDefect(row, line, kind, message))
+                continue
+            merged.structural_errors.append(st.StructuralDefect(row + row_offset, line + line_offset, kind,
+                                                                   message))
+
+        rows_before += partial['rows']
+
+    # errors found by the merge go where a single pass would have reported them within their row
+    records.sort(key=lambda record: (record[0], rule_order[positions[id(record[3])]]))
+    for record in records:
+        merged.errors.add(*record)
+    merged.row_count = rows_before + first_row - 1
+    merged.valid = not records and not merged.structural_errors
+
+    return validator._publish(merged), validator
+
+
+def run_local(csv_file, schema_file, shard_count, work_dir):
+    # plans, validates and merges with one local worker process per shard, standing in for separate machines
+    work_dir = pathlib.Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    manifest_file = work_dir / 'manifest.json'
+    manifest = plan_shards(csv_file, schema_file, shard_count, manifest_file)
+
+    partial_files = [work_dir / f'shard-{index}.partial' for index in range(len(manifest['shards']))]
+    workers = [subprocess.Popen([sys.executable, '-m', 'py_csl_validator.sharding', 'work', str(manifest_file),
+                                 str(index), str(partial_file)])
+               for index, partial_file in enumerate(partial_files)]
+
+    failed = [index for index, worker in enumerate(workers) if worker.wait() != 0]
+    if failed:
+        raise RuntimeError(f'Workers for shards {failed} did not finish')
+
+    return merge_partials(manifest_file, partial_files)
+
+
+def _stateful_record(row, key, rule, expression, cell, operands):
+    report_level = 'w' if rule.col_directives['warning'] else 'e'
+
+    return row, key, report_level, expression, cell, operands, rule.col_directives['ignore_case']
+
+
+class _RangeReader(io.RawIOBase):
+    # reads a list of (offset, length) segments of a binary file as one stream
+
+    def __init__(self, raw, segments):
+        self.raw = raw
+        self.segments = list(segments)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self.segments and self.segments[0][1] == 0:
+            self.segments.pop(0)
+        if not self.segments:
+            return 0
+
+        offset, length = self.segments[0]
+        self.raw.seek(offset)
+        data = self.raw.read(min(len(buffer), length))
+        if not data:
+            raise ValueError('File ended inside a shard, it has changed since its shards were planned')
+
+        buffer[:len(data)] = data
+        self.segments[0] = (offset + len(data), length - len(data))
+
+        return len(data)
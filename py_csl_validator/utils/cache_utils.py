@@ -0,0 +1,233 @@
+# stdlib
+import os
+import types
+import pickle
+import hashlib
+import pathlib
+import tempfile
+
+# local
+import py_csl_validator.utils.io_utils as iu
+import py_csl_validator.utils.planner_utils as pu
+from py_csl_validator.expressions.expression_classes_1_2 import Expressions1_2 as ec2
+
+
+CACHE_FORMAT = 1
+CACHE_SUFFIX = '.cslr'
+DIGEST_BLOCK = 1 << 20
+
+_library_digest = None
+
+
+class ResultCache:
+    # Validation results stored in a directory under a key derived from the CSV's content, the schema and the
+    # library, so re-submitting a byte-identical file against an unchanged schema returns the stored result.
+    # Hashing a file runs at disk speed, far ahead of validating it.
+    #
+    # Results of schemas with fileExists, checksum or fileCount rules also depend on the files those rules looked
+    # at. With external='recheck' the state of those files (size, modification time) is stored with the result
+    # and compared on every hit; a result whose files changed is discarded. external='bypass' never caches them.
+    #
+    # Custom checks are digested on every validation together with the values their closures and module globals
+    # refer to (a reference set, a lookup table), so changing those data invalidates the results which used them.
+    # Objects which cannot be pickled cannot be digested: a schema whose custom checks refer to one is validated
+    # without the cache.
+    #
+    # Entries are pickles, and loading a pickle can run code, so a directory which others can write to (a shared
+    # CI cache, say) is not used: nothing is loaded from or stored in it. Give each user a directory of their own.
+
+    def __init__(self, directory, external='recheck'):
+        if external not in ('recheck', 'bypass'):
+            raise ValueError(f'Unknown external file policy: {external}')
+
+        self.directory = pathlib.Path(directory)
+        self.external = external
+
+    def key(self, csv_file, schema_digest):
+        return hashlib.sha256(f'{CACHE_FORMAT}:{library_digest()}:{schema_digest}:{file_digest(csv_file)}'
+                              .encode('utf-8')).hexdigest()
+
+    def load(self, key):
+        if not iu.private_dir(self.directory):
+            return None
+
+        try:
+            with open(self._path(key), mode='rb') as cache_file:
+                entry = pickle.load(cache_file)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError):
+            return None
+
+        if entry.get('format') != CACHE_FORMAT:
+            return None
+        if any(path_state(path) != state for path, state in entry['external_paths']):
+            return None
+
+        return entry
+
+    def store(self, key, entry, external_paths=()):
+        entry = dict(entry, format=CACHE_FORMAT, external_paths=[(path, path_state(path))
+                                                                 for path in watched_paths(external_paths)])
+        if not iu.private_dir(self.directory):
+            return
+
+        try:
+            with tempfile.NamedTemporaryFile(mode='wb', dir=self.directory, delete=False) as cache_file:
+                pickle.dump(entry, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(cache_file.name, self._path(key))
+        except (OSError, pickle.PicklingError):
+            pass  # the cache is an optimization only
+
+    def _path(self, key):
+        return self.directory.joinpath(f'{key[:40]}{CACHE_SUFFIX}')
+
+
+class UndigestibleCheck(Exception):
+    pass
+
+
+def schema_digest(schema_file, column_rules, options):
+    # the schema text, the order the planner chose (it decides the order errors are reported in), the value lists
+    # the rules use and options which change the result; custom checks are digested separately, see check_digest
+    digest = hashlib.sha256()
+    with open(schema_file, mode='rb') as schema:
+        digest.update(schema.read())
+
+    for key, rule in column_rules.items():
+        digest.update(repr((key, [expression.label() for expression in rule.col_vals])).encode('utf-8'))
+
+    for expression in pu.expression_positions(column_rules):
+        if isinstance(expression, ec2.InListExpr):
+            digest.update(file_digest(expression.list_path).encode('ascii'))
+
+    digest.update(repr(sorted(options.items())).encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+def check_digest(column_rules):
+    # the code of the custom checks the rules use and the data it refers to, or None if some of that data cannot
+    # be digested. Data can change between validations, so this is computed for every one.
+    digest = hashlib.sha256()
+    try:
+        for expression in pu.expression_positions(column_rules):
+            if isinstance(expression, ec2.CustomExpr):
+                for function in (expression.check.cell, expression.check.batch):
+                    digest.update(_function_digest(function, set()))
+    except UndigestibleCheck:
+        return None
+
+    return digest.hexdigest()
+
+
+def has_external_rules(column_rules):
+    return any(expression.external for expression in pu.expression_positions(column_rules))
+
+
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, mode='rb') as f:
+        for block in iter(lambda: f.read(DIGEST_BLOCK), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def library_digest():
+    # the library's own sources, so upgrading or editing it invalidates every cached result
+    global _library_digest
+    if _library_digest is None:
+        digest = hashlib.sha256()
+        package = pathlib.Path(__file__).resolve().parent.parent
+        for source in sorted(package.rglob('*')):
+            if source.suffix in ('.py', '.lark'):
+                digest.update(str(source.relative_to(package)).encode('utf-8'))
+                digest.update(source.read_bytes())
+        _library_digest = digest.hexdigest()
+
+    return _library_digest
+
+
+def watched_paths(paths):
+    # a path's parent is watched too: a file appearing under another case changes it, as does a file count
+    watched = set()
+    for path in paths:
+        path = pathlib.Path(os.path.abspath(path))
+        watched.add(str(path))
+        watched.add(str(path.parent))
+
+    return sorted(watched)
+
+
+def path_state(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+def _function_digest(function, seen):
+    # a function's code, the contents of its closure and the module globals its code names; functions reached
+    # from those are digested in turn, once
+    if not isinstance(function, types.FunctionType):
+        return _value_digest(function, seen)  # builtins, partials and other callables as the values they are
+    if function in seen:
+        return b'seen'
+    seen.add(function)
+
+    digest = hashlib.sha256(_code_digest(function.__code__))
+    for cell in function.__closure__ or ():
+        try:
+            digest.update(_value_digest(cell.cell_contents, seen))
+        except ValueError:
+            digest.update(b'empty cell')
+
+    for name in sorted(_code_names(function.__code__)):
+        if name in function.__globals__:
+            digest.update(name.encode('utf-8'))
+            digest.update(_value_digest(function.__globals__[name], seen))
+
+    return digest.digest()
+
+
+def _value_digest(value, seen):
+    if value is None:
+        return b'None'
+    if isinstance(value, types.FunctionType):
+        return _function_digest(value, seen)
+    if isinstance(value, types.MethodType):
+        return _function_digest(value.__func__, seen) + _value_digest(value.__self__, seen)
+    if isinstance(value, types.ModuleType):
+        return f'module {value.__name__}'.encode('utf-8')  # libraries by name, like the checks' own code
+    if isinstance(value, type):
+        return f'class {value.__module__}.{value.__qualname__}'.encode('utf-8')
+
+    if isinstance(value, (set, frozenset)):
+        # pickled in iteration order, which changes with string hashing from process to process
+        try:
+            value = sorted(value)
+        except TypeError:
+            value = sorted(_value_digest(item, seen) for item in value)
+
+    try:
+        return hashlib.sha256(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)).digest()
+    except Exception:
+        raise UndigestibleCheck(f'{type(value).__name__} cannot be digested') from None
+
+
+def _code_names(code):
+    # the global (and attribute) names code refers to, with those of the code nested in it
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _code_names(const)
+
+    return names
+
+
+def _code_digest(code):
+    # nested code objects (lambdas, comprehensions) are digested in turn, their repr holds an address
+    consts = tuple(_code_digest(const) if hasattr(const, 'co_code') else const for const in code.co_consts)
+
+    return hashlib.sha256(repr((code.co_code, consts, code.co_names)).encode('utf-8')).digest()
@@ -0,0 +1,236 @@
+# stdlib
+import sys
+import bisect
+from array import array
+
+
+SEVERITIES = ['e', 'w']
+IGNORE_CASE_FLAG = 0b10
+RECORD_SIZE = 49  # array entries plus the side list slot of one record
+MAX_EXEMPLARS = 5
+MEMORY_COMPONENT = 'errors'
+
+
+class ErrorRecord:
+
+    __slots__ = ('row', 'column', 'report_level', 'expression', 'value', 'operands', 'ignore_case')
+
+    def __init__(self, row, column, report_level, expression, value, operands, ignore_case):
+        self.row = row
+        self.column = column
+        self.report_level = report_level
+        self.expression = expression
+        self.value = value
+        self.operands = operands
+        self.ignore_case = ignore_case
+
+    @property
+    def message(self):
+        return self.expression.format_error(self.value, self.operands, ignore_case=self.ignore_case)
+
+
+class ErrorStore:
+    # Failures are kept as fixed-width records in parallel arrays (row, column index, expression id, severity
+    # and flags, optional operand reference); cell values and evaluated operands sit in side lists. Messages are
+    # only formatted when a row's errors are looked up or the store is rendered.
+    #
+    # Looking a row up returns the same nested {column: {report level: [messages]}} shape the validator has
+    # always exposed, so errors[row][column]['e'] keeps working.
+    #
+    # With a memory budget, the store stops keeping records once the budget runs out and only counts the failures
+    # it dropped; validity is decided by the rules, so verdicts are unaffected.
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.capped = False
+        self.dropped = 0
+        self.severity_counts = dict.fromkeys(SEVERITIES, 0)  # every failure added, including dropped ones
+        self.nbytes = 0
+        self.rows = array('q')
+        self.columns = array('l')
+        self.expressions = array('l')
+        self.flags = array('b')
+        self.details = array('l')
+        self.column_names = []
+        self.expression_objects = []
+        self.values = []
+        self.operand_values = []
+        self._column_ids = {}
+        self._expression_ids = {}
+        self._ordered = True
+
+    def add(self, row, column, report_level, expression, value, operands=(), ignore_case=False):
+        self.severity_counts[report_level] += 1
+        if self.capped:
+            self.dropped += 1
+            return
+
+        column_id = self._column_ids.get(column)
+        if column_id is None:
+            column_id = self._column_ids[column] = len(self.column_names)
+            self.column_names.append(column)
+
+        expression_id = self._expression_ids.get(id(expression))
+        if expression_id is None:
+            expression_id = self._expression_ids[id(expression)] = len(self.expression_objects)
+            self.expression_objects.append(expression)
+
+        if self.rows and row < self.rows[-1]:
+            self._ordered = False
+
+        self.rows.append(row)
+        self.columns.append(column_id)
+        self.expressions.append(expression_id)
+        self.flags.append(SEVERITIES.index(report_level) | (IGNORE_CASE_FLAG if ignore_case else 0))
+        self.values.append(value)
+        if operands:
+            self.details.append(len(self.operand_values))
+            self.operand_values.append(operands)
+        else:
+            self.details.append(-1)
+
+        if self.budget is not None:
+            size = RECORD_SIZE + sys.getsizeof(value) + (sys.getsizeof(operands) if operands else 0)
+            self.nbytes += size
+            if self.budget.grow(MEMORY_COMPONENT, size):
+                self.capped = True
+                self.budget.degrade(MEMORY_COMPONENT, f'kept the first {len(self.rows)} error records, later '
+                                                      f'failures are only counted')
+
+    def record(self, index):
+        flags = self.flags[index]
+        detail = self.details[index]
+        operands = self.operand_values[detail] if detail >= 0 else ()
+
+        return ErrorRecord(self.rows[index],
+                           self.column_names[self.columns[index]],
+                           SEVERITIES[flags & 1],
+                           self.expression_objects[self.expressions[index]],
+                           self.values[index],
+                           operands,
+                           bool(flags & IGNORE_CASE_FLAG))
+
+    def records(self):
+        for index in range(len(self.rows)):
+            yield self.record(index)
+
+    def record_count(self):
+        return len(self.rows)
+
+    def clear(self):
+        if self.budget is not None:
+            self.budget.release(MEMORY_COMPONENT, self.nbytes)
+        self.__init__(self.budget)
+
+    def to_dict(self):
+        return {row: self[row] for row in self}
+
+    # mapping interface over row numbers #
+
+    def __len__(self):
+        return len(self._row_numbers())
+
+    def __iter__(self):
+        return iter(self._row_numbers())
+
+    def __contains__(self, row):
+        return bool(self._indices(row))
+
+    def __getitem__(self, row):
+        indices = self._indices(row)
+        if not indices:
+            raise KeyError(row)
+
+        errors = {}
+        for index in indices:
+            record = self.record(index)
+            errors.setdefault(record.column, {}).setdefault(record.report_level, []).append(record.message)
+
+        return errors
+
+    def get(self, row, default=None):
+        return self[row] if row in self else default
+
+    def keys(self):
+        return self._row_numbers()
+
+    def items(self):
+        return [(row, self[row]) for row in self]
+
+    def _row_numbers(self):
+        if self._ordered:
+            rows = []
+            for row in self.rows:
+                if not rows or rows[-1] != row:
+                    rows.append(row)
+            return rows
+
+        return sorted(set(self.rows))
+
+    def _indices(self, row):
+        if self._ordered:
+            start = bisect.bisect_left(self.rows, row)
+            end = bisect.bisect_right(self.rows, row, lo=start)
+            return range(start, end)
+
+        return [index for index, record_row in enumerate(self.rows) if record_row == row]
+
+
+class ErrorGroup:
+    # the failures of one expression on one column with one severity and failure kind
+
+    __slots__ = ('column', 'report_level', 'expression', 'kind', 'count', 'first_row', 'last_row', 'exemplars')
+
+    def __init__(self, column, report_level, expression, kind):
+        self.column = column
+        self.report_level = report_level
+        self.expression = expression
+        self.kind = kind
+        self.count = 0
+        self.first_row = None
+        self.last_row = None
+        self.exemplars = []  # ErrorRecord of the first failing rows
+
+    @property
+    def label(self):
+        return self.expression.label()
+
+
+class ErrorSummary(ErrorStore):
+    # Summarized reporting: failures are grouped by (column, severity, expression, failure kind) as they are
+    # added, each group keeping a count, its first and last row and up to max_exemplars exemplar records. Only
+    # exemplars are stored as records, so the mapping interface and records() cover those rows alone; a defect
+    # repeated on every row costs one group instead of one record per row.
+
+    def __init__(self, budget=None, max_exemplars=MAX_EXEMPLARS):
+        super().__init__(budget)
+        self.max_exemplars = max_exemplars
+        self.groups = {}  # (column, report level, id(expression), kind) -> ErrorGroup
+
+    def add(self, row, column, report_level, expression, value, operands=(), ignore_case=False):
+        kind = expression.failure_kind(operands)
+        group = self.groups.get((column, report_level, id(expression), kind))
+        if group is None:
+            group = self.groups[(column, report_level, id(expression), kind)] = \
+                ErrorGroup(column, report_level, expression, kind)
+
+        group.count += 1
+        if group.first_row is None or row < group.first_row:
+            group.first_row = row
+        if group.last_row is None or row > group.last_row:
+            group.last_row = row
+
+        if len(group.exemplars) < self.max_exemplars:
+            group.exemplars.append(ErrorRecord(row, column, report_level, expression, value, operands, ignore_case))
+            super().add(row, column, report_level, expression, value, operands, ignore_case)
+        else:
+            self.severity_counts[report_level] += 1
+
+    def summary(self):
+        # the groups in the order their first failure was found
+        return sorted(self.groups.values(), key=lambda group: group.first_row)
+
+    def clear(self):
+        max_exemplars = self.max_exemplars
+        super().clear()
+        self.max_exemplars = max_exemplars
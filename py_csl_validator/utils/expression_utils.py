@@ -1,10 +1,33 @@
 # stdlib
 import os
+import re
 import pathlib
 import datetime
 from typing import Union
 
 
+# Precompiled matchers for the most common column types; they return None rather than raising on a mismatch #
+
+UUID4 = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}')
+
+# RFC 3986 URI-reference: an absolute URI or a relative reference, with every character checked against its part.
+# '%' is allowed wherever percent-encoding is, and the encodings themselves are checked by INVALID_PERCENT_ENCODING
+# afterwards: single character classes keep the match free of per-character alternation.
+_PCHAR = r"[A-Za-z0-9\-._~!$&'()*+,;=:@%]"
+_PCHAR_NO_COLON = r"[A-Za-z0-9\-._~!$&'()*+,;=@%]"
+_AUTHORITY = (r"(?:[A-Za-z0-9\-._~!$&'()*+,;=:%]*@)?"  # userinfo
+              r"(?:\[[0-9A-Fa-f:.vV]+\]|[A-Za-z0-9\-._~!$&'()*+,;=%]*)"  # host
+              r'(?::[0-9]*)?')  # port
+_PATH_ABEMPTY = rf'(?:/{_PCHAR}*)*'
+_QUERY_FRAGMENT = r"(?:\?[A-Za-z0-9\-._~!$&'()*+,;=:@%/?]*)?(?:#[A-Za-z0-9\-._~!$&'()*+,;=:@%/?]*)?"
+URI_REFERENCE = re.compile(
+    rf'(?:[A-Za-z][A-Za-z0-9+.\-]*:(?://{_AUTHORITY}{_PATH_ABEMPTY}|/?(?:{_PCHAR}+{_PATH_ABEMPTY})?)'  # absolute
+    rf'|//{_AUTHORITY}{_PATH_ABEMPTY}|/?(?:{_PCHAR_NO_COLON}+{_PATH_ABEMPTY})?)'  # relative
+    rf'{_QUERY_FRAGMENT}'
+)
+INVALID_PERCENT_ENCODING = re.compile(r'%(?![0-9A-Fa-f]{2})')
+
+
 def find_path_from_caseless(file_path: pathlib.Path) -> Union[pathlib.Path, None]:
     path_lower = pathlib.Path(*[part.lower() for part in file_path.parts]) 
     iter_count = 0
@@ -0,0 +1,170 @@
+# stdlib
+import os
+import mmap
+import struct
+import hashlib
+import pathlib
+import tempfile
+import threading
+
+# local
+import py_csl_validator.utils.io_utils as iou
+
+
+INDEX_MAGIC = b'CSLIDX1\0'
+INDEX_HEADER = struct.Struct('=8sQQQ')  # magic, source size, source mtime_ns, value count
+INDEX_SUFFIX = '.cslidx'
+
+
+class SortedValueIndex:
+    # A read-only membership index over an external value list (one value per line, utf-8).
+    # The list is sorted and written once to an index file next to it; every later load, in any process, just
+    # maps that file, so the pages are shared through the OS page cache and nothing is rebuilt per run. Where the
+    # list's directory cannot be written the index file goes to the user's cache directory instead, and failing
+    # that it is held in memory by the process.
+    # Layout: header, (count + 1) native uint64 offsets, then the sorted values back to back.
+
+    def __init__(self, list_path, ignore_case=False):
+        self.list_path = pathlib.Path(list_path)
+        self.ignore_case = ignore_case
+        self.suffix = '.nocase' + INDEX_SUFFIX if ignore_case else INDEX_SUFFIX
+        self.index_path = None  # the index file mapped, None while not open or when held in memory
+        self._file = None
+        self._map = None
+        self._offsets = None
+        self._lock = threading.Lock()  # runs sharing a schema may look values up from several threads
+        self.count = 0
+
+    def __getstate__(self):
+        # maps are process local: workers reopen the shared index file on first use
+        return {'list_path': self.list_path, 'ignore_case': self.ignore_case}
+
+    def __setstate__(self, state):
+        self.__init__(state['list_path'], state['ignore_case'])
+
+    def __contains__(self, value):
+        if self._map is None:
+            self.open()
+
+        if self.ignore_case:
+            value = value.lower()
+        target = value.encode('utf-8')
+
+        offsets = self._offsets
+        data = self._map
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            candidate = data[offsets[mid]:offsets[mid + 1]]
+            if candidate < target:
+                low = mid + 1
+            elif candidate > target:
+                high = mid
+            else:
+                return True
+
+        return False
+
+    def open(self):
+        # maps a current index file, building one where none is; called when the schema is loaded
+        with self._lock:
+            if self._map is not None:
+                return
+
+            index_data = None
+            for index_path in self.index_paths():
+                if not self._is_current(index_path):
+                    if index_data is None:
+                        index_data = self._index_bytes()
+                    if not self._write(index_path, index_data):
+                        continue
+                try:
+                    self._file = open(index_path, mode='rb')
+                    self._use(mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ))
+                except (OSError, ValueError):
+                    self.close()
+                    continue
+                self.index_path = index_path
+                return
+
+            self._use(index_data if index_data is not None else self._index_bytes())
+
+    def index_paths(self):
+        # where the index file may be kept, in order of preference: next to the list, so every user shares it, then
+        # in the user's cache directory under the hash of the list's path
+        yield self.list_path.with_name(self.list_path.name + self.suffix)
+
+        cache_dir = iou.user_cache_dir('index')
+        if iou.private_dir(cache_dir):
+            digest = hashlib.sha256(str(self.list_path.resolve()).encode('utf-8')).hexdigest()
+            yield cache_dir.joinpath(f'{digest[:32]}{self.suffix}')
+
+    def close(self):
+        if self._offsets is not None:
+            self._offsets.release()
+            self._offsets = None
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.index_path = None
+
+    def _use(self, index_data):
+        _, _, _, self.count = INDEX_HEADER.unpack_from(index_data, 0)
+        offsets_end = INDEX_HEADER.size + (self.count + 1) * 8
+        self._offsets = memoryview(index_data)[INDEX_HEADER.size:offsets_end].cast('Q')
+        self._map = index_data  # last, lookups start once it is set
+
+    def _index_bytes(self):
+        stat = self.list_path.stat()
+        with open(self.list_path, mode='r', newline='', encoding='utf-8') as list_file:
+            values = {line.rstrip('\r\n') for line in list_file}
+        values.discard('')
+        if self.ignore_case:
+            values = {value.lower() for value in values}
+
+        encoded = sorted(value.encode('utf-8') for value in values)
+        data_start = INDEX_HEADER.size + (len(encoded) + 1) * 8
+        offsets = [data_start]
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+
+        return b''.join([INDEX_HEADER.pack(INDEX_MAGIC, stat.st_size, stat.st_mtime_ns, len(encoded)),
+                         struct.pack(f'={len(offsets)}Q', *offsets)] + encoded)
+
+    def _write(self, index_path, index_data):
+        # True if index_data was written to index_path; False if its directory cannot be written
+        # write to a temporary file and rename, so concurrent readers never see a partial index
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=index_path.parent, suffix=INDEX_SUFFIX)
+        except OSError:
+            return False
+
+        try:
+            with os.fdopen(fd, mode='wb') as index_file:
+                index_file.write(index_data)
+            os.chmod(temp_path, 0o644)  # readable by every worker, like the list itself
+            os.replace(temp_path, index_path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+        return True
+
+    def _is_current(self, index_path):
+        try:
+            stat = self.list_path.stat()
+            with open(index_path, mode='rb') as index_file:
+                header = index_file.read(INDEX_HEADER.size)
+        except OSError:
+            return False
+
+        if len(header) != INDEX_HEADER.size:
+            return False
+
+        magic, size, mtime_ns, _ = INDEX_HEADER.unpack(header)
+
+        return magic == INDEX_MAGIC and size == stat.st_size and mtime_ns == stat.st_mtime_ns
@@ -0,0 +1,199 @@
+# stdlib
+import io
+import os
+import re
+import sys
+import stat
+import bz2
+import gzip
+import lzma
+import queue
+import fnmatch
+import pathlib
+import zipfile
+import threading
+import contextlib
+
+
+CHUNK_SIZE = 1 << 20
+QUEUE_DEPTH = 8
+LOOKAHEAD_SIZE = (QUEUE_DEPTH + 2) * CHUNK_SIZE  # queued chunks, the one being read and the text buffer
+
+# bz2 is matched on its whole header, 'BZh', the block size digit and the first block's magic: 'BZh' alone can start
+# a plain CSV
+MAGIC_NUMBERS = [
+    (re.compile(rb'\x1f\x8b'), 'gzip'),
+    (re.compile(rb'BZh[1-9]1AY&SY'), 'bz2'),
+    (re.compile(rb'\xfd7zXZ\x00'), 'xz'),
+    (re.compile(rb'PK(\x03\x04|\x05\x06)'), 'zip'),  # a member's header, or the end of an empty archive
+]
+MAGIC_SIZE = 10
+
+ZIP_MEMBERS = '*.csv'  # the members of a zip archive validated by default
+
+OPENERS = {
+    'gzip': gzip.open,
+    'bz2': bz2.open,
+    'xz': lzma.open,
+}
+
+
+def detect_compression(file_path):
+    with open(file_path, mode='rb') as infile:
+        head = infile.read(MAGIC_SIZE)
+
+    for magic, compression in MAGIC_NUMBERS:
+        if magic.match(head):
+            return compression
+
+    return None
+
+
+@contextlib.contextmanager
+def open_csv_source(file_path, compression=None, encoding=None):
+    # a text stream suitable for the csv module; compressed files are decompressed on a background thread
+    if compression is None:
+        with open(file_path, newline='', encoding=encoding) as cf:
+            yield cf
+    elif compression == 'zip':
+        raise ValueError('zip archives hold several members, use iter_zip_members')
+    else:
+        with _threaded_text(lambda: _decompressing(file_path, compression), encoding) as cf:
+            yield cf
+
+
+def iter_zip_members(file_path, pattern=ZIP_MEMBERS, encoding=None):
+    # yields (member name, text stream) for every member whose name matches the glob pattern, ignoring case,
+    # streamed straight out of the archive
+    with zipfile.ZipFile(file_path) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not fnmatch.fnmatchcase(info.filename.lower(), pattern.lower()):
+                continue
+
+            with _threaded_text(lambda: _zip_member(archive, info), encoding) as cf:
+                yield info.filename, cf
+
+
+def user_cache_dir(name):
+    # the directory of the user's own cache for name, e.g. ~/.cache/py_csl_validator/name
+    if sys.platform == 'win32':
+        base = pathlib.Path(os.environ.get('LOCALAPPDATA') or pathlib.Path.home())
+    else:
+        base = pathlib.Path(os.environ.get('XDG_CACHE_HOME') or pathlib.Path.home().joinpath('.cache'))
+
+    return base.joinpath('py_csl_validator', name)
+
+
+def private_dir(directory):
+    # creates directory if needed; True if only the current user can write to it (always, where there are no
+    # POSIX permissions to check)
+    try:
+        directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if not hasattr(os, 'getuid'):
+            return True
+
+        info = os.stat(directory)
+    except OSError:
+        return False
+
+    return stat.S_ISDIR(info.st_mode) and info.st_uid == os.getuid() and not info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def source_position(cf):
+    # bytes of the file behind a stream from open_csv_source read so far: compressed bytes for compressed input,
+    # so it compares with the file size. None where that is not known (zip members, unseekable streams).
+    raw = getattr(cf.buffer, 'raw', None)
+    if isinstance(raw, _QueueReader):
+        return raw.source_offset
+
+    try:
+        return cf.buffer.tell()
+    except (OSError, ValueError):
+        return None
+
+
+@contextlib.contextmanager
+def _decompressing(file_path, compression):
+    # (decompressed stream, function returning the compressed bytes read)
+    with open(file_path, mode='rb') as raw, OPENERS[compression](raw, mode='rb') as infile:
+        yield infile, raw.tell
+
+
+@contextlib.contextmanager
+def _zip_member(archive, info):
+    with archive.open(info) as infile:
+        yield infile, None
+
+
+@contextlib.contextmanager
+def _threaded_text(open_binary, encoding):
+    chunks = queue.Queue(maxsize=QUEUE_DEPTH)
+    stop = threading.Event()
+    producer = threading.Thread(target=_produce, args=(open_binary, chunks, stop), daemon=True)
+    producer.start()
+
+    try:
+        yield io.TextIOWrapper(io.BufferedReader(_QueueReader(chunks), CHUNK_SIZE), encoding=encoding, newline='')
+    finally:
+        stop.set()
+        # unblock a producer waiting on a full queue
+        while producer.is_alive():
+            try:
+                chunks.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        producer.join()
+
+
+def _produce(open_binary, chunks, stop):
+    # zlib, bz2 and lzma release the GIL while decompressing, so this overlaps with rule evaluation
+    try:
+        with open_binary() as (infile, tell):
+            while not stop.is_set():
+                chunk = infile.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                _put(chunks, (chunk, tell() if tell is not None else None), stop)
+    except Exception as e:
+        _put(chunks, e, stop)
+        return
+
+    _put(chunks, None, stop)
+
+
+def _put(chunks, item, stop):
+    while not stop.is_set():
+        try:
+            chunks.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+
+class _QueueReader(io.RawIOBase):
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.pending = memoryview(b'')
+        self.eof = False
+        self.source_offset = None  # source bytes read up to the end of the current chunk, if known
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.pending and not self.eof:
+            chunk = self.chunks.get()
+            if chunk is None:
+                self.eof = True
+            elif isinstance(chunk, Exception):
+                raise chunk
+            else:
+                chunk, self.source_offset = chunk
+                self.pending = memoryview(chunk)
+
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+
+        return size
@@ -0,0 +1,171 @@
+# stdlib
+import sys
+import sqlite3
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+SET_ENTRY_SIZE = 32  # hash table slot of a set, allowing for its load factor
+SPILL_CACHE_KIB = 2048  # largest page cache of a spilled set; sqlite writes the rest to a temporary file
+MEMO_CAPACITY = 4096  # distinct values remembered per pure column rule
+
+
+class MemoryBudgetExceeded(MemoryError):
+    pass
+
+
+class MemoryBudget:
+    # Approximate accounting of the memory held by the validator's growing components (unique values, the error
+    # store, decompression buffers). Sizes are estimates from sys.getsizeof, not measurements, but they grow with
+    # the real footprint and are cheap enough to update on every addition.
+    #
+    # grow() reports whether the tracked total is over the limit; each component then degrades in its own way:
+    # unique values spill to disk, the error store stops keeping records, and a component which cannot degrade
+    # raises MemoryBudgetExceeded.
+
+    def __init__(self, limit=None):
+        self.limit = limit  # bytes, or None to only measure
+        self.components = {}
+        self.total = 0
+        self.peak = 0
+        self.degraded = {}  # component -> what it did when the budget ran out
+
+    def grow(self, component, nbytes):
+        self.components[component] = self.components.get(component, 0) + nbytes
+        self.total += nbytes
+        if self.total > self.peak:
+            self.peak = self.total
+
+        return self.limit is not None and self.total > self.limit
+
+    def release(self, component, nbytes=None):
+        held = self.components.get(component, 0)
+        nbytes = held if nbytes is None else min(nbytes, held)
+        self.components[component] = held - nbytes
+        self.total -= nbytes
+
+    def degrade(self, component, action):
+        self.degraded[component] = action
+
+    def exceeded(self, component, reason):
+        return MemoryBudgetExceeded(f'Memory budget exceeded by {component} '
+                                    f'({self.total} of {self.limit} bytes in use): {reason}')
+
+    def reset_peak(self):
+        self.peak = self.total
+        self.degraded = {}
+
+    def stats(self):
+        stats = {
+            'limit': self.limit,
+            'current': self.total,
+            'peak': self.peak,
+            'components': {component: nbytes for component, nbytes in self.components.items() if nbytes},
+            'degraded': dict(self.degraded),
+        }
+        if resource is not None:
+            # ru_maxrss is in KiB on Linux and in bytes on macOS
+            scale = 1 if sys.platform == 'darwin' else 1024
+            stats['process_peak_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+        return stats
+
+
+def approximate_size(value):
+    if isinstance(value, tuple):
+        return sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+
+    return sys.getsizeof(value)
+
+
+class SeenValues:
+    # The values a unique rule has seen. Held in a set until the memory budget runs out, then moved to an anonymous
+    # sqlite database which keeps a small page cache in memory and the rest in a temporary file deleted on close.
+
+    def __init__(self):
+        self.values = set()
+        self.spilled = None
+        self.nbytes = 0
+        self.component = None  # the budget component the values are accounted to
+
+    def add(self, value, budget, component):
+        # returns True if value had not been seen before
+        self.component = component
+        if self.spilled is not None:
+            return self._add_spilled(value, budget, component)
+
+        if value in self.values:
+            return False
+
+        self.values.add(value)
+        size = approximate_size(value) + SET_ENTRY_SIZE
+        self.nbytes += size
+        if budget.grow(component, size):
+            self.spill(budget, component)
+
+        return True
+
+    def spill(self, budget, component):
+        # the page cache is what the spilled set keeps in memory, so it takes a small share of the budget
+        cache_kib = max(64, min(SPILL_CACHE_KIB, budget.limit // 4096))
+        try:
+            self.spilled = sqlite3.connect('')
+            self.spilled.execute(f'PRAGMA cache_size = -{cache_kib}')
+            self.spilled.execute('CREATE TABLE seen (value TEXT PRIMARY KEY) WITHOUT ROWID')
+            self.spilled.executemany('INSERT INTO seen VALUES (?)', ((repr(value),) for value in self.values))
+        except sqlite3.Error as e:
+            raise budget.exceeded(component, f'could not spill {len(self.values)} values to disk ({e})') from e
+
+        budget.degrade(component, f'spilled {len(self.values)} values to disk')
+        budget.release(component, self.nbytes)
+        budget.grow(component, cache_kib * 1024)
+        self.values = set()
+        self.nbytes = cache_kib * 1024
+
+    def close(self, budget):
+        # forgets the values and gives their memory back to the budget
+        if self.component is not None:
+            budget.release(self.component, self.nbytes)
+        if self.spilled is not None:
+            self.spilled.close()
+        self.__init__()
+
+    def _add_spilled(self, value, budget, component):
+        try:
+            cursor = self.spilled.execute('INSERT OR IGNORE INTO seen VALUES (?)', (repr(value),))
+        except sqlite3.Error as e:
+            raise budget.exceeded(component, f'could not add to the values spilled to disk ({e})') from e
+
+        return cursor.rowcount == 1
+
+
+class ValueMemo:
+    # Cell value -> result of a pure rule on one column, holding at most capacity values. When the table fills,
+    # it is cleared if the values repeated (a categorical column with a long tail) and switched off for good if
+    # they were mostly distinct (ids, free text), which then pay nothing but the first capacity lookups.
+
+    __slots__ = ('results', 'capacity', 'active', 'first_row')
+
+    def __init__(self, capacity=MEMO_CAPACITY):
+        self.results = {}
+        self.capacity = capacity
+        self.active = capacity > 0
+        self.first_row = None
+
+    def add(self, value, result, row):
+        if not self.results:
+            self.first_row = row
+        elif len(self.results) >= self.capacity:
+            # capacity distinct values in fewer than twice as many rows: most rows would miss
+            self.active = row - self.first_row >= 2 * self.capacity
+            self.results = {}
+            self.first_row = row
+            if not self.active:
+                return result
+
+        self.results[value] = result
+
+        return result
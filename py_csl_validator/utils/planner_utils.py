@@ -0,0 +1,150 @@
+# stdlib
+from collections import defaultdict
+
+# local
+from py_csl_validator.expressions.expression_classes_1_1 import Expressions1_1 as ec
+from py_csl_validator.expressions.expression_classes_1_2 import Expressions1_2 as ec2
+
+
+MIN_FAILURE_RATE = 0.001
+
+
+def plan_column_rules(column_rules, failure_rates=None):
+    # reorders every column rule in place, cheapest (and most selective, if rates are known) first
+    failure_rates = failure_rates if failure_rates else {}
+
+    for key, rule in column_rules.items():
+        for expression in rule.col_vals:
+            plan_expression(expression)
+
+        rule.col_vals = order_expressions(rule.col_vals, failure_rates.get(key))
+
+    return column_rules
+
+
+def plan_expression(expression):
+    # bottom-up, so the sub-expressions of a container are planned before it is ordered
+    for sub_expression in expression.all_expressions(post_order=True):
+        # only containers which short-circuit benefit from reordering
+        if isinstance(sub_expression, (ec.AndExpr, ec.OrExpr, ec.ParenthesizedExpr)):
+            planned = order_expressions(sub_expression.expressions)
+            if isinstance(sub_expression, ec.AndExpr):
+                # errors name the failing expressions by their position in the schema, not in the plan
+                positions = dict(zip(map(id, sub_expression.expressions), sub_expression.schema_positions))
+                sub_expression.schema_positions = [positions[id(expression)] for expression in planned]
+            sub_expression.expressions = planned
+
+
+def order_expressions(expressions, rates=None):
+    # a stateful expression (unique, identical) must see every row it saw before planning, so skipping it
+    # through short-circuiting would change the result: keep such lists in schema order
+    if any(expression.is_stateful() for expression in expressions):
+        return expressions
+
+    rates = rates if rates else {}
+
+    def sort_key(expression):
+        cost = expression.estimate_cost()
+        if expression.label() in rates:
+            return cost / max(rates[expression.label()], MIN_FAILURE_RATE)
+
+        return cost
+
+    return sorted(expressions, key=sort_key)  # stable, so equal-cost checks keep schema order
+
+
+def failure_rates(failure_counts, row_count):
+    # turns the failure counts collected by a previous run into rates the planner can consume
+    rates = defaultdict(dict)
+    if not row_count:
+        return rates
+
+    for key, counts in failure_counts.items():
+        for label, count in counts.items():
+            rates[key][label] = count / row_count
+
+    return rates
+
+
+class Profile:
+    # A subset of a schema's rules to run, e.g. a fast gate on hard errors ahead of the full validation. Columns
+    # left out keep their place in the header and column count checks but run no rules, and top level expressions
+    # of an excluded kind are dropped from their column, so neither is evaluated at all. Kinds are expression
+    # labels ('ChecksumExpr', 'CustomExpr(mod97)'), 'external' for rules reading the filesystem and 'stateful'
+    # for unique and identical. severities selects columns by report level: 'e', or 'w' for @warningDirective.
+
+    def __init__(self, columns=None, exclude_columns=(), severities=None, exclude_kinds=()):
+        self.columns = frozenset(columns) if columns is not None else None
+        self.exclude_columns = frozenset(exclude_columns)
+        self.severities = frozenset(severities) if severities is not None else None
+        self.exclude_kinds = frozenset(exclude_kinds)
+
+    def apply(self, column_rules):
+        # copies of the (planned) column rules holding only the selected expressions
+        unknown = ((self.columns or frozenset()) | self.exclude_columns) - column_rules.keys()
+        if unknown:
+            raise ValueError(f'Profile names columns the schema does not have: {sorted(unknown)}')
+
+        selected = {}
+        for key, rule in column_rules.items():
+            report_level = 'w' if rule.col_directives['warning'] else 'e'
+            if (self.columns is not None and key not in self.columns) or key in self.exclude_columns or \
+                    (self.severities is not None and report_level not in self.severities):
+                col_vals = []
+            else:
+                col_vals = [expression for expression in rule.col_vals if not self._excluded(expression)]
+            selected[key] = type(rule)(col_vals, rule.col_directives)
+            selected[key].freeze()
+
+        return selected
+
+    def _excluded(self, expression):
+        if not self.exclude_kinds:
+            return False
+
+        pending = [expression]
+        while pending:
+            expression = pending.pop()
+            if expression.label() in self.exclude_kinds or \
+                    (expression.external and 'external' in self.exclude_kinds) or \
+                    (expression.stateful and 'stateful' in self.exclude_kinds):
+                return True
+            pending.extend(expression.sub_expressions())
+
+        return False
+
+
+def batch_targets(column_rules):
+    # (expression, column key, ignore case) for every custom check which can run as a batch over a chunk of rows:
+    # one with a batch function and literal arguments, so the column's values are all it needs
+    targets = []
+    for key, rule in column_rules.items():
+        ignore_case = rule.col_directives['ignore_case']
+        pending = [(expression, key) for expression in rule.col_vals]
+        while pending:
+            expression, target_key = pending.pop()
+            if isinstance(expression, ec.SingleExpr) and expression.col_ref is not None:
+                target_key = expression.col_ref.key
+            if isinstance(expression, ec2.CustomExpr):
+                if expression.check.batch is not None and expression.literal_args() is not None:
+                    targets.append((expression, target_key, ignore_case))
+            pending.extend((sub_expression, target_key) for sub_expression in expression.sub_expressions())
+
+    return targets
+
+
+def expression_positions(column_rules):
+    # every expression of the planned rules in a stable order, so processes which load the same schema agree on
+    # positions and results kept outside the process can refer to expressions by them
+    return [expression for expression, _ in walk_expressions(column_rules)]
+
+
+def walk_expressions(column_rules):
+    # (expression, (column index, index of its top level expression)) in expression_positions order
+    for column_index, rule in enumerate(column_rules.values()):
+        for top_index, top in enumerate(rule.col_vals):
+            pending = [top]
+            while pending:
+                expression = pending.pop()
+                yield expression, (column_index, top_index)
+                pending.extend(reversed(expression.sub_expressions()))
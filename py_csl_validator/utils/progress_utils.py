@@ -0,0 +1,165 @@
+# stdlib
+import os
+import time
+import tempfile
+
+
+CLOCK_STRIDE = 64  # rows between clock reads when reporting by time
+SEVERITY_NAMES = {'e': 'error', 'w': 'warning'}
+
+
+class ProgressReport:
+
+    __slots__ = ('csv_file', 'rows', 'bytes_read', 'total_bytes', 'elapsed', 'errors', 'structural_errors',
+                 'finished')
+
+    def __init__(self, csv_file, rows, bytes_read, total_bytes, elapsed, errors, structural_errors, finished):
+        self.csv_file = csv_file
+        self.rows = rows  # data rows read so far
+        self.bytes_read = bytes_read  # bytes of the file read so far (compressed bytes for compressed input)
+        self.total_bytes = total_bytes
+        self.elapsed = elapsed  # seconds
+        self.errors = errors  # report level -> failures so far
+        self.structural_errors = structural_errors
+        self.finished = finished
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        # seconds left, extrapolated from the share of the file read so far; None if it cannot be told
+        if self.finished:
+            return 0.0
+        if not self.bytes_read or not self.total_bytes:
+            return None
+
+        return self.elapsed * (self.total_bytes - self.bytes_read) / self.bytes_read
+
+
+class ProgressMonitor:
+    # Calls every callback with a ProgressReport after every_rows rows or every_seconds seconds, whichever comes
+    # first, and once more when the file is done. Between reports a row costs an integer comparison; the clock
+    # is only read every CLOCK_STRIDE rows.
+    #
+    #     monitor = pg.ProgressMonitor(print_progress, pg.OpenMetricsExporter('/var/lib/node_exporter/csl.prom'))
+    #     CslValidator(schema, progress=monitor).validate(csv_file)
+
+    def __init__(self, *callbacks, every_rows=100000, every_seconds=10.0):
+        self.callbacks = callbacks
+        self.every_rows = every_rows
+        self.every_seconds = every_seconds
+        self.csv_file = None
+        self.total_bytes = None
+        self.position = None
+        self.started = 0.0
+        self.rows = 0
+        self.next_rows = 0
+        self.next_clock = 0
+        self.next_time = 0.0
+
+    def start(self, csv_file, total_bytes):
+        self.csv_file = str(csv_file)
+        self.total_bytes = total_bytes
+        self.position = None
+        self.started = time.monotonic()
+        self.rows = 0
+        self._schedule()
+
+    def follow(self, position):
+        # position() returns the bytes of the file read so far, or None; set for every stream validated
+        self.position = position
+
+    def advance(self, rows, run):
+        self.rows += rows
+        if self.rows >= self.next_rows:
+            self.report(run)
+        elif self.rows >= self.next_clock:
+            self.next_clock = self.rows + CLOCK_STRIDE
+            if time.monotonic() >= self.next_time:
+                self.report(run)
+
+    def report(self, run, finished=False):
+        # run is the validator.ValidationRun being followed
+        stores = list(run.member_errors.values()) if run.member_errors else [run.errors]
+        errors = {level: sum(store.severity_counts[level] for store in stores) for level in SEVERITY_NAMES}
+        bytes_read = self.total_bytes if finished else (self.position() if self.position is not None else None)
+
+        report = ProgressReport(self.csv_file, self.rows, bytes_read, self.total_bytes,
+                                time.monotonic() - self.started, errors, len(run.structural_errors), finished)
+        for callback in self.callbacks:
+            callback(report)
+
+        self._schedule()
+
+    def _schedule(self):
+        self.next_rows = self.rows + self.every_rows if self.every_rows else float('inf')
+        self.next_clock = self.rows + CLOCK_STRIDE
+        self.next_time = time.monotonic() + self.every_seconds if self.every_seconds else float('inf')
+
+
+class OpenMetricsExporter:
+    # Writes the latest report to path in the OpenMetrics text format, replacing the file atomically so a
+    # scraper (e.g. node_exporter's textfile collector) never reads half of it. labels are added to every sample,
+    # along with the file being validated.
+
+    def __init__(self, path, prefix='csl_validation', labels=None):
+        self.path = path
+        self.prefix = prefix
+        self.labels = dict(labels) if labels else {}
+
+    def __call__(self, report):
+        text = self.render(report)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', dir=directory, delete=False) as out:
+            out.write(text)
+        os.replace(out.name, self.path)
+
+    def render(self, report):
+        labels = dict(self.labels, file=report.csv_file)
+        lines = []
+
+        def family(name, kind, help_text, samples, unit=None):
+            name = f'{self.prefix}_{name}'
+            lines.append(f'# TYPE {name} {kind}')
+            if unit:
+                lines.append(f'# UNIT {name} {unit}')
+            lines.append(f'# HELP {name} {help_text}')
+            suffix = '_total' if kind == 'counter' else ''
+            for extra, value in samples:
+                lines.append(f'{name}{suffix}{_labels(dict(labels, **extra))} {value}')
+
+        family('rows', 'counter', 'Data rows read.', [({}, report.rows)])
+        if report.bytes_read is not None:
+            family('read_bytes', 'counter', 'Bytes of the file read.', [({}, report.bytes_read)], 'bytes')
+        if report.total_bytes is not None:
+            family('file_bytes', 'gauge', 'Size of the file.', [({}, report.total_bytes)], 'bytes')
+        family('rows_per_second', 'gauge', 'Rows read per second since the start.',
+               [({}, f'{report.rows_per_second:.3f}')])
+        family('failures', 'counter', 'Rule failures by severity.',
+               [({'severity': name}, report.errors[level]) for level, name in SEVERITY_NAMES.items()])
+        family('structural_errors', 'counter', 'Header, column count and quoting defects.',
+               [({}, report.structural_errors)])
+        family('elapsed_seconds', 'gauge', 'Time since the validation started.', [({}, f'{report.elapsed:.3f}')],
+               'seconds')
+        if report.eta is not None:
+            family('eta_seconds', 'gauge', 'Estimated time until the validation finishes.',
+                   [({}, f'{report.eta:.3f}')], 'seconds')
+        family('finished', 'gauge', '1 once the validation has finished.', [({}, int(report.finished))])
+        lines.append('# EOF')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+
+    escaped = (f'{name}="{_escape(value)}"' for name, value in sorted(labels.items()))
+
+    return '{' + ','.join(escaped) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
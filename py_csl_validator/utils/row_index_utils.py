@@ -0,0 +1,132 @@
+# stdlib
+import io
+import os
+import csv
+import json
+import bisect
+import tempfile
+
+# local
+import py_csl_validator.utils.structure_utils as st
+
+
+ROW_INDEX_FORMAT = 1
+ROW_INDEX_SUFFIX = '.cslrows'
+DEFAULT_EVERY = 10000
+
+
+class RowLocation:
+
+    __slots__ = ('row', 'line', 'start', 'end')
+
+    def __init__(self, row, line, start, end):
+        self.row = row
+        self.line = line  # of the record's last line, as csv.reader counts them
+        self.start = start  # byte offsets of the record, end exclusive
+        self.end = end
+
+
+def index_path(csv_file):
+    return f'{csv_file}{ROW_INDEX_SUFFIX}'
+
+
+def iter_records(raw, start=0, row=1, line=1):
+    # a RowLocation for every record of the binary file raw from the byte offset start, which must begin a record
+    # numbered row on line line, found by st.RecordLines. Blank lines are not rows, as with csv.reader.
+    scanner = st.RecordLines.of_file(raw, start, line - 1)
+    while True:
+        start = scanner.offset
+        lines = scanner.record()
+        if not lines:
+            return
+
+        if len(lines) > 1 or lines[0].strip(b'\r\n'):
+            yield RowLocation(row, scanner.line_num, start, scanner.offset)
+            row += 1
+
+
+def build_index(csv_file, every, failing_rows, no_header):
+    # the location of every every-th data row and of every failing row, from one scan of the file
+    failing_rows = set(failing_rows)
+    first_row = 1 if no_header else 2
+    stat = os.stat(csv_file)
+
+    checkpoints = []
+    failing = []
+    with open(csv_file, mode='rb') as raw:
+        for location in iter_records(raw):
+            entry = (location.row, location.line, location.start, location.end)
+            if location.row >= first_row and (location.row - first_row) % every == 0:
+                checkpoints.append(entry)
+            if location.row in failing_rows:
+                failing.append(entry)
+
+    return {
+        'format': ROW_INDEX_FORMAT,
+        'csv_file': os.path.abspath(csv_file),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'every': every,
+        'first_row': first_row,
+        'checkpoints': checkpoints,
+        'failing': failing,
+    }
+
+
+def write_index(index, index_file):
+    directory = os.path.dirname(os.path.abspath(index_file))
+    with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', dir=directory, delete=False) as out:
+        json.dump(index, out)
+    os.replace(out.name, index_file)
+
+
+def load_index(index_file):
+    with open(index_file, mode='r', encoding='utf-8') as index_in:
+        index = json.load(index_in)
+    if index.get('format') != ROW_INDEX_FORMAT:
+        raise ValueError(f'Unsupported row index format {index.get("format")} in {index_file}')
+
+    return index
+
+
+def locate_rows(raw, index, rows):
+    # RowLocations of rows (ascending) in the binary file raw, None for rows past its end. While the file is the
+    # one indexed, rows the index holds are read directly and others are scanned for from the closest indexed row
+    # before them. A file changed since (fixed rows of a different length move everything after them) is scanned
+    # from its start instead.
+    stat = os.fstat(raw.fileno())
+    exact = {}
+    anchors = [(1, 1, 0)]  # (row, line, offset) at which a record starts
+    if (stat.st_size, stat.st_mtime_ns) == (index['size'], index['mtime_ns']):
+        for row, line, start, end in index['checkpoints'] + index['failing']:
+            exact[row] = RowLocation(row, line, start, end)
+            anchors.append((row + 1, line + 1, end))
+        anchors.sort()
+    anchor_rows = [anchor[0] for anchor in anchors]
+
+    located = {}
+    scanner = None
+    current = None
+    for row in rows:
+        if row in exact:
+            located[row] = exact[row]
+            continue
+
+        anchor = anchors[bisect.bisect_right(anchor_rows, row) - 1]
+        if current is None or not anchor[0] <= current.row <= row:
+            scanner = iter_records(raw, anchor[2], anchor[0], anchor[1])
+            current = next(scanner, None)
+        while current is not None and current.row < row:
+            current = next(scanner, None)
+        located[row] = current if current is not None and current.row == row else None
+
+    return located
+
+
+def read_record(raw, location, delimiter, quoting, encoding=None):
+    # the cells of the record at location, decoded as the validator's text streams decode the file
+    raw.seek(location.start)
+    data = raw.read(location.end - location.start)
+    text = io.TextIOWrapper(io.BytesIO(data), encoding=encoding, newline='')
+
+    return next(csv.reader(text, quoting=quoting, delimiter=delimiter), [])
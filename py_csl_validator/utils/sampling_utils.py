@@ -0,0 +1,133 @@
+# stdlib
+import os
+import csv
+import math
+import statistics
+
+# local
+import py_csl_validator.utils.structure_utils as st
+
+
+RESYNC_ATTEMPTS = 5
+
+
+class ColumnEstimate:
+
+    def __init__(self, assessed, failures, confidence, not_assessed):
+        self.assessed = assessed
+        self.failures = failures
+        self.not_assessed = not_assessed  # labels of whole-file rules (unique, identical) a sample cannot judge
+
+        if assessed:
+            self.failure_rate = failures / assessed
+            self.confidence_interval = wilson_interval(failures, assessed, confidence)
+        else:
+            self.failure_rate = None
+            self.confidence_interval = None
+
+
+class SampleReport:
+
+    def __init__(self, method, sampled_rows, confidence, columns):
+        self.method = method
+        self.sampled_rows = sampled_rows
+        self.confidence = confidence
+        self.columns = columns  # column name -> ColumnEstimate
+
+    def conformant(self, max_failure_rate=0.0):
+        # true if no column's upper confidence bound exceeds the tolerated failure rate
+        return all(estimate.confidence_interval is None or estimate.confidence_interval[1] <= max_failure_rate
+                   for estimate in self.columns.values())
+
+
+def wilson_interval(failures, n, confidence=0.95):
+    # Wilson score interval, well behaved for the small samples and near-zero rates typical of triage
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = failures / n
+    denominator = 1 + z ** 2 / n
+    centre = (p + z ** 2 / (2 * n)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denominator
+
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+def reservoir_sample(rows, sample_size, rng):
+    # algorithm R: a uniform sample of a stream of unknown length in a single pass
+    reservoir = []
+    for i, row in enumerate(rows):
+        if i < sample_size:
+            reservoir.append(row)
+        else:
+            j = rng.randrange(i + 1)
+            if j < sample_size:
+                reservoir[j] = row
+
+    return reservoir
+
+
+def seek_sample(csv_file, sample_size, rng, fieldnames, delimiter, quoting, skip_header, encoding='utf-8'):
+    # picks rows by seeking to random byte offsets, so only the sampled parts of the file are read. Rows following
+    # long rows are slightly more likely to be picked; this is acceptable for triage.
+    size = os.path.getsize(csv_file)
+    samples = {}
+
+    with open(csv_file, mode='rb') as cf:
+        data_start = _header_end(cf, delimiter, quoting, encoding) if skip_header else 0
+        if data_start >= size:
+            return []
+
+        attempts = 0
+        while len(samples) < sample_size and attempts < sample_size * 4:
+            attempts += 1
+            offset = rng.randrange(data_start, size)
+            if offset > data_start:
+                cf.seek(offset - 1)
+                cf.readline()  # resynchronize on the next line boundary
+            else:
+                cf.seek(offset)
+
+            line_start = cf.tell()
+            if line_start >= size or line_start in samples:
+                continue
+
+            # samples are keyed by where the record read actually starts: line starts inside one multi-line record
+            # all resynchronize on the record after it, which is drawn again rather than sampled twice
+            record_start, record = _read_record(cf, len(fieldnames), delimiter, quoting, encoding)
+            if record is not None and record_start not in samples:
+                samples[record_start] = dict(zip(fieldnames, record))
+
+    return sorted(samples.items())
+
+
+def _decoded_lines(scanner, encoding):
+    return (line.decode(encoding, errors='replace') for line in scanner)
+
+
+def _header_end(cf, delimiter, quoting, encoding):
+    scanner = st.RecordLines.of_file(cf)
+    next(csv.reader(_decoded_lines(scanner, encoding), delimiter=delimiter, quoting=quoting), None)
+
+    return scanner.offset
+
+
+def _read_record(cf, column_count, delimiter, quoting, encoding):
+    # a random offset may land inside a quoted multi-line field, where quote parity is inverted, so records are
+    # found by parsing rather than by st.RecordLines' count: a record with the wrong shape means we are not on a
+    # row boundary, so move on to the next line and try again. Returns the offset the record starts at and the
+    # record, or (None, None). The reader pulls lines from the scanner only as a record needs them, so the
+    # scanner's offset before each record is read is where it starts.
+    scanner = st.RecordLines.of_file(cf, cf.tell())
+    reader = csv.reader(_decoded_lines(scanner, encoding), delimiter=delimiter, quoting=quoting)
+    for _ in range(RESYNC_ATTEMPTS):
+        record_start = scanner.offset
+        try:
+            record = next(reader)
+        except StopIteration:
+            return None, None
+        except csv.Error:
+            continue
+
+        if len(record) == column_count:
+            return record_start, record
+
+    return None, None
@@ -0,0 +1,183 @@
+# stdlib
+import csv
+
+
+SCAN_BLOCK = 1 << 20
+
+
+class StructuralDefect:
+
+    __slots__ = ('row', 'line', 'kind', 'message', 'member')
+
+    def __init__(self, row, line, kind, message, member=None):
+        self.row = row  # record number, counting the header as row 1 when there is one
+        self.line = line  # physical line the record ends on
+        self.kind = kind  # 'header', 'column_count', 'quoting', 'malformed', 'missing_row' or 'no_members'
+        self.message = message
+        self.member = member  # zip member name, if the input was an archive
+
+    def __repr__(self):
+        return f'StructuralDefect(row={self.row}, kind={self.kind!r}, message={self.message!r})'
+
+
+def check_structure(cf, column_names, delimiter=',', quoted=False, total_columns=None, no_header=False,
+                    ignore_column_name_case=False, max_defects=10):
+    # Streams cf through the C csv reader only, no rules are evaluated. Checks the header against the column
+    # definitions, every record's field count against @totalColumns and, with @quoted, that fields are quoted.
+    # Returns at most max_defects defects (all of them if max_defects is None), in file order.
+    #
+    # Quoting is checked with QUOTE_NONNUMERIC: the reader converts unquoted fields to float, so an unquoted
+    # numeric field comes back as a float and an unquoted non-numeric field raises ValueError for the record.
+    # Empty unquoted fields cannot be told apart from "" this way and are accepted.
+    expected = total_columns if total_columns is not None else len(column_names)
+    if quoted:
+        lines = RecordLines(cf)
+        reader = csv.reader(lines, delimiter=delimiter, quoting=csv.QUOTE_NONNUMERIC)
+    else:
+        # without @quoted the reader never gives up part way through a record, so read the file directly
+        lines = None
+        reader = csv.reader(cf, delimiter=delimiter, quoting=csv.QUOTE_MINIMAL)
+    defects = []
+
+    def add(row, kind, message):
+        line = lines.line_num if lines is not None else reader.line_num
+        defects.append(StructuralDefect(row, line, kind, message))
+        return max_defects is not None and len(defects) >= max_defects
+
+    row = 0
+    while True:
+        row += 1
+        if lines is not None:
+            lines.start_record()
+        try:
+            record = next(reader)
+        except StopIteration:
+            break
+        except ValueError:
+            # the reader abandons the record at the unquoted field; skip what is left of it
+            lines.finish_record()
+            if add(row, 'quoting', 'Record contains an unquoted field'):
+                break
+            continue
+        except csv.Error as e:
+            if lines is not None:
+                lines.finish_record()
+            if add(row, 'malformed', f'Record could not be parsed: {e}'):
+                break
+            continue
+
+        if not record:
+            row -= 1  # blank lines are not rows, as in validate()
+            continue
+
+        if quoted and any(type(field) is float for field in record):
+            if add(row, 'quoting', 'Record contains an unquoted field'):
+                break
+
+        if row == 1 and not no_header:
+            message = header_mismatch([str(field) for field in record], column_names, ignore_column_name_case)
+            if message and add(row, 'header', message):
+                break
+            continue
+
+        if len(record) != expected:
+            if add(row, 'column_count', column_count_mismatch(len(record), expected)):
+                break
+
+    return defects
+
+
+def header_mismatch(header, column_names, ignore_column_name_case=False):
+    # returns a message describing how the header differs from the schema's columns, or None if it matches
+    comparison = list(column_names)
+    if ignore_column_name_case:
+        header = [name.lower() for name in header]
+        comparison = [name.lower() for name in comparison]
+
+    if header == comparison:
+        return None
+
+    if len(header) != len(comparison):
+        return f'Header has {len(header)} columns, expected {len(comparison)}'
+
+    return f'Header {header} does not match the schema columns {comparison}'
+
+
+def column_count_mismatch(count, expected):
+    return f'Record has {count} columns, expected {expected}'
+
+
+def no_members(pattern):
+    # a zip archive with nothing to validate is a defect of the whole file, not a valid empty one
+    return StructuralDefect(None, None, 'no_members', f'The archive has no member matching {pattern}')
+
+
+class RecordLines:
+    # The package's one record scanner: a line iterator which knows where records end without parsing them. A
+    # record ends with the first line end at which it holds an even number of quote characters; escaped quotes ("")
+    # come in pairs and do not change the parity. The structure pass hands it to csv.reader, so after the reader
+    # gives up on a record the rest of a multi-line quoted field can be skipped; row indexes, sharding and sampling
+    # read binary files through it for record boundaries, byte offsets and line numbers at close to read speed.
+    # Parity only holds when counting starts at a record, and a quote inside an unquoted field (which the csv
+    # module reads as a literal character) throws it off.
+
+    def __init__(self, lines, quote='"', offset=0, line_num=0, raw=None):
+        self.lines = iter(lines)  # str or bytes lines, with their line ends
+        self.quote = quote
+        self.newline = b'\n' if isinstance(quote, bytes) else '\n'
+        self.offset = offset  # of the next line, in bytes when reading a binary file
+        self.line_num = line_num  # lines read so far, as csv.reader counts them
+        self.quotes = 0  # quote characters in the record read so far
+        self.raw = raw
+
+    @classmethod
+    def of_file(cls, raw, start=0, line_num=0):
+        # the lines of the binary file raw from the byte offset start, line_num lines into the file
+        raw.seek(start)
+
+        return cls(iter(raw.readline, b''), b'"', start, line_num, raw)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self.lines)
+        self.line_num += 1
+        self.offset += len(line)
+        self.quotes += line.count(self.quote)
+
+        return line
+
+    def record(self):
+        # the lines of the next record, [] at the end of the input. A record cut short by the end of the input
+        # leaves an odd count in quotes.
+        lines = []
+        for line in self:
+            lines.append(line)
+            if not self.quotes % 2 or not line.endswith(self.newline):
+                self.quotes = 0
+                break
+
+        return lines
+
+    def start_record(self):
+        self.quotes = 0
+
+    def finish_record(self):
+        # skips what is left of a record csv.reader gave up on part way through
+        while self.quotes % 2:
+            try:
+                next(self)
+            except StopIteration:
+                return
+
+    def skip_to(self, offset):
+        # moves a binary scanner ahead to the byte offset, counting quotes and line ends in bulk; the next line read
+        # is the rest of the one offset falls in
+        while self.offset < offset:
+            block = self.raw.read(min(SCAN_BLOCK, offset - self.offset))
+            if not block:
+                break
+            self.quotes += block.count(self.quote)
+            self.line_num += block.count(self.newline)
+            self.offset += len(block)
@@ -1,16 +1,46 @@
 # stdlib
 import csv
+import random
+import itertools
+import functools
+import pathlib
 from collections import defaultdict
 
 # local
 import py_csl_validator.utils.validator_utils as vu
+import py_csl_validator.utils.planner_utils as pu
+import py_csl_validator.utils.sampling_utils as su
+import py_csl_validator.utils.io_utils as iu
+import py_csl_validator.utils.error_utils as eu
+import py_csl_validator.utils.structure_utils as st
+import py_csl_validator.utils.memory_utils as mu
+import py_csl_validator.utils.cache_utils as cu
+import py_csl_validator.utils.row_index_utils as ri
+import py_csl_validator.codegen.codegen as cg
+
+
+LOOKAHEAD_COMPONENT = 'decompression buffers'
+BATCH_SIZE = 1024  # rows read ahead, so custom batch checks see whole chunks
 
 
 class CslValidator:
+    # A compiled schema. Loading parses, plans and freezes the schema's rules once; validating only reads them,
+    # and every validation keeps its state (errors, row numbers, the values unique rules have seen, ...) in a
+    # ValidationRun of its own. One validator can therefore check any number of files at the same time, from
+    # threads or async tasks:
+    #
+    #     run = validator.new_run()
+    #     valid = run.validate(csv_file)  # errors in run.errors and run.structural_errors
+    #
+    # validate() and the other validate_* methods start a run and keep its results on the validator (self.errors,
+    # self.row_count, ...), for callers which check one file at a time.
 
-    def __init__(self, schema_file):
+    def __init__(self, schema_file, failure_rates=None, fail_fast=False, engine='objects', structure_first=False,
+                 max_structural_defects=10, memory_budget=None, result_cache=None, progress=None,
+                 summarize_errors=False, max_exemplars=eu.MAX_EXEMPLARS, profile=None, profiles=None,
+                 zip_members=iu.ZIP_MEMBERS):
         version = vu.find_version_number(schema_file)
-        visitor = vu.find_visitor(version)
+        visitor = vu.find_visitor(version)(schema_dir=pathlib.Path(schema_file).parent)
         parser = vu.find_parser(version)
 
         with open(schema_file, mode='r', newline='', encoding='utf-8') as csvs:
@@ -19,72 +49,724 @@ class CslValidator:
         tree = parser.parse(csvs_text)
         schema = visitor.visit(tree)
 
-        self.global_directives = schema.global_directives.directives
-        self.column_rules = {str(col_def.name): col_def.rule for col_def in schema.body.column_defs}
-        self.row_count = 0
-        self.errors = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))  # nested defaultdicts: https://stackoverflow.com/questions/5029934/defaultdict-of-defaultdict
+        self.schema_file = schema_file
+        self.global_directives = schema.prolog.global_directives.directives
+        self.schema_rules = {str(col_def.name): col_def.rule for col_def in schema.body.column_defs}
+        pu.plan_column_rules(self.schema_rules, failure_rates)
+        for rule in self.schema_rules.values():
+            rule.freeze()  # planned rules are read-only from here on, and cheap to pickle for worker processes
 
-    def validate(self, csv_file):
-        valid = True
-        self.errors.clear()
+        # 'codegen' runs rows through a generated validate_row function, cached per user, see codegen.compile_rules
+        if engine not in ('codegen', 'objects'):
+            raise ValueError(f'Unknown validation engine: {engine}')
+        self.engine = engine
+
+        # named pu.Profile subsets of the rules, selected per call with validate(csv_file, profile=name)
+        self.profiles = dict(profiles) if profiles else {}
+        self.compiled = self._compile(self._profile(profile).apply(self.schema_rules) if profile is not None
+                                      else self.schema_rules)
+
+        self.fail_fast = fail_fast
+        self.structure_first = structure_first  # reject structurally broken files before any rule runs
+        self.max_structural_defects = max_structural_defects
+        self.memory_budget = memory_budget  # bytes per run; unique values spill and the error store caps past it
+        self.summarize_errors = summarize_errors  # group failures in an eu.ErrorSummary rather than keep them all
+        self.max_exemplars = max_exemplars
+        self.result_cache = result_cache  # a cu.ResultCache, or None to validate every time
+        self.progress = progress  # a pg.ProgressMonitor called while rows are validated, or None
+        self.zip_members = zip_members  # glob of the zip archive members validated, matched ignoring case
+
+        # the results of the last validate* call: row_count, errors, member_errors, structural_errors,
+        # failure_counts and memory, see ValidationRun
+        self._publish(self.new_run())
+
+    @property
+    def column_rules(self):
+        return self.compiled.column_rules
+
+    def new_run(self, profile=None, progress=None):
+        # a fresh validation of this schema; profile (a pu.Profile or the name of one in self.profiles) runs a
+        # subset of the rules. A progress monitor follows one run at a time, it defaults to self.progress.
+        compiled = self._compile(self._profile(profile).apply(self.schema_rules)) if profile is not None \
+            else self.compiled
+
+        return ValidationRun(self, compiled, progress if progress is not None else self.progress)
+
+    def validate(self, csv_file, profile=None, index_every=None, index_file=None):
+        # gzip, bz2 and xz inputs are detected by their magic bytes and decompressed while rows are validated.
+        # For a zip archive every member matching self.zip_members is validated and self.member_errors maps member
+        # names to errors; an archive without any is recorded as a 'no_members' structural defect.
+        # index_every writes a row index for revalidate(), see ValidationRun.validate.
+        run = self.new_run(profile)
+        run.validate(csv_file, index_every, index_file)
+
+        return self._publish(run)
+
+    def revalidate(self, csv_file, rows=None, index_file=None):
+        # re-checks single rows of a file validated with index_every, see ValidationRun.revalidate
+        run = self.new_run()
+        run.revalidate(csv_file, rows, index_file)
+
+        return self._publish(run)
+
+    def validate_stream(self, cf):
+        # validates an open text stream (opened with newline='') positioned at the header, or at the first row
+        # with @noHeader; rows are numbered from the start of the stream
+        run = self.new_run()
+        run.validate_stream(cf)
+
+        return self._publish(run)
+
+    def validate_rows(self, rows, header=None):
+        # validates rows held in memory, see ValidationRun.validate_rows
+        run = self.new_run()
+        run.validate_rows(rows, header)
+
+        return self._publish(run)
+
+    def validate_frame(self, frame):
+        # validates a pandas DataFrame as if written by frame.to_csv(index=False), see ValidationRun.validate_frame
+        run = self.new_run()
+        run.validate_frame(frame)
+
+        return self._publish(run)
+
+    def _publish(self, run):
+        self.row_count = run.row_count
+        self.errors = run.errors  # row -> {column: {report level: [messages]}}, formatted on access
+        self.member_errors = run.member_errors
+        self.structural_errors = run.structural_errors  # st.StructuralDefect: header, column count and quoting
+        self.failure_counts = run.failure_counts
+        self.memory = run.memory
+
+        return run.valid
+
+    def check_structure(self, csv_file, max_defects=10):
+        # a structure-only pass through the C csv reader: header, column counts against @totalColumns and, with
+        # @quoted, quoting. No rules run. Returns (and keeps in self.structural_errors) the first max_defects defects.
+        self.structural_errors = self._structure(csv_file, max_defects)
+
+        return self.structural_errors
+
+    def _structure(self, csv_file, max_defects):
+        quoting, delimiter = self._dialect()
+        options = {
+            'delimiter': delimiter,
+            'quoted': self.global_directives['quoted'],
+            'total_columns': self.global_directives['total_columns'],
+            'no_header': self.global_directives['no_header'],
+            'ignore_column_name_case': self.global_directives['ignore_column_name_case'],
+        }
+
+        compression = iu.detect_compression(csv_file)
+        if compression != 'zip':
+            with iu.open_csv_source(csv_file, compression) as cf:
+                return st.check_structure(cf, self.column_rules.keys(), max_defects=max_defects, **options)
+
+        defects = []
+        members = 0
+        for member, cf in iu.iter_zip_members(csv_file, self.zip_members):
+            members += 1
+            remaining = None if max_defects is None else max_defects - len(defects)
+            for defect in st.check_structure(cf, self.column_rules.keys(), max_defects=remaining, **options):
+                defect.member = member
+                defects.append(defect)
+            if remaining is not None and len(defects) >= max_defects:
+                break
+        if not members:
+            defects.append(st.no_members(self.zip_members))
+
+        return defects
+
+    def memory_stats(self):
+        # approximate bytes held per component, the peak of the last run and how components degraded, if they did
+        stats = self.memory.stats()
+        stats['errors_dropped'] = sum(errors.dropped for errors in self.member_errors.values()) \
+            if self.member_errors else self.errors.dropped
+
+        return stats
+
+    def _compile(self, column_rules):
+        return CompiledRules(column_rules, self.global_directives['ignore_column_name_case'], self.engine)
+
+    def __getstate__(self):
+        return dict(vars(self), progress=None)
 
+    def _profile(self, profile):
+        if isinstance(profile, pu.Profile):
+            return profile
+
+        try:
+            return self.profiles[profile]
+        except KeyError:
+            raise ValueError(f'Unknown validation profile: {profile}') from None
+
+    def sample(self, csv_file, sample_size=1000, streaming=False, confidence=0.95, seed=None):
+        # estimates per-column failure rates from a random subset of rows. By default rows are picked by seeking
+        # to random byte offsets; streaming=True reads the whole file once and reservoir-samples it instead.
+        # Errors found are kept in self.errors, keyed by row number when streaming and by byte offset otherwise.
+        # Records of the wrong shape are never sampled; streaming records them in self.structural_errors.
+        run = self.new_run()
+        run.errors = eu.ErrorStore(run.memory)  # failing rows are counted from the records, so all are kept
+
+        rng = random.Random(seed)
+        quoting, delimiter = self._dialect()
+        temp_rules = self._rules()
+
+        compression = iu.detect_compression(csv_file)
+        if compression == 'zip':
+            raise ValueError('sample() does not support zip archives, sample each member separately')
+        elif compression is not None:
+            streaming = True  # compressed streams cannot be seeked into cheaply
+
+        if streaming:
+            # only records of the schema's shape are sampled, as when seeking; the others are column count
+            # defects, as in validate()
+            with iu.open_csv_source(csv_file, compression) as cf:
+                reader = csv.reader(cf, quoting=quoting, delimiter=delimiter)
+                header = None if self.global_directives['no_header'] else next(reader, [])
+                fieldnames, _ = run.fieldnames(header)
+                first_row = 1 if header is None else 2
+
+                def rows():
+                    # blank lines are not rows, as in validate()
+                    for row, record in enumerate((record for record in reader if record), first_row):
+                        if len(record) == len(fieldnames):
+                            yield row, dict(zip(fieldnames, record))
+                        else:
+                            message = st.column_count_mismatch(len(record), len(fieldnames))
+                            run.structural_errors.append(st.StructuralDefect(row, reader.line_num, 'column_count',
+                                                                             message))
+
+                samples = su.reservoir_sample(rows(), sample_size, rng)
+            method = 'reservoir'
+        else:
+            samples = su.seek_sample(csv_file, sample_size, rng, list(self.column_rules.keys()), delimiter, quoting,
+                                     skip_header=not self.global_directives['no_header'])
+            method = 'seek'
+
+        for position, row in samples:
+            run.row_count = position
+            run.validate_row(row, skip_stateful=True)
+        self._publish(run)
+
+        columns = {}
+        for key, rule in temp_rules.items():
+            not_assessed = [expression.label() for expression in rule.col_vals if expression.is_stateful()]
+            assessed = len(samples) if len(not_assessed) < len(rule.col_vals) else 0
+            failures = len({record.row for record in self.errors.records() if record.column == key})
+            columns[key] = su.ColumnEstimate(assessed, failures, confidence, not_assessed)
+
+        return su.SampleReport(method, len(samples), confidence, columns)
+
+    def _dialect(self):
         quoting = csv.QUOTE_ALL if self.global_directives['quoted'] else csv.QUOTE_MINIMAL
         delimiter = self.global_directives['separator'] if self.global_directives['separator'] else ','
 
-        with open(csv_file, newline='') as cf:
-            # column count check
-            first_line = cf.readline().split(delimiter)
-            if len(first_line) != len(self.column_rules):
-                # TODO: Raise some error
-                pass
+        return quoting, delimiter
+
+    def _rules(self):
+        return self.compiled.rules
+
+    def observed_failure_rates(self):
+        # feed into a later CslValidator(schema, failure_rates=...) to put the most selective checks first
+        data_rows = self.row_count if self.global_directives['no_header'] else self.row_count - 1
+        return pu.failure_rates(self.failure_counts, data_rows)
+
+
+class CompiledRules:
+    # The rules a validation runs (all of a schema's, or a profile's subset) and everything compiled from them.
+    # Read-only once built, so any number of runs share one. Generated code does not pickle, so a pickled
+    # CompiledRules is compiled again on load, from the compile cache.
+
+    __slots__ = ('column_rules', 'rules', 'ignore_column_name_case', 'engine', 'compiled_row', 'batch_targets',
+                 'digest')
+
+    def __init__(self, column_rules, ignore_column_name_case, engine):
+        self.column_rules = column_rules
+        self.rules = {k.lower(): v for k, v in column_rules.items()} if ignore_column_name_case else column_rules
+        self.ignore_column_name_case = ignore_column_name_case
+        self.engine = engine
+        self.compiled_row = cg.compile_rules(self.rules) if engine == 'codegen' else None
+        self.batch_targets = pu.batch_targets(self.rules)
+        self.digest = None  # of the rules and the validator's options, for the result cache; set on first use
+
+    def __reduce__(self):
+        return CompiledRules, (self.column_rules, self.ignore_column_name_case, self.engine)
+
+
+class ValidationRun:
+    # The state of one validation, and the context expressions validate in. Runs are created by
+    # CslValidator.new_run() and used by one thread at a time; any number of them can share the validator.
+
+    def __init__(self, validator, compiled, progress=None):
+        self.validator = validator
+        self.compiled = compiled
+        self.global_directives = validator.global_directives
+        self.fail_fast = validator.fail_fast
+        self.progress = progress  # a pg.ProgressMonitor called while rows are validated, or None
+        self.memory = mu.MemoryBudget(validator.memory_budget)
+        self.valid = None  # the verdict, once validated
+        self.row_count = 0
+        self.row_cache = {}  # memoized data expression values for the current row
+        self.shared_results = None  # rule verdicts shared with other schemas for the current row, see validate_many
+        self.batch_verdicts = None  # (custom expression, column) -> mask over the current chunk of rows
+        self.batch_index = 0  # position of the current row in that chunk
+        self.shard_state = None  # set while validating one shard of a file, see sharding.sharding
+        self.external_paths = None  # files read by fileExists, checksum and fileCount rules while a result is cached
+        self.expression_state = {}  # unique expression -> mu.SeenValues, identical expression -> first value
+        self.memos = {}  # column rule -> a mu.ValueMemo per pure expression, see ColumnRule.validate_column
+        self.failure_counts = defaultdict(functools.partial(defaultdict, int))
+        self.member_errors = {}
+        self.errors = self.error_store()
+        self.structural_errors = []
+
+    def validate(self, csv_file, index_every=None, index_file=None):
+        # see CslValidator.validate; a cached result is restored into the run. With index_every, the locations of
+        # every index_every-th row and of the failing rows are written to index_file (next to the file by default)
+        # for revalidate(). That takes one more read of the file, at close to disk speed; only uncompressed files
+        # can be indexed.
+        if index_every is not None and iu.detect_compression(csv_file) is not None:
+            raise ValueError('Only uncompressed files can be indexed for revalidation')
+
+        self._validate_cached(csv_file)
+        if index_every is not None:
+            failing_rows = {record.row for record in self.errors.records()}
+            failing_rows.update(defect.row for defect in self.structural_errors if defect.kind == 'column_count')
+            index = ri.build_index(csv_file, index_every, failing_rows, self.global_directives['no_header'])
+            ri.write_index(index, index_file if index_file is not None else ri.index_path(csv_file))
+
+        return self.valid
+
+    def revalidate(self, csv_file, rows=None, index_file=None):
+        # Re-checks single rows of a file validated with index_every, e.g. after the failing ones were fixed: the
+        # rows given, or by default those which failed. Rows are read on their own, at the offsets the index holds
+        # or found from the closest indexed row, so only row-local rules run; unique and identical rules need every
+        # row and are skipped. A file changed since it was indexed is scanned for its rows again (reading, not
+        # validating, everything up to the last row asked for). Errors keep the rows' numbers; a row past the end
+        # of the file is recorded as a 'missing_row' structural defect.
+        index = ri.load_index(index_file if index_file is not None else ri.index_path(csv_file))
+        failing_rows = [row for row, _, _, _ in index['failing']]
+        rows = sorted({row for row in (rows if rows is not None else failing_rows) if row >= index['first_row']})
+        quoting, delimiter = self.validator._dialect()
+        no_header = self.global_directives['no_header']
+
+        with open(csv_file, mode='rb') as raw:
+            header = None
+            if not no_header:
+                first = next(ri.iter_records(raw), None)
+                header = ri.read_record(raw, first, delimiter, quoting) if first is not None else []
+            fieldnames, valid = self.fieldnames(header)
+
+            for row, location in ri.locate_rows(raw, index, rows).items():
+                self.row_count = row
+                if location is None:
+                    self.structural_errors.append(st.StructuralDefect(row, None, 'missing_row',
+                                                                      f'The file has no row {row}'))
+                    valid = False
+                    continue
+
+                record = ri.read_record(raw, location, delimiter, quoting)
+                if len(record) != len(fieldnames):
+                    message = st.column_count_mismatch(len(record), len(fieldnames))
+                    self.structural_errors.append(st.StructuralDefect(row, location.line, 'column_count', message))
+                    valid = False
+                elif not self.validate_row(dict(zip(fieldnames, record)), skip_stateful=True):
+                    valid = False
+
+        self.valid = valid
+
+        return self.valid
+
+    def _validate_cached(self, csv_file):
+        result_cache = self.validator.result_cache
+        if result_cache is None or (result_cache.external == 'bypass' and cu.has_external_rules(self.compiled.rules)):
+            return _validate_runs([self], csv_file)[0]
+
+        checks = cu.check_digest(self.compiled.rules)
+        if checks is None:  # a custom check refers to data which cannot be digested
+            return _validate_runs([self], csv_file)[0]
+
+        if self.compiled.digest is None:
+            options = {
+                'fail_fast': self.fail_fast,
+                'structure_first': self.validator.structure_first,
+                'max_structural_defects': self.validator.max_structural_defects,
+                'memory_budget': self.memory.limit,
+                'summarize_errors': self.validator.summarize_errors,
+                'max_exemplars': self.validator.max_exemplars,
+                'zip_members': self.validator.zip_members,
+            }
+            self.compiled.digest = cu.schema_digest(self.validator.schema_file, self.compiled.rules, options)
+
+        key = result_cache.key(csv_file, f'{self.compiled.digest}:{checks}')
+        entry = result_cache.load(key)
+        if entry is not None:
+            self._restore_result(entry)
+            return self.valid
+
+        self.external_paths = set()
+        try:
+            _validate_runs([self], csv_file)
+            external_paths = self.external_paths
+        finally:
+            self.external_paths = None
+
+        result_cache.store(key, self._result_entry(), external_paths)
+
+        return self.valid
+
+    def validate_stream(self, cf):
+        # see CslValidator.validate_stream
+        return self._validate_one(getattr(cf, 'name', '<stream>'), lambda: _validate_stream([self], cf))
+
+    def validate_rows(self, rows, header=None):
+        # validates rows held in memory, each a sequence of cells in column order, with the result writing them
+        # to a CSV file would give: header defaults to the schema's column names (and is not used with @noHeader),
+        # cells are turned into text as csv.writer does (None as '', anything else with str) and rows are numbered
+        # as in that file
+        if self.global_directives['no_header']:
+            header = None
+        elif header is None:
+            header = list(self.compiled.column_rules.keys())
+        first_line = 1 if header is None else 2
+
+        records = ([cell if type(cell) is str else _cell_text(cell) for cell in row] for row in rows)
+        return self._validate_one('<rows>', lambda: _validate_records([self], header,
+                                                                        zip(records, itertools.count(first_line))))
+
+    def validate_frame(self, frame):
+        # validates a pandas DataFrame (or anything with its columns and iloc) as if written by
+        # frame.to_csv(index=False). Cells are converted column by column; object columns of strings without
+        # missing values are read from the frame's arrays without copying and only other cells are converted.
+        columns = [_column_text(frame.iloc[:, i]) for i in range(len(frame.columns))]
+        header = None if self.global_directives['no_header'] else [str(name) for name in frame.columns]
+        first_line = 1 if header is None else 2
+
+        return self._validate_one('<frame>', lambda: _validate_records([self], header,
+                                                                         zip(zip(*columns), itertools.count(first_line))))
+
+    def _validate_one(self, name, validate):
+        if self.progress is not None:
+            self.progress.start(name, None)
+
+        self.valid = validate()[0]
+        if self.progress is not None:
+            self.progress.report(self, finished=True)
+
+        return self.valid
+
+    def start_member(self, member):
+        # the next member of a zip archive is validated as a file of its own: it gets its own errors, and unique,
+        # identical and memoized rules forget the values of the members before it
+        for state in self.expression_state.values():
+            if isinstance(state, mu.SeenValues):
+                state.close(self.memory)
+        self.expression_state = {}
+        self.memos = {}
+        self.row_cache.clear()
+        self.errors = self.member_errors[member] = self.error_store()
+
+    def error_store(self):
+        if self.validator.summarize_errors:
+            return eu.ErrorSummary(self.memory, self.validator.max_exemplars)
+
+        return eu.ErrorStore(self.memory)
+
+    def _result_entry(self):
+        # the outcome of the run with expressions referred to by position, for the result cache
+        positions = {id(expression): i for i, expression in enumerate(pu.expression_positions(self.compiled.rules))}
+
+        def stored(errors):
+            records = [(record.row, record.column, record.report_level, positions[id(record.expression)],
+                        record.value, record.operands, record.ignore_case) for record in errors.records()]
+            groups = [(group.column, group.report_level, positions[id(group.expression)], group.kind, group.count,
+                       group.first_row, group.last_row) for group in getattr(errors, 'groups', {}).values()]
+            return {'records': records, 'groups': groups, 'dropped': errors.dropped,
+                    'severity_counts': dict(errors.severity_counts)}
+
+        return {
+            'valid': self.valid,
+            'row_count': self.row_count,
+            'errors': stored(self.errors),
+            'member_errors': {member: stored(errors) for member, errors in self.member_errors.items()},
+            'structural_errors': self.structural_errors,
+            'failure_counts': {key: dict(counts) for key, counts in self.failure_counts.items()},
+        }
+
+    def _restore_result(self, entry):
+        expressions = pu.expression_positions(self.compiled.rules)
+
+        def restored(stored):
+            errors = self.error_store()
+            for row, column, report_level, position, value, operands, ignore_case in stored['records']:
+                errors.add(row, column, report_level, expressions[position], value, operands, ignore_case)
+            for column, report_level, position, kind, count, first_row, last_row in stored['groups']:
+                # a group may have no stored records (max_exemplars=0, or records dropped past the memory budget)
+                expression = expressions[position]
+                group = errors.groups.setdefault((column, report_level, id(expression), kind),
+                                                 eu.ErrorGroup(column, report_level, expression, kind))
+                group.count, group.first_row, group.last_row = count, first_row, last_row
+            errors.dropped += stored['dropped']
+            errors.severity_counts = dict(stored['severity_counts'])
+            return errors
+
+        self.member_errors = {member: restored(stored) for member, stored in entry['member_errors'].items()}
+        # for a zip archive self.errors is the store of the last member, as after validating it
+        self.errors = list(self.member_errors.values())[-1] if self.member_errors else restored(entry['errors'])
+        self.structural_errors = entry['structural_errors']
+        self.row_count = entry['row_count']
+        for key, counts in entry['failure_counts'].items():
+            for label, count in counts.items():
+                self.failure_counts[key][label] = count
+        self.valid = entry['valid']
+
+    def prepare_batch(self, chunk, fieldnames):
+        # runs the batch custom checks over a chunk of (record, line number) pairs ahead of the row by row pass
+        if self.global_directives['ignore_column_name_case']:
+            fieldnames = [name.lower() for name in fieldnames]
+        positions = {name: i for i, name in enumerate(fieldnames)}
+        column_count = len(fieldnames)
+
+        self.batch_verdicts = {}
+        for expression, key, ignore_case in self.compiled.batch_targets:
+            position = positions.get(key)
+            if position is None:
+                continue  # a reference to a column the file does not have fails row by row
+
+            # records of the wrong shape are never validated, a placeholder keeps the mask aligned with the chunk
+            values = [record[position] if len(record) == column_count else '' for record, _ in chunk]
+            if ignore_case:
+                values = [value.lower() for value in values]
+
+            verdicts = expression.check.check_batch(values, expression.literal_args())
+            if len(verdicts) != len(values):
+                raise ValueError(f'Batch function of custom check {expression.name} returned {len(verdicts)} '
+                                 f'verdicts for {len(values)} values')
+            self.batch_verdicts[(expression, key)] = verdicts
+
+    def fieldnames(self, header):
+        # the keys rows are read with; a header which does not match the schema is recorded as a defect and the
+        # columns are matched by position instead
+        column_names = self.compiled.column_rules.keys()
+        if header is None:
+            return tuple(column_names), True
+
+        message = st.header_mismatch(header, column_names, self.global_directives['ignore_column_name_case'])
+        if message:
+            self.structural_errors.append(st.StructuralDefect(1, 1, 'header', message))
+            return tuple(column_names), False
+
+        return tuple(header), True
+
+    def validate_row(self, row, skip_stateful=False):
+        valid = True
+        self.row_cache.clear()
+        if self.global_directives['ignore_column_name_case']:
+            row = {k.lower(): v for k, v in row.items()}
+
+        if self.compiled.compiled_row is not None and not skip_stateful:
+            return self.compiled.compiled_row(row, self)
+
+        for key, rule in self.compiled.rules.items():
+            if not rule.validate_column(key, row, self, skip_stateful=skip_stateful):
+                valid = False
+
+        return valid
+
+
+def validate_many(validators, csv_file):
+    # Validates one file against several schemas in a single pass, e.g. the old and the new schema during a
+    # migration: the file is read and parsed once and every row is dispatched to each validator, which keeps its
+    # own errors. Returns the verdicts in the order of validators. Rules which are identical in two schemas and
+    # applied to the same column are evaluated once per row (stateful rules never are, see ValidatingExpr.signature).
+    runs = [validator.new_run() for validator in validators]
+    verdicts = _validate_runs(runs, csv_file)
+    for validator, run in zip(validators, runs):
+        validator._publish(run)
+
+    return verdicts
+
+
+def _validate_runs(runs, csv_file):
+    layouts = {(run.validator._dialect()[1], run.global_directives['no_header'], run.validator.zip_members)
+               for run in runs}
+    if len(layouts) > 1:
+        raise ValueError('Schemas validated together must agree on @separator, @noHeader and zip_members')
+
+    verdicts = [True] * len(runs)
+
+    # a structure_first validator whose pre-pass fails is rejected without running its rules
+    active = []
+    for i, run in enumerate(runs):
+        if run.validator.structure_first:
+            run.structural_errors = run.validator._structure(csv_file, run.validator.max_structural_defects)
+        if run.structural_errors:
+            verdicts[i] = False
+        else:
+            active.append(i)
+
+    if active:
+        active_runs = [runs[i] for i in active]
+        compression = iu.detect_compression(csv_file)
+
+        monitored = [run for run in active_runs if run.progress is not None]
+        for run in monitored:
+            run.progress.start(csv_file, pathlib.Path(csv_file).stat().st_size)
+
+        try:
+            if compression is not None:
+                for run in active_runs:
+                    if run.memory.grow(LOOKAHEAD_COMPONENT, iu.LOOKAHEAD_SIZE):
+                        raise run.memory.exceeded(LOOKAHEAD_COMPONENT, 'compressed input is read through fixed '
+                                                                       f'{iu.LOOKAHEAD_SIZE} byte buffers')
+
+            stream_verdicts = _validate_source(active_runs, csv_file, compression)
+        finally:
+            if compression is not None:
+                for run in active_runs:
+                    run.memory.release(LOOKAHEAD_COMPONENT)
+
+        for i, verdict in zip(active, stream_verdicts):
+            verdicts[i] = verdict
+
+        for run in monitored:
+            run.progress.report(run, finished=True)
+
+    for run, verdict in zip(runs, verdicts):
+        run.valid = verdict
+
+    return verdicts
+
+
+def _validate_source(runs, csv_file, compression):
+    if compression != 'zip':
+        with iu.open_csv_source(csv_file, compression) as cf:
+            return _validate_stream(runs, cf)
+
+    verdicts = [True] * len(runs)
+    members = 0
+    for member, cf in iu.iter_zip_members(csv_file, runs[0].validator.zip_members):
+        members += 1
+        defect_counts = []
+        for run in runs:
+            run.start_member(member)
+            defect_counts.append(len(run.structural_errors))
+
+        for i, member_verdict in enumerate(_validate_stream(runs, cf)):
+            verdicts[i] = verdicts[i] and member_verdict
+
+        for run, defect_count in zip(runs, defect_counts):
+            for defect in run.structural_errors[defect_count:]:
+                defect.member = member
+
+    if not members:
+        for run in runs:
+            run.structural_errors.append(st.no_members(run.validator.zip_members))
+        verdicts = [False] * len(runs)
+
+    return verdicts
+
+
+def _validate_stream(runs, cf):
+    # reads forward only, so it works the same on plain files and on decompressing streams
+    quoting, delimiter = runs[0].validator._dialect()
+    no_header = runs[0].global_directives['no_header']
+
+    reader = csv.reader(cf, quoting=quoting, delimiter=delimiter)
+    header = None if no_header else next(reader, [])
+
+    # blank lines are not rows, as with csv.DictReader
+    records = ((record, reader.line_num) for record in reader if record)
+
+    return _validate_records(runs, header, records, lambda: iu.source_position(cf))
 
-            # check column names
-            if self.global_directives['no_header']:
-                fieldnames = list(self.column_rules.keys())
-                cf.seek(0)  # TODO: Make sure this does the right thing
-            else:
-                fieldnames = None
 
-                first_line = cf.readline().split(delimiter)
-                comparison = list(self.column_rules.keys())
-                if self.global_directives['ignore_column_name_case']:
-                    first_line = [header.lower() for header in first_line]
-                    comparison = [header.lower() for header in comparison]
+def _validate_records(runs, header, records, position=None):
+    # records are (cells, line number) pairs; position, if given, returns the bytes of the source read so far
+    no_header = header is None
 
-                if first_line != comparison:
-                    # TODO: raise some error
-                    pass
+    # runs reading rows with the same keys share the row dict and, if there are several, their verdicts
+    plans = []
+    groups = defaultdict(list)
+    verdicts = []
+    for run in runs:
+        fieldnames, header_ok = run.fieldnames(header)
+        verdicts.append(header_ok)
+        plans.append((run, fieldnames))
+        layout = tuple(name.lower() for name in fieldnames) if run.global_directives['ignore_column_name_case'] \
+            else fieldnames
+        groups[layout].append(run)
+        run.row_count = 0 if no_header else 1
 
-            # validate rows
-            reader = csv.DictReader(cf,
-                                    quoting=quoting,
-                                    fieldnames=fieldnames,
-                                    delimiter=delimiter)
+    shared = []
+    for group in groups.values():
+        if len(group) > 1:
+            results = {}
+            shared.append(results)
+            for run in group:
+                run.shared_results = results
 
-            if self.global_directives['ignore_column_name_case']:
-                temp_rules = self.column_rules
-            else:
-                temp_rules = {k.lower(): v for k, v in self.global_directives.items()}
+    batched = [(run, fieldnames) for run, fieldnames in plans if run.compiled.batch_targets]
 
-            self.row_count = 0 if self.global_directives['no_header'] else 1
+    monitored = [run for run in runs if run.progress is not None]
+    for run in monitored:
+        run.progress.follow(position)
 
-            for row in reader:
-                self.row_count += 1
-                if self.global_directives['ignore_column_name_case']:
-                    row = {k.lower(): v for k, v in row.items()}
-                for key in temp_rules.keys():
-                    if not temp_rules[key].validate_column(key, row, self):
-                        valid = False
+    try:
+        while True:
+            chunk = list(itertools.islice(records, BATCH_SIZE if batched else 1))
+            if not chunk:
+                break
 
-            return valid
+            for run, fieldnames in batched:
+                run.prepare_batch(chunk, fieldnames)
 
+            for position, (record, line_num) in enumerate(chunk):
+                for results in shared:
+                    results.clear()
 
+                rows = {}
+                for i, (run, fieldnames) in enumerate(plans):
+                    run.row_count += 1
+                    if len(record) != len(fieldnames):
+                        # rules cannot be applied to a record of the wrong shape
+                        message = st.column_count_mismatch(len(record), len(fieldnames))
+                        run.structural_errors.append(st.StructuralDefect(run.row_count, line_num, 'column_count',
+                                                                         message))
+                        verdicts[i] = False
+                        continue
 
+                    row = rows.get(fieldnames)
+                    if row is None:
+                        row = rows[fieldnames] = dict(zip(fieldnames, record))
 
+                    run.batch_index = position
+                    if not run.validate_row(row):
+                        verdicts[i] = False
 
+            for run in monitored:
+                run.progress.advance(len(chunk), run)
+    finally:
+        for run in runs:
+            run.shared_results = None
+            run.batch_verdicts = None
 
+    return verdicts
 
 
+def _cell_text(cell):
+    return '' if cell is None else str(cell)
 
 
+def _column_text(column):
+    # a frame column as a sequence of cell texts; missing values (None, NaN, NaT) become ''. Filling them takes a
+    # copy, so only a column which has some is filled.
+    if column.isna().any():
+        values = column.to_numpy(dtype=object, na_value='')
+    else:
+        values = column.to_numpy(dtype=object, copy=False)
+    if all(type(value) is str for value in values):
+        return values
 
+    return [value if type(value) is str else str(value) for value in values]
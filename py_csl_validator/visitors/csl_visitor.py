@@ -1,19 +1,53 @@
+# stdlib
+import types
+
 # third party
 from lark import Tree, Token
 
 
 class CslVisitor:
+    # Builds the expression objects bottom-up in a single pass over the parse tree. Each rule is handled by the
+    # method named after it, called with the (non-None) values of its children in order.
+    #
+    # The walk keeps its own stack rather than recursing, so wide schemas and deeply nested conditionals are not
+    # bound by the interpreter's recursion limit, and rule names are looked up in a per-class table built once.
+
+    _dispatch_tables = {}
 
     def visit(self, node):
-        if isinstance(node, Token):
-            return node.value
-        elif isinstance(node, Tree):
-            stack = [self.visit(child) for child in node.children]
-            stack = [element for element in stack if element is not None]
-            return self._call_expression(node, stack)
-
-    def _call_expression(self, node, stack):
-        return getattr(self, node.data, self.__default__)(stack)
+        if not isinstance(node, Tree):
+            return node.value if isinstance(node, Token) else None
+
+        dispatch = self._dispatch_table()
+        default = type(self).__default__
+
+        # one frame per open tree: (tree, iterator over its remaining children, values of its visited children)
+        frames = [(node, iter(node.children), [])]
+        while True:
+            tree, children, stack = frames[-1]
+            for child in children:
+                if isinstance(child, Tree):
+                    frames.append((child, iter(child.children), []))
+                    break
+                elif isinstance(child, Token):
+                    stack.append(child.value)
+            else:
+                frames.pop()
+                value = dispatch.get(tree.data, default)(self, stack)
+                if not frames:
+                    return value
+                if value is not None:
+                    frames[-1][2].append(value)
+
+    def _dispatch_table(self):
+        cls = type(self)
+        try:
+            return CslVisitor._dispatch_tables[cls]
+        except KeyError:
+            table = {name: getattr(cls, name) for name in dir(cls)
+                     if not name.startswith('_') and isinstance(getattr(cls, name), types.FunctionType)}
+            CslVisitor._dispatch_tables[cls] = table
+            return table
 
     def __default__(self, stack):
         if not stack:
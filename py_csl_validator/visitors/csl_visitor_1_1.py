@@ -1,3 +1,6 @@
+# stdlib
+import pathlib
+
 # third party
 from lark import Tree, Token
 
@@ -10,8 +13,22 @@ class CslVisitor1_1(CslVisitor):
 
     ec = expressions.Expressions1_1
 
+    def __init__(self, schema_dir=None):
+        self.schema_dir = pathlib.Path(schema_dir) if schema_dir is not None else pathlib.Path('.')
+        self.data_exprs = {}  # signature -> interned data expression, so shared subexpressions are built once
+        self.ignore_column_name_case = False
+
     # custom methods #
 
+    def _intern(self, expression):
+        return self.data_exprs.setdefault(expression.signature(), expression)
+
+    @staticmethod
+    def _strip_quotes(val):
+        if len(val) >= 2 and val[0] == val[-1] and val[0] in '"\'':
+            return val[1:-1]
+        return val
+
     def start(self, stack):
         return stack.pop()
 
@@ -19,21 +36,26 @@ class CslVisitor1_1(CslVisitor):
         body = stack.pop()
         prolog = stack.pop()
 
-        return ec.Schema(prolog, body)
+        return self.ec.Schema(prolog, body)
 
     # prolog #
     def prolog(self, stack):
         global_directives = stack.pop()
         version = stack.pop()
 
-        return ec.Prolog(version, global_directives)
+        return self.ec.Prolog(version, global_directives)
 
     # global directives
 
     def global_directives(self, stack):
-        stack.reverse()
+        global_directives = self.ec.GlobalDirectives(stack)
+        # the prolog is visited before the body, so column refs can be resolved as they are built
+        self.ignore_column_name_case = global_directives.directives['ignore_column_name_case']
 
-        return ec.GlobalDirectives(stack)
+        return global_directives
+
+    def separator_char(self, stack):
+        return self._strip_quotes(stack.pop())
 
     def separator_directive(self, stack):
         separator = stack.pop()
@@ -41,7 +63,7 @@ class CslVisitor1_1(CslVisitor):
         return 'separator', separator
 
     def total_columns_directive(self, stack):
-        num_columns = stack.pop()
+        num_columns = int(stack.pop())
 
         return 'total_columns', num_columns
 
@@ -60,32 +82,32 @@ class CslVisitor1_1(CslVisitor):
     # body #
 
     def body(self, stack):
-        stack.reverse()
-
-        return ec.Body(stack)
+        return self.ec.Body(stack)
 
     def body_part(self, stack):
         # filter comments
         for element in stack:
-            if isinstance(element, ec.ColumnDefinition):
+            if isinstance(element, self.ec.ColumnDefinition):
                 return element
 
+    def quoted_column_identifier(self, stack):
+        return self._strip_quotes(stack.pop())
+
     def column_definition(self, stack):
         col_rule = stack.pop()
         col_name = stack.pop()
 
-        return ec.ColumnDefinition(col_name, col_rule)
+        return self.ec.ColumnDefinition(col_name, col_rule)
 
     def column_rule(self, stack):
         col_directives = stack.pop()
-        stack.reverse()
 
-        return ec.ColumnRule(stack, col_directives)
+        return self.ec.ColumnRule(stack, col_directives.directives)
 
     def column_validation_expr(self, stack):
         expression = stack.pop()  # TODO: improve this vocab?
 
-        return ec.ColumnValidationExpr(expression)
+        return self.ec.ColumnValidationExpr(expression)
 
     def single_expr(self, stack):
         expression = stack.pop()
@@ -93,109 +115,107 @@ class CslVisitor1_1(CslVisitor):
         if stack:
             col_ref = stack.pop()
 
-        return ec.SingleExpr(expression, col_ref)
+        return self.ec.SingleExpr(expression, col_ref)
 
     def external_single_expr(self, stack):
         return self.single_expr(stack)
 
     def parenthesized_expr(self, stack):
-        stack.reverse()
-
-        return ec.ParenthesizedExpr(stack)
+        return self.ec.ParenthesizedExpr(stack)
 
     def is_expr(self, stack):
         comparison = stack.pop()
 
-        return ec.IsExpr(comparison)
+        return self.ec.IsExpr(comparison)
 
     def any_expr(self, stack):
-        stack.reverse()
-
-        return ec.AnyExpr(stack)
+        return self.ec.AnyExpr(stack)
 
     def not_expr(self, stack):
         comparison = stack.pop()
 
-        return ec.NotExpr(comparison)
+        return self.ec.NotExpr(comparison)
 
     def in_expr(self, stack):
         comparison = stack.pop()
 
-        return ec.InExpr(comparison)
+        return self.ec.InExpr(comparison)
 
     def starts_with_expr(self, stack):
         comparison = stack.pop()
 
-        return ec.StartsWithExpr(comparison)
+        return self.ec.StartsWithExpr(comparison)
 
     def ends_with_expr(self, stack):
         comparison = stack.pop()
 
-        return ec.EndsWithExpr(comparison)
+        return self.ec.EndsWithExpr(comparison)
 
     def reg_exp_expr(self, stack):
-        pattern = stack.pop()
+        pattern = self._strip_quotes(stack.pop())
 
-        return ec.RegExpExpr(pattern)
+        return self.ec.RegExpExpr(pattern)
 
     def range_expr(self, stack):
         end = stack.pop()
         start = stack.pop()
+        start = float(start) if start != '*' else start
+        end = float(end) if end != '*' else end
 
-        return ec.RangeExpr(start, end)
+        return self.ec.RangeExpr(start, end)
 
     def length_expr(self, stack):
         start = stack.pop()
         end = None
         if stack:
             end, start = start, stack.pop()
+        start = int(start) if start != '*' else start
+        end = int(end) if end not in (None, '*') else end
 
-        return ec.LengthExpr(start, end)
+        return self.ec.LengthExpr(start, end)
 
     def empty_expr(self, *args):
-        return ec.EmptyExpr()
+        return self.ec.EmptyExpr()
 
     def not_empty_expr(self, *args):
-        return ec.NotEmptyExpr()
+        return self.ec.NotEmptyExpr()
 
     def unique_expr(self, stack):
-        stack.reverse()
-
-        return ec.UniqueExpr(stack)
+        return self.ec.UniqueExpr(stack)
 
     def uri_expr(self, *args):
-        return ec.UriExpr()
+        return self.ec.UriExpr()
 
     def xsd_datetime_expr(self, stack):
         end = stack.pop() if stack else None
         start = stack.pop() if stack else None
 
-        return ec.XsdDateTimeExpr(start, end)
+        return self.ec.XsdDateTimeExpr(start, end)
 
     def xsd_datetime_with_timezone_expr(self, stack):
         end = stack.pop() if stack else None
         start = stack.pop() if stack else None
 
-        return ec.XsdDateTimeWithTimezoneExpr(start, end)
+        return self.ec.XsdDateTimeWithTimezoneExpr(start, end)
 
     def xsd_date_expr(self, stack):
         end = stack.pop() if stack else None
         start = stack.pop() if stack else None
 
-        return ec.XsdDateExpr(start, end)
+        return self.ec.XsdDateExpr(start, end)
 
     def xsd_time_expr(self, stack):
         end = stack.pop() if stack else None
         start = stack.pop() if stack else None
 
-        return ec.XsdTimeExpr(start, end)
+        return self.ec.XsdTimeExpr(start, end)
 
 
     def uk_date_expr(self, stack):
         end = stack.pop() if stack else None
         start = stack.pop() if stack else None
 
-        return ec.UkDateExpr(start, end)
+        return self.ec.UkDateExpr(start, end)
 
     def date_expr(self, stack):  # TODO: redo to account for string providers
         if len(stack) == 5:
@@ -209,37 +229,37 @@ class CslVisitor1_1(CslVisitor):
         month = stack.pop()
         year = stack.pop()
 
-        return ec.DateExpr(year, month, day, start, end)
+        return self.ec.DateExpr(year, month, day, start, end)
 
     def partial_uk_date_expr(self, *args):
-        return ec.PartialUkDateExpr()
+        return self.ec.PartialUkDateExpr()
 
     def partial_date_expr(self, stack):
         day = stack.pop()
         month = stack.pop()
         year = stack.pop()
 
-        return ec.PartialDateExpr(year, month, day)
+        return self.ec.PartialDateExpr(year, month, day)
 
     def uuid4_expr(self, *args):
-        return ec.Uuid4Expr()
+        return self.ec.Uuid4Expr()
 
     def positive_integer_expr(self, *args):
-        return ec.PositiveIntegerExpr()
+        return self.ec.PositiveIntegerExpr()
 
     def uppercase_expr(self, *args):
-        return ec.UppercaseExpr()
+        return self.ec.UppercaseExpr()
 
     def lowercase_expr(self, *args):
-        return ec.LowercaseExpr()
+        return self.ec.LowercaseExpr()
 
     def identical_expr(self, *args):
-        return ec.IdenticalExpr()
+        return self.ec.IdenticalExpr()
 
     def file_exists_expr(self, stack):
         prefix = stack.pop() if stack else None
 
-        return ec.FileExistsExpr(prefix)
+        return self.ec.FileExistsExpr(prefix)
 
     def integrity_check_expr(self, stack):
         folder_specification = stack.pop()
@@ -251,62 +271,52 @@ class CslVisitor1_1(CslVisitor):
             if stack:
                 prefix, subfolder = stack.pop(), prefix
 
-        return ec.IntegrityCheckExpr(prefix, subfolder, folder_specification)
+        return self.ec.IntegrityCheckExpr(prefix, subfolder, folder_specification)
 
     def checksum_expr(self, stack):
-        algorithm = stack.pop()
+        algorithm = self._strip_quotes(stack.pop())
         file = stack.pop()
 
-        return ec.ChecksumExpr(file, algorithm)
+        return self.ec.ChecksumExpr(file, algorithm)
 
     def file_count_expr(self, stack):
         file = stack.pop()
 
-        return ec.FileCountExpr(file)
+        return self.ec.FileCountExpr(file)
 
     def or_expr(self, stack):
-        stack.reverse()
-
-        return ec.OrExpr(stack)
+        return self.ec.OrExpr(stack)
 
     def and_expr(self, stack):
-        stack.reverse()
-
-        return ec.AndExpr(stack)
+        return self.ec.AndExpr(stack)
 
     def if_expr(self, stack):
         else_clause = None
         if_clause = stack.pop()
 
-        if isinstance(stack[-1], ec.IfClause):
+        if isinstance(stack[-1], self.ec.IfClause):
             else_clause, if_clause = if_clause, stack.pop()
 
         condition = stack.pop()
 
-        return ec.IfExpr(condition, if_clause, else_clause)
+        return self.ec.IfExpr(condition, if_clause, else_clause)
 
     def if_clause(self, stack):
-        stack.reverse()
-
-        return ec.IfClause(stack)
+        return self.ec.IfClause(stack)
 
     def switch_expr(self, stack):
-        else_clause = stack.pop() if isinstance(stack[-1], ec.IfClause) else None
-        stack.reverse()
-
-        return ec.SwitchExpr(stack, else_clause)
+        else_clause = stack.pop() if isinstance(stack[-1], self.ec.IfClause) else None
+        return self.ec.SwitchExpr(stack, else_clause)
 
     def switch_case_expr(self, stack):
         if_clause = stack.pop()
         condition = stack.pop()
 
-        return ec.SwitchCaseExpr(condition, if_clause)
+        return self.ec.SwitchCaseExpr(condition, if_clause)
 
     # column directives #
     def column_directives(self, stack):
-        stack.reverse()
-
-        return ec.ColumnDirectives(stack)
+        return self.ec.ColumnDirectives(stack)
 
     def optional_directive(self, *args):
         return 'optional', True
@@ -324,23 +334,23 @@ class CslVisitor1_1(CslVisitor):
 
     def string_provider(self, stack):
         val = stack.pop()
+        if isinstance(val, str):
+            val = self._strip_quotes(val)
 
-        return ec.StringProvider(val)
+        return self._intern(self.ec.StringProvider(val))
 
     def column_ref(self, stack):
         column = stack.pop()
 
-        return ec.ColumnRef(column)
+        return self._intern(self.ec.ColumnRef(column, self.ignore_column_name_case))
 
     def concat_expr(self, stack):
-        stack.reverse()
-
-        return ec.ConcatExpr(stack)
+        return self._intern(self.ec.ConcatExpr(stack))
 
     def no_ext_expr(self, stack):
         string_provider = stack.pop()
 
-        return ec.NotExpr(string_provider)
+        return self._intern(self.ec.NoExtExpr(string_provider))
 
     def file_expr(self, stack):
         file_path = stack.pop()
@@ -348,7 +358,7 @@ class CslVisitor1_1(CslVisitor):
         if stack:
             prefix = stack.pop()
 
-        return ec.FileExpr(prefix, file_path)
+        return self._intern(self.ec.FileExpr(prefix, file_path))
 
 
 
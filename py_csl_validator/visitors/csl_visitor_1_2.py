@@ -1,3 +1,6 @@
+# stdlib
+import pathlib
+
 # third party
 from lark import Tree, Token
 
@@ -17,7 +20,19 @@ class CslVisitor1_2(CslVisitor1_1):
         if stack:
             encoding, string_provider = string_provider, stack.pop()
 
-        return ec.UriDecodeExpr(string_provider, encoding)
+        return self._intern(self.ec.UriDecodeExpr(string_provider, encoding))
+
+    def in_list_expr(self, stack):
+        list_path = pathlib.Path(self._strip_quotes(stack.pop()))
+        if not list_path.is_absolute():
+            list_path = self.schema_dir.joinpath(list_path)
+
+        return self.ec.InListExpr(list_path)
+
+    def custom_expr(self, stack):
+        name = self._strip_quotes(stack[0])
+
+        return self.ec.CustomExpr(name, stack[1:])
 
 
 
@@ -0,0 +1,140 @@
+# Differential tests: the object model is the reference implementation, and the codegen engine must report the same
+# verdicts and errors on every row.
+
+# stdlib
+import os
+import csv
+import random
+
+# third party
+import pytest
+
+# local
+import py_csl_validator.codegen.codegen as cg
+from py_csl_validator.validator.validator import CslValidator
+from py_csl_validator.expressions.expression_classes_1_1 import Expressions1_1 as ec
+
+
+GENERIC_VALUES = ['', '0', '1', '-1', '42', 'abc', 'ABC', 'x' * 12, 'http://example.com/a',
+                  '123e4567-e89b-42d3-a456-426614174000']
+
+RULES = [
+    'is("{a}")', 'not("{a}")', 'in("{a}")', 'starts("{a}")', 'ends("{a}")', 'any("{a}", "{b}", "{c}")',
+    'empty', 'notEmpty', 'length({n})', 'length({n}, {m})', 'length(*, {m})', 'positiveInteger', 'uri', 'uuid4',
+    'range({n}, {m})', 'upperCase', 'lowerCase', 'unique', 'identical', '$c0/is("{a}")', 'is($c0)',
+    '{rule} or {rule}', '{rule} and {rule}', '({rule} {rule})', 'if({rule}, {rule})', 'if({rule}, {rule}, {rule})',
+]
+DIRECTIVES = ['@optional', '@matchIsFalse', '@ignoreCase', '@warningDirective']
+LITERALS = ['a', 'B', 'abc', 'x', '1', 'http']
+
+HAND_WRITTEN = [
+    # inlined literal checks, one per column
+    'c0: is("abc")\nc1: not("x") starts("a") ends("c")\nc2: any("a", "B", "abc") @ignoreCase\n',
+    # optional, matchIsFalse and warnings on inlined and object-model checks
+    'c0: notEmpty length(1, 3) @optional\nc1: empty @matchIsFalse\nc2: positiveInteger @warningDirective\n',
+    # combinators and conditionals, which are never inlined
+    'c0: is("a") or is("abc")\nc1: if($c0/is("a"), notEmpty, empty)\nc2: (length(2) upperCase) and not("AB")\n',
+    # stateful and row-dependent rules
+    'c0: unique\nc1: identical\nc2: is($c0) @ignoreCase\n',
+]
+
+
+def generate_schema(rng, columns=3, depth=2):
+    def rule(level):
+        template = rng.choice(RULES if level < depth else [r for r in RULES if '{rule}' not in r])
+        while '{rule}' in template:
+            template = template.replace('{rule}', rule(level + 1), 1)
+        n = rng.randint(0, 3)
+        return template.format(a=rng.choice(LITERALS), b=rng.choice(LITERALS), c=rng.choice(LITERALS), n=n,
+                               m=n + rng.randint(0, 3))
+
+    lines = []
+    for i in range(columns):
+        directives = ' '.join(rng.sample(DIRECTIVES, rng.randint(0, 2)))
+        lines.append(f'c{i}: {" ".join(rule(0) for _ in range(rng.randint(1, 2)))} {directives}'.rstrip())
+
+    return '\n'.join(lines) + '\n'
+
+
+def generate_rows(column_rules, count, rng):
+    # cells are drawn from the literals the schema mentions, lightly mutated, plus a few generic values
+    pools = {}
+    for key, rule in column_rules.items():
+        literals = []
+        for top in rule.col_vals:
+            for expression in top.all_expressions():
+                for attr in ('comparison', 'comparisons'):
+                    value = getattr(expression, attr, None)
+                    values = value if isinstance(value, (list, tuple)) else [value]
+                    literals.extend(v.val for v in values if isinstance(v, ec.DataExpr) and v.is_literal())
+        pools[key] = literals + [lit.upper() for lit in literals] + [lit + 'z' for lit in literals] + GENERIC_VALUES
+
+    return [[rng.choice(pool) for pool in pools.values()] for _ in range(count)]
+
+
+def compare_engines(schema_file, csv_file, rows, **options):
+    reference = CslValidator(schema_file, **options)
+    compiled = CslValidator(schema_file, engine='codegen', **options)
+
+    with open(csv_file, mode='w', newline='', encoding='utf-8') as cf:
+        writer = csv.writer(cf)
+        writer.writerow(reference.column_rules.keys())
+        writer.writerows(rows)
+
+    assert compiled.validate(csv_file) == reference.validate(csv_file)
+    assert compiled.errors.to_dict() == reference.errors.to_dict()
+    assert compiled.failure_counts == reference.failure_counts
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    directory = tmp_path / 'cache'
+    monkeypatch.setenv(cg.CACHE_ENV, str(directory))
+
+    return directory
+
+
+def write_schema(tmp_path, body, columns=3):
+    schema_file = tmp_path / 'schema.csvs'
+    schema_file.write_text(f'version 1.2\n@totalColumns {columns}\n{body}')
+
+    return schema_file
+
+
+@pytest.mark.parametrize('fail_fast', [False, True])
+@pytest.mark.parametrize('body', HAND_WRITTEN)
+def test_hand_written_schemas(tmp_path, body, fail_fast):
+    schema_file = write_schema(tmp_path, body)
+    rows = generate_rows(CslValidator(schema_file).column_rules, 200, random.Random(body))
+
+    compare_engines(schema_file, tmp_path / 'data.csv', rows, fail_fast=fail_fast)
+
+
+@pytest.mark.parametrize('seed', range(12))
+def test_generated_schemas(tmp_path, seed):
+    rng = random.Random(seed)
+    schema_file = write_schema(tmp_path, generate_schema(rng))
+    rows = generate_rows(CslValidator(schema_file).column_rules, 200, rng)
+
+    compare_engines(schema_file, tmp_path / 'data.csv', rows, fail_fast=rng.random() < 0.3)
+
+
+def test_compiled_code_is_cached_per_user(tmp_path, cache_dir):
+    schema_file = write_schema(tmp_path, HAND_WRITTEN[0])
+    CslValidator(schema_file, engine='codegen')
+
+    assert len(list(cache_dir.glob(f'*{cg.CACHE_SUFFIX}'))) == 1
+    assert not list(tmp_path.glob(f'*{cg.CACHE_SUFFIX}')) and not list(tmp_path.glob(f'.*{cg.CACHE_SUFFIX}'))
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason='POSIX permissions')
+def test_cache_others_can_write_to_is_not_used(tmp_path, cache_dir):
+    cache_dir.mkdir()
+    cache_dir.chmod(0o777)
+    schema_file = write_schema(tmp_path, HAND_WRITTEN[0])
+    validator = CslValidator(schema_file, engine='codegen')
+
+    assert not list(cache_dir.iterdir())
+    csv_file = tmp_path / 'data.csv'
+    csv_file.write_text('c0,c1,c2\nabc,ac,B\n')
+    assert validator.validate(csv_file)
@@ -0,0 +1,85 @@
+# stdlib
+import bz2
+import gzip
+import lzma
+import zipfile
+
+# third party
+import pytest
+
+# local
+import py_csl_validator.utils.io_utils as iu
+from py_csl_validator.validator.validator import CslValidator
+
+
+SCHEMA = 'version 1.2\n@totalColumns 2\nid: unique\nkind: identical\n'
+DATA = 'id,kind\n1,x\n2,x\n1,y\n3\n4,x\n'
+
+
+def write_zip(path, members):
+    with zipfile.ZipFile(path, mode='w') as archive:
+        for name, text in members.items():
+            archive.writestr(name, text)
+
+    return path
+
+
+def test_zip_members_are_validated_on_their_own(tmp_path):
+    schema_file = tmp_path / 'schema.csvs'
+    schema_file.write_text(SCHEMA)
+    archive = write_zip(tmp_path / 'data.zip', {'one.csv': 'id,kind\n1,x\n2,x\n', 'two.csv': 'id,kind\n1,y\n3,y\n'})
+
+    validator = CslValidator(schema_file)
+
+    assert validator.validate(archive)
+    assert list(validator.member_errors) == ['one.csv', 'two.csv']
+    assert not any(dict(errors) for errors in validator.member_errors.values())
+
+
+@pytest.mark.parametrize('compression, compress', [('gzip', gzip.compress), ('bz2', bz2.compress),
+                                                   ('xz', lzma.compress)])
+def test_compressed_files_validate_like_plain_ones(tmp_path, compression, compress):
+    schema_file = tmp_path / 'schema.csvs'
+    schema_file.write_text(SCHEMA)
+    plain = tmp_path / 'data.csv'
+    plain.write_text(DATA)
+    compressed = tmp_path / 'data.csv.z'
+    compressed.write_bytes(compress(DATA.encode('utf-8')))
+
+    assert iu.detect_compression(plain) is None
+    assert iu.detect_compression(compressed) == compression
+
+    expected = CslValidator(schema_file)
+    assert not expected.validate(plain)
+    validator = CslValidator(schema_file)
+    assert not validator.validate(compressed)
+
+    assert dict(validator.errors) == dict(expected.errors) and sorted(validator.errors[4]) == ['id', 'kind']
+    assert [(defect.row, defect.kind) for defect in validator.structural_errors] == \
+           [(defect.row, defect.kind) for defect in expected.structural_errors] == [(5, 'column_count')]
+
+
+def test_compression_is_detected_by_whole_header(tmp_path):
+    plain = tmp_path / 'plain.csv'
+    plain.write_text('BZh,b\n1,2\n')
+    compressed = tmp_path / 'data.csv.bz2'
+    compressed.write_bytes(bz2.compress(b'a,b\n1,2\n'))
+
+    assert iu.detect_compression(plain) is None
+    assert iu.detect_compression(compressed) == 'bz2'
+
+
+def test_archive_without_matching_members_is_a_defect(tmp_path):
+    schema_file = tmp_path / 'schema.csvs'
+    schema_file.write_text(SCHEMA)
+    archive = write_zip(tmp_path / 'data.zip', {'data.tsv': 'id,kind\n1,x\n'})
+
+    validator = CslValidator(schema_file)
+    assert not validator.validate(archive)
+    assert [defect.kind for defect in validator.structural_errors] == ['no_members']
+    assert [defect.kind for defect in validator.check_structure(write_zip(tmp_path / 'empty.zip', {}))] == \
+           ['no_members']
+
+    validator = CslValidator(schema_file, zip_members='*.TSV')
+    assert validator.validate(archive)
+    assert list(validator.member_errors) == ['data.tsv']
@@ -0,0 +1,76 @@
+# stdlib
+import pickle
+
+# third party
+import pytest
+
+# local
+import py_csl_validator.expressions.custom_expressions as ce
+from py_csl_validator.validator.validator import CslValidator, validate_many
+
+
+SCHEMA = '''version 1.2
+@totalColumns 2
+code: custom("mod97")
+name: custom("short", "5")
+'''
+
+
+@pytest.fixture
+def checks():
+    ce.register('mod97', cell=lambda value: value.isdigit() and int(value) % 97 == 1)
+    ce.register('short', batch=lambda values, limits: [len(v) <= int(l) for v, l in zip(values, limits)])
+    yield
+    ce.unregister('mod97')
+    ce.unregister('short')
+
+
+@pytest.fixture
+def files(tmp_path):
+    schema_file = tmp_path / 'schema.csvs'
+    schema_file.write_text(SCHEMA)
+    csv_file = tmp_path / 'data.csv'
+    csv_file.write_text('code,name\n98,abc\n5,abcdefgh\n')
+
+    return schema_file, csv_file
+
+
+EXPECTED = {3: {'code': {'e': ['CustomExpr: 5 failed custom check mod97']},
+                'name': {'e': ['CustomExpr: abcdefgh failed custom check short']}}}
+
+
+def test_cell_and_batch_checks(checks, files):
+    schema_file, csv_file = files
+    validator = CslValidator(schema_file)
+
+    assert not validator.validate(csv_file)
+    assert dict(validator.errors) == EXPECTED
+
+
+def test_pickled_validator_looks_checks_up_again(checks, files):
+    schema_file, csv_file = files
+    validator = pickle.loads(pickle.dumps(CslValidator(schema_file)))
+
+    assert not validator.validate(csv_file)
+    assert dict(validator.errors) == EXPECTED
+
+
+def test_unregistered_check(files):
+    with pytest.raises(ValueError, match='no custom check'):
+        CslValidator(files[0])
+
+
+def test_pure_rules_run_once_per_row_across_schemas(tmp_path):
+    calls = []
+    ce.register('counted', cell=lambda value: calls.append(value) or value != 'b')
+    try:
+        first, second = tmp_path / 'first.csvs', tmp_path / 'second.csvs'
+        first.write_text('version 1.2\n@totalColumns 1\ncode: custom("counted")\n')
+        second.write_text('version 1.2\n@totalColumns 1\ncode: custom("counted") @warningDirective\n')
+        csv_file = tmp_path / 'data.csv'
+        csv_file.write_text('code\na\nb\nc\n')
+
+        assert validate_many([CslValidator(first), CslValidator(second)], csv_file) == [False, False]
+        assert calls == ['a', 'b', 'c']
+    finally:
+        ce.unregister('counted')
@@ -0,0 +1,103 @@
+# stdlib
+import pickle
+
+# local
+from py_csl_validator.validator.validator import CslValidator, validate_many
+from py_csl_validator.expressions.expression_classes_1_1 import Expressions1_1 as ec
+
+
+def validate(tmp_path, schema, data, **options):
+    schema_file = tmp_path / 'schema.csvs'
+    schema_file.write_text(schema)
+    csv_file = tmp_path / 'data.csv'
+    csv_file.write_text(data)
+
+    validator = CslValidator(schema_file, **options)
+    valid = validator.validate(csv_file)
+
+    return valid, dict(validator.errors)
+
+
+def test_if_without_else_under_match_is_false(tmp_path):
+    schema = 'version 1.2\n@totalColumns 2\na:\nb: if($a/is("x"), notEmpty) @matchIsFalse\n'
+    valid, errors = validate(tmp_path, schema, 'a,b\ny,1\n')
+
+    assert not valid
+    assert errors[2]['a']['e'] == ['IsExpr: y not equivalent to x']
+    assert errors[2]['b']['e'] == ['IfExpr: Condition not met and there is no else clause, so 1 validated. '
+                                   'See other errors for details.']
+
+
+def test_deeply_nested_schema_loads_validates_and_pickles(tmp_path):
+    expression = 'is("a")'
+    for i in range(150):
+        expression = f'if($c1/is("{i}"), {expression}, notEmpty)'
+    schema_file = tmp_path / 'schema.csvs'
+    schema_file.write_text(f'version 1.1\n@totalColumns 2\nc0: {expression}\nc1: notEmpty\n')
+    csv_file = tmp_path / 'data.csv'
+    csv_file.write_text('c0,c1\na,b\n,0\n')
+
+    validator = pickle.loads(pickle.dumps(CslValidator(schema_file)))
+
+    assert not validator.validate(csv_file)
+    assert list(validator.errors) == [3]
+
+
+def test_and_reports_schema_positions_after_planning(tmp_path):
+    schema = 'version 1.2\n@totalColumns 1\na: uri and is("x")\n'
+    valid, errors = validate(tmp_path, schema, 'a\nhttp://y\n')
+
+    assert not valid
+    assert errors[2]['a']['e'][-1] == 'AndExpr: http://y failed to validate against expressions: 2 (type: IsExpr). ' \
+                                      'See other errors for details.'
+
+
+def test_signatures_and_purity_are_fixed_when_frozen(tmp_path):
+    schema_file = tmp_path / 'schema.csvs'
+    schema_file.write_text('version 1.2\n@totalColumns 2\na: is("x") or length(3)\nb: is($a) unique\n')
+    csv_file = tmp_path / 'data.csv'
+    csv_file.write_text('a,b\nx,x\nabc,x\n')
+
+    first, second = CslValidator(schema_file), CslValidator(schema_file)
+    nodes = [node for validator in (first, second) for rule in validator.column_rules.values()
+             for node in rule.walk()]
+    state = [(node._signature, node._pure, node._frozen) for node in nodes]
+
+    assert validate_many([first, second], csv_file) == [False, False]
+    assert [(node._signature, node._pure, node._frozen) for node in nodes] == state
+
+    (a1,), (a2,) = first.column_rules['a'].col_vals, second.column_rules['a'].col_vals
+    assert a1.signature() == a2.signature() and a1.is_pure()
+    is_a, unique = first.column_rules['b'].col_vals
+    assert not is_a.is_pure() and not unique.is_pure()
+    assert unique.signature() != second.column_rules['b'].col_vals[1].signature()
+
+
+def test_data_dependencies_are_ordered_at_load(tmp_path):
+    schema_file = tmp_path / 'schema.csvs'
+    schema_file.write_text('version 1.1\n@totalColumns 2\npath:\n'
+                           'name: is(concat(noExt($path), ".txt")) not(noExt($path))\n')
+    csv_file = tmp_path / 'data.csv'
+    csv_file.write_text('path,name\na.csv,a.txt\nb.csv,b.csv\n')
+
+    for validator in (CslValidator(schema_file), pickle.loads(pickle.dumps(CslValidator(schema_file)))):
+        is_concat, not_noext = validator.column_rules['name'].col_vals
+        concat, = [node for node in is_concat.walk() if type(node).__name__ == 'ConcatExpr']
+        noext, = [node for node in not_noext.walk() if type(node).__name__ == 'NoExtExpr']
+        assert concat.dependencies == (noext,) and noext.dependencies == ()
+
+        assert not validator.validate(csv_file)
+        assert list(validator.errors) == [3]
+
+
+def test_loading_a_schema_again_does_not_grow_the_signature_table(tmp_path):
+    schema_file = tmp_path / 'schema.csvs'
+    schema_file.write_text('version 1.2\n@totalColumns 2\na: is("x") unique\nb: if($a/is("x"), identical) @ignoreCase\n')
+
+    CslValidator(schema_file)
+    size = len(ec.Node.signatures)
+    validators = [CslValidator(schema_file) for _ in range(5)]
+
+    assert len(ec.Node.signatures) == size
+    unique_a, unique_b = (validator.column_rules['a'].col_vals[1] for validator in validators[:2])
+    assert unique_a.signature() != unique_b.signature()
@@ -0,0 +1,67 @@
+# stdlib
+import tempfile
+
+# third party
+import pytest
+
+# local
+import py_csl_validator.utils.index_utils as iu
+from py_csl_validator.validator.validator import CslValidator
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    lists = tmp_path / 'lists'
+    lists.mkdir()
+    lists.joinpath('codes.txt').write_text('a\nb\nC\n')
+    schema_file = tmp_path / 'schema.csvs'
+    schema_file.write_text(f'version 1.2\n@totalColumns 2\ncode: inList("{lists / "codes.txt"}")\n'
+                           f'other: inList("{lists / "codes.txt"}") @ignoreCase\n')
+    csv_file = tmp_path / 'data.csv'
+    csv_file.write_text('code,other\na,c\nc,x\n')
+
+    return schema_file, csv_file, lists
+
+
+def unwritable(*directories):
+    mkstemp = tempfile.mkstemp
+
+    def refuse(*args, dir=None, **kwargs):
+        if any(str(dir).startswith(str(directory)) for directory in directories):
+            raise PermissionError(13, 'Permission denied', str(dir))
+        return mkstemp(*args, dir=dir, **kwargs)
+
+    return refuse
+
+
+def check(schema_file, csv_file):
+    validator = CslValidator(schema_file)
+    assert not validator.validate(csv_file)
+    assert list(validator.errors) == [3]
+    assert list(validator.errors[3]) == ['code', 'other']
+
+
+def test_index_is_built_next_to_the_list_at_load(files):
+    schema_file, csv_file, lists = files
+    CslValidator(schema_file)
+
+    assert sorted(path.name for path in lists.iterdir()) == ['codes.txt', 'codes.txt.cslidx', 'codes.txt.nocase.cslidx']
+    check(schema_file, csv_file)
+
+
+def test_index_falls_back_to_the_user_cache(files, tmp_path, monkeypatch):
+    schema_file, csv_file, lists = files
+    monkeypatch.setattr(iu.tempfile, 'mkstemp', unwritable(lists))
+
+    check(schema_file, csv_file)
+    assert [path.name for path in lists.iterdir()] == ['codes.txt']
+    assert len(list(tmp_path.joinpath('cache', 'py_csl_validator', 'index').iterdir())) == 2
+
+
+def test_index_falls_back_to_memory(files, tmp_path, monkeypatch):
+    schema_file, csv_file, lists = files
+    monkeypatch.setattr(iu.tempfile, 'mkstemp', unwritable(lists, tmp_path / 'cache'))
+
+    check(schema_file, csv_file)
+    assert [path.name for path in lists.iterdir()] == ['codes.txt']
@@ -0,0 +1,49 @@
+# third party
+import pytest
+
+# local
+from py_csl_validator.validator.validator import CslValidator
+
+
+SCHEMA = 'version 1.2\n@totalColumns 3\nname: notEmpty\ncount: positiveInteger @optional\nratio: notEmpty\n'
+ROWS = [['a', 1, 0.5], ['', None, 1.5], ['c', -2, 2.0]]
+
+
+@pytest.fixture
+def validator(tmp_path):
+    schema_file = tmp_path / 'schema.csvs'
+    schema_file.write_text(SCHEMA)
+
+    return CslValidator(schema_file)
+
+
+def test_rows_validate_as_written_to_csv(validator, tmp_path):
+    csv_file = tmp_path / 'data.csv'
+    csv_file.write_text('name,count,ratio\na,1,0.5\n,,1.5\nc,-2,2.0\n')
+    assert not validator.validate(csv_file)
+    expected = dict(validator.errors)
+
+    assert not validator.validate_rows(ROWS)
+    assert dict(validator.errors) == expected
+    assert list(expected) == [3, 4]
+    assert validator.row_count == 4
+
+
+def test_short_rows_are_column_count_defects(validator):
+    assert not validator.validate_rows([['a', '1', '0.5'], ['b', '2']])
+    defect, = validator.structural_errors
+    assert (defect.row, defect.kind) == (3, 'column_count')
+
+
+def test_frame_validates_as_written_to_csv(validator):
+    pd = pytest.importorskip('pandas')
+    frame = pd.DataFrame(ROWS, columns=['name', 'count', 'ratio'])
+    frame['count'] = frame['count'].astype('Int64')  # a missing value in an integer column
+
+    assert not validator.validate_rows(ROWS)
+    expected = dict(validator.errors)
+    assert not validator.validate_frame(frame)
+    assert dict(validator.errors) == expected
+
+    strings = pd.DataFrame({'name': ['a', 'b'], 'count': ['1', '2'], 'ratio': ['x', 'y']})
+    assert validator.validate_frame(strings)
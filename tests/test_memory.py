@@ -0,0 +1,65 @@
+# stdlib
+import gzip
+
+# third party
+import pytest
+
+# local
+import py_csl_validator.utils.io_utils as iu
+import py_csl_validator.utils.memory_utils as mu
+from py_csl_validator.validator.validator import CslValidator
+
+
+def write_files(tmp_path, schema, data):
+    schema_file = tmp_path / 'schema.csvs'
+    schema_file.write_text(schema)
+    csv_file = tmp_path / 'data.csv'
+    csv_file.write_text(data)
+
+    return schema_file, csv_file
+
+
+def test_unique_values_spill_to_disk_past_the_budget(tmp_path):
+    ids = [str(i) for i in range(5000)] + ['17', '4999', '5000', '17']
+    schema_file, csv_file = write_files(tmp_path, 'version 1.2\n@totalColumns 1\nid: unique\n',
+                                        'id\n' + '\n'.join(ids) + '\n')
+
+    expected = CslValidator(schema_file)
+    assert not expected.validate(csv_file)
+    assert not expected.memory_stats()['degraded']
+
+    validator = CslValidator(schema_file, memory_budget=200_000)
+    assert not validator.validate(csv_file)
+    assert dict(validator.errors) == dict(expected.errors)
+    assert sorted(validator.errors) == [5002, 5003, 5005]
+
+    stats = validator.memory_stats()
+    assert list(stats['degraded']) == ['UniqueExpr(id)'] and stats['errors_dropped'] == 0
+    assert stats['peak'] < expected.memory_stats()['peak']
+
+
+def test_error_store_only_counts_failures_past_the_budget(tmp_path):
+    schema_file, csv_file = write_files(tmp_path, 'version 1.2\n@totalColumns 1\nid: positiveInteger\n',
+                                        'id\n' + 'x\n' * 2000)
+
+    validator = CslValidator(schema_file, memory_budget=20_000)
+    assert not validator.validate(csv_file)
+
+    stats = validator.memory_stats()
+    assert 'errors' in stats['degraded']
+    assert 0 < stats['errors_dropped'] < 2000
+    assert len(validator.errors) + stats['errors_dropped'] == 2000
+    assert validator.errors.severity_counts['e'] == 2000
+
+
+def test_compressed_input_needs_its_buffers_within_the_budget(tmp_path):
+    schema_file, _ = write_files(tmp_path, 'version 1.2\n@totalColumns 1\nid: positiveInteger\n', '')
+    csv_file = tmp_path / 'data.csv.gz'
+    csv_file.write_bytes(gzip.compress(b'id\n1\n2\n'))
+
+    with pytest.raises(mu.MemoryBudgetExceeded, match='decompression buffers'):
+        CslValidator(schema_file, memory_budget=iu.LOOKAHEAD_SIZE // 2).validate(csv_file)
+
+    validator = CslValidator(schema_file, memory_budget=iu.LOOKAHEAD_SIZE * 2)
+    assert validator.validate(csv_file)
+    assert validator.memory_stats()['current'] == 0
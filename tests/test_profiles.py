@@ -0,0 +1,57 @@
+# third party
+import pytest
+
+# local
+import py_csl_validator.utils.planner_utils as pu
+from py_csl_validator.validator.validator import CslValidator
+
+
+SCHEMA = 'version 1.2\n@totalColumns 3\nid: unique\ncode: positiveInteger\nnote: length(1,5) @warningDirective\n'
+DATA = 'id,code,note\n1,10,ok\n2,x1,too long\n1,20,fine\n3,30\n'
+
+
+@pytest.fixture
+def files(tmp_path):
+    schema_file = tmp_path / 'schema.csvs'
+    schema_file.write_text(SCHEMA)
+    csv_file = tmp_path / 'data.csv'
+    csv_file.write_text(DATA)
+
+    return schema_file, csv_file
+
+
+def failures(validator):
+    return sorted((row, column) for row, columns in validator.errors.to_dict().items() for column in columns)
+
+
+@pytest.mark.parametrize('profile, expected', [
+    (None, [(3, 'code'), (3, 'note'), (4, 'id')]),
+    (pu.Profile(severities={'e'}), [(3, 'code'), (4, 'id')]),
+    (pu.Profile(exclude_kinds={'stateful'}), [(3, 'code'), (3, 'note')]),
+    (pu.Profile(exclude_kinds={'PositiveIntegerExpr'}), [(3, 'note'), (4, 'id')]),
+    (pu.Profile(columns={'note'}), [(3, 'note')]),
+    (pu.Profile(exclude_columns={'note', 'code'}), [(4, 'id')]),
+])
+def test_profile_runs_only_the_selected_rules(files, profile, expected):
+    schema_file, csv_file = files
+
+    validator = CslValidator(schema_file, profile=profile)
+    assert not validator.validate(csv_file)
+    assert failures(validator) == expected
+    # columns left out of a profile still count towards the shape of each record
+    assert [(defect.row, defect.kind) for defect in validator.structural_errors] == [(5, 'column_count')]
+
+
+def test_named_profiles_are_selected_per_call(files):
+    schema_file, csv_file = files
+    validator = CslValidator(schema_file, profiles={'gate': pu.Profile(severities={'e'}, exclude_kinds={'stateful'})})
+
+    assert not validator.validate(csv_file, profile='gate')
+    assert failures(validator) == [(3, 'code')]
+    assert not validator.validate(csv_file)
+    assert failures(validator) == [(3, 'code'), (3, 'note'), (4, 'id')]
+
+    with pytest.raises(ValueError, match='Unknown validation profile'):
+        validator.validate(csv_file, profile='missing')
+    with pytest.raises(ValueError, match='columns the schema does not have'):
+        CslValidator(schema_file, profile=pu.Profile(columns={'other'}))
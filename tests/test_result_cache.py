@@ -0,0 +1,99 @@
+# stdlib
+import os
+import pickle
+
+# third party
+import pytest
+
+# local
+import py_csl_validator.utils.cache_utils as cu
+import py_csl_validator.expressions.custom_expressions as ce
+from py_csl_validator.validator.validator import CslValidator
+
+
+SCHEMA = 'version 1.2\n@totalColumns 2\ncode: positiveInteger\nname: notEmpty\n'
+
+
+def test_summary_without_exemplars_is_restored(tmp_path):
+    schema_file = tmp_path / 'schema.csvs'
+    schema_file.write_text(SCHEMA)
+    csv_file = tmp_path / 'data.csv'
+    csv_file.write_text('code,name\nx,a\ny,b\n1,c\n')
+
+    validator = CslValidator(schema_file, result_cache=cu.ResultCache(tmp_path / 'cache'), summarize_errors=True,
+                             max_exemplars=0)
+    assert not validator.validate(csv_file)
+    assert not validator.validate(csv_file)  # from the cache
+
+    group, = validator.errors.summary()
+    assert (group.column, group.count, group.first_row, group.last_row) == ('code', 2, 2, 3)
+    assert group.exemplars == []
+
+
+known_ids = {'a', 'b'}
+
+
+class Unpicklable:
+
+    def __reduce__(self):
+        raise TypeError('not picklable')
+
+    def __contains__(self, value):
+        return value in known_ids
+
+
+def test_changed_custom_check_data_invalidates_results(tmp_path):
+    global known_ids
+    ce.register('known_id', cell=lambda value: value in known_ids)
+    try:
+        schema_file = tmp_path / 'schema.csvs'
+        schema_file.write_text('version 1.2\n@totalColumns 1\nid: custom("known_id")\n')
+        csv_file = tmp_path / 'data.csv'
+        csv_file.write_text('id\na\nc\n')
+        validator = CslValidator(schema_file, result_cache=cu.ResultCache(tmp_path / 'cache'))
+
+        assert not validator.validate(csv_file)
+        known_ids = known_ids | {'c'}
+        assert validator.validate(csv_file)
+        known_ids.discard('c')  # mutated in place
+        assert not validator.validate(csv_file)
+    finally:
+        known_ids = {'a', 'b'}
+        ce.unregister('known_id')
+
+
+def test_custom_check_data_which_cannot_be_digested_is_not_cached(tmp_path):
+    ids = Unpicklable()
+    ce.register('known_id', cell=lambda value: value in ids)
+    try:
+        schema_file = tmp_path / 'schema.csvs'
+        schema_file.write_text('version 1.2\n@totalColumns 1\nid: custom("known_id")\n')
+        csv_file = tmp_path / 'data.csv'
+        csv_file.write_text('id\na\n')
+
+        assert CslValidator(schema_file, result_cache=cu.ResultCache(tmp_path / 'cache')).validate(csv_file)
+        assert not (tmp_path / 'cache').exists()
+    finally:
+        ce.unregister('known_id')
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason='POSIX permissions')
+def test_cache_others_can_write_to_is_not_used(tmp_path):
+    schema_file = tmp_path / 'schema.csvs'
+    schema_file.write_text(SCHEMA)
+    csv_file = tmp_path / 'data.csv'
+    csv_file.write_text('code,name\nx,a\n')
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+    cache_dir.chmod(0o777)
+    result_cache = cu.ResultCache(cache_dir)
+    validator = CslValidator(schema_file, result_cache=result_cache)
+
+    assert not validator.validate(csv_file)
+    assert not list(cache_dir.iterdir())
+
+    # an entry planted by someone else is not loaded
+    key = result_cache.key(csv_file, f'{validator.compiled.digest}:{cu.check_digest(validator.compiled.rules)}')
+    with open(result_cache._path(key), mode='wb') as planted:
+        pickle.dump({'format': cu.CACHE_FORMAT, 'external_paths': [], 'valid': True}, planted)
+    assert not validator.validate(csv_file)
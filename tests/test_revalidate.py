@@ -0,0 +1,69 @@
+# stdlib
+import io
+
+# third party
+import pytest
+
+# local
+import py_csl_validator.utils.row_index_utils as ri
+import py_csl_validator.utils.structure_utils as st
+from py_csl_validator.sharding.sharding import record_boundaries
+from py_csl_validator.validator.validator import CslValidator
+
+
+SCHEMA = 'version 1.2\n@totalColumns 2\nid: positiveInteger\nnote: notEmpty\n'
+DATA = 'id,note\n1,"first\nnote"\nx,"second, ""quoted"""\n3,\n\n4,"fourth\r\nnote"\n'
+
+
+@pytest.fixture
+def files(tmp_path):
+    schema_file = tmp_path / 'schema.csvs'
+    schema_file.write_text(SCHEMA)
+    csv_file = tmp_path / 'data.csv'
+    csv_file.write_bytes(DATA.encode('utf-8'))
+
+    return schema_file, csv_file
+
+
+def test_scanner_finds_multi_line_records():
+    with io.BytesIO(DATA.encode('utf-8')) as raw:
+        locations = list(ri.iter_records(raw))
+        assert [(location.row, location.line) for location in locations] == [(1, 1), (2, 3), (3, 4), (4, 5),
+                                                                               (5, 8)]
+        assert [ri.read_record(raw, location, ',', 0)[0] for location in locations] == ['id', '1', 'x', '3', '4']
+
+        header_end = locations[0].end
+        assert record_boundaries(raw, [0, header_end + 3]) == [(header_end, 2), (locations[1].end, 4)]
+
+    lines = st.RecordLines(io.StringIO('a,"b\nc"\nd,e\n'))
+    assert lines.record() == ['a,"b\n', 'c"\n'] and lines.record() == ['d,e\n'] and lines.record() == []
+
+
+def test_fixed_rows_revalidate(files):
+    schema_file, csv_file = files
+    validator = CslValidator(schema_file)
+    assert not validator.validate(csv_file, index_every=2)
+    assert sorted(validator.errors) == [3, 4]
+
+    assert not validator.revalidate(csv_file)
+    assert sorted(validator.errors) == [3, 4]
+
+    # the same length, then a different one: rows after a change of length are found by scanning
+    csv_file.write_bytes(DATA.replace('x,', '2,').encode('utf-8'))
+    assert not validator.revalidate(csv_file)
+    assert sorted(validator.errors) == [4]
+    csv_file.write_bytes(DATA.replace('x,', '22,').replace('3,\n', '3,third\n').encode('utf-8'))
+    assert validator.revalidate(csv_file)
+    assert validator.revalidate(csv_file, rows=[2, 5])
+
+
+def test_removed_rows_are_missing(files):
+    schema_file, csv_file = files
+    validator = CslValidator(schema_file)
+    validator.validate(csv_file, index_every=1)
+
+    csv_file.write_bytes(DATA.split('\n3,')[0].encode('utf-8') + b'\n')
+    assert not validator.revalidate(csv_file, rows=[3, 4])
+    defect, = validator.structural_errors
+    assert (defect.row, defect.kind) == (4, 'missing_row')
+    assert sorted(validator.errors) == [3]
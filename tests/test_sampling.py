@@ -0,0 +1,47 @@
+# stdlib
+import csv
+import random
+
+# local
+import py_csl_validator.utils.sampling_utils as su
+from py_csl_validator.validator.validator import CslValidator
+
+
+def test_seek_sample_keys_rows_by_record(tmp_path):
+    # records spanning several lines: offsets inside one resynchronize on the record after it
+    csv_file = tmp_path / 'data.csv'
+    with open(csv_file, mode='w', newline='', encoding='utf-8') as cf:
+        writer = csv.writer(cf)
+        writer.writerow(['id', 'text'])
+        writer.writerows([str(i), 'first\nsecond\nthird'] for i in range(20))
+    starts = set()
+    with open(csv_file, mode='rb') as cf:
+        while cf.readline():
+            starts.add(cf.tell())
+
+    for seed in range(20):
+        samples = su.seek_sample(csv_file, 10, random.Random(seed), ['id', 'text'], ',', csv.QUOTE_MINIMAL,
+                                 skip_header=True)
+        ids = [row['id'] for _, row in samples]
+
+        assert len(set(ids)) == len(ids) == 10
+        assert {offset for offset, _ in samples} <= starts
+        assert all(row['text'] == 'first\nsecond\nthird' for _, row in samples)
+
+
+def test_streaming_and_seek_samples_skip_short_rows(tmp_path):
+    schema_file = tmp_path / 'schema.csvs'
+    schema_file.write_text('version 1.2\n@totalColumns 2\nid: length(1)\ntext: notEmpty\n')
+    csv_file = tmp_path / 'data.csv'
+    csv_file.write_text('id,text\n1,a\n2\n3,c\n')
+    validator = CslValidator(schema_file)
+
+    for streaming in (True, False):
+        report = validator.sample(csv_file, sample_size=10, streaming=streaming, seed=1)
+
+        assert report.sampled_rows == 2
+        assert all(estimate.failures == 0 for estimate in report.columns.values())
+
+    validator.sample(csv_file, sample_size=10, streaming=True, seed=1)
+    defect, = validator.structural_errors
+    assert (defect.row, defect.kind) == (3, 'column_count')
@@ -0,0 +1,74 @@
+# local
+import py_csl_validator.sharding.sharding as sh
+from py_csl_validator.validator.validator import CslValidator
+
+
+SCHEMA = 'version 1.2\n@totalColumns 3\nid: unique\nkind: identical\nnote: notEmpty\n'
+
+
+def sample_data():
+    # ids repeat across the whole file, kind changes in places and notes span lines, so rows which depend on
+    # each other and records split over lines fall on both sides of the shard boundaries
+    lines = ['id,kind,note\n']
+    for row in range(60):
+        kind = 'b' if row in (17, 18, 41) else 'a'
+        note = f'"note {row}\nwith ""quotes"", commas\r\nand lines"' if row % 3 else f'note {row}'
+        if row % 11 == 5:
+            note = ''
+        lines.append(f'{row % 23},{kind},{note}\n')
+    lines.append('99,a\n')  # a short row
+
+    return ''.join(lines)
+
+
+def report(validator):
+    errors = [(record.row, record.column, record.report_level, record.message) for record in validator.errors.records()]
+    structural = [(defect.row, defect.line, defect.kind) for defect in validator.structural_errors]
+
+    return errors, structural, {key: dict(counts) for key, counts in validator.failure_counts.items() if counts}
+
+
+def sharded(csv_file, schema_file, shard_count, work_dir):
+    manifest_file = work_dir / 'manifest.json'
+    manifest = sh.plan_shards(csv_file, schema_file, shard_count, manifest_file)
+    partial_files = [work_dir / f'shard-{index}.partial' for index in range(len(manifest['shards']))]
+    for index, partial_file in enumerate(partial_files):
+        sh.run_shard(manifest_file, index, partial_file)
+
+    return manifest, sh.merge_partials(manifest_file, partial_files)
+
+
+def test_sharded_run_matches_single_pass(tmp_path):
+    schema_file = tmp_path / 'schema.csvs'
+    schema_file.write_text(SCHEMA)
+    csv_file = tmp_path / 'data.csv'
+    csv_file.write_bytes(sample_data().encode('utf-8'))
+
+    single = CslValidator(schema_file)
+    single_valid = single.validate(csv_file)
+    expected = report(single)
+    assert not single_valid and expected[0] and expected[1]
+
+    data = csv_file.read_bytes()
+    for shard_count in (1, 2, 3, 5, 8, 13):
+        work_dir = tmp_path / f'shards-{shard_count}'
+        work_dir.mkdir()
+        manifest, (valid, validator) = sharded(csv_file, schema_file, shard_count, work_dir)
+
+        # every shard starts on a record boundary, never inside a quoted note
+        for shard in manifest['shards'][1:]:
+            assert data[:shard['start']].count(b'"') % 2 == 0 and data[shard['start'] - 1:shard['start']] == b'\n'
+        assert (valid, report(validator)) == (single_valid, expected)
+
+
+def test_run_local_matches_single_pass(tmp_path):
+    schema_file = tmp_path / 'schema.csvs'
+    schema_file.write_text(SCHEMA)
+    csv_file = tmp_path / 'data.csv'
+    csv_file.write_bytes(sample_data().encode('utf-8'))
+
+    single = CslValidator(schema_file)
+    single_valid = single.validate(csv_file)
+
+    valid, validator = sh.run_local(csv_file, schema_file, 3, tmp_path / 'work')
+    assert (valid, report(validator)) == (single_valid, report(single))
@@ -0,0 +1,51 @@
+# third party
+import pytest
+
+# local
+from py_csl_validator.validator.validator import CslValidator, validate_many
+
+
+OLD_SCHEMA = 'version 1.2\n@totalColumns 3\nid: unique\ncode: positiveInteger\nnote: notEmpty\n'
+NEW_SCHEMA = 'version 1.2\n@totalColumns 3\nid: unique\ncode: positiveInteger\nnote: length(1,5)\n'
+DATA = 'id,code,note\n1,10,ok\n2,x1,too long\n1,20,\n3,30\n'
+
+
+def write_schema(tmp_path, name, text):
+    schema_file = tmp_path / name
+    schema_file.write_text(text)
+
+    return schema_file
+
+
+def report(validator):
+    return validator.errors.to_dict(), [(defect.row, defect.kind) for defect in validator.structural_errors]
+
+
+def test_validate_many_matches_separate_runs(tmp_path):
+    schema_files = [write_schema(tmp_path, 'old.csvs', OLD_SCHEMA), write_schema(tmp_path, 'new.csvs', NEW_SCHEMA)]
+    csv_file = tmp_path / 'data.csv'
+    csv_file.write_text(DATA)
+
+    validators = [CslValidator(schema_file) for schema_file in schema_files]
+    verdicts = validate_many(validators, csv_file)
+
+    for schema_file, validator, verdict in zip(schema_files, validators, verdicts):
+        expected = CslValidator(schema_file)
+        assert verdict == expected.validate(csv_file)
+        assert report(validator) == report(expected)
+
+    # the shared rules report in both, each schema keeps its own unique values and only the notes differ
+    old, new = (validator.errors.to_dict() for validator in validators)
+    assert sorted(old) == [3, 4] and sorted(new) == [3, 4]
+    assert sorted(old[3]) == ['code'] and sorted(new[3]) == ['code', 'note']
+    assert sorted(old[4]) == ['id', 'note'] and sorted(new[4]) == ['id', 'note']
+
+
+def test_validate_many_needs_one_layout(tmp_path):
+    csv_file = tmp_path / 'data.csv'
+    csv_file.write_text(DATA)
+    validators = [CslValidator(write_schema(tmp_path, 'old.csvs', OLD_SCHEMA)),
+                  CslValidator(write_schema(tmp_path, 'no_header.csvs', OLD_SCHEMA.replace('\n', '\n@noHeader\n', 1)))]
+
+    with pytest.raises(ValueError, match='must agree'):
+        validate_many(validators, csv_file)